@@ -1,21 +1,40 @@
-from flask import Flask, jsonify, request
+from flask import Flask, jsonify, request, Response, stream_with_context
 from flask_cors import CORS
 import pandas as pd
 from datetime import datetime, timedelta
 import threading
 import time
+import asyncio
+import concurrent.futures
 import random
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 import logging
+import json
 import requests
 import os
 from dotenv import load_dotenv
 
+# Load environment variables from .env file
+load_dotenv(os.path.join(os.path.dirname(__file__), '.env'))
+
 # Ollama AI Integration
 try:
     from ollama_service import (
         analyze_candlesticks_with_ollama,
+        stream_candlestick_analysis,
+        iter_ollama_tokens,
         check_ollama_connection,
+        VERDICT_CACHE,
+        OLLAMA_CLIENT,
+        RULES_ENGINE,
+        get_parse_stats,
+        get_prompt_stats,
+        OLLAMA_WARMUP,
+        KNOWLEDGE_MODEL,
+        KNOWLEDGE_PATTERN_COUNT,
+        prepare_analysis_model,
+        register_analysis_warmup,
+        retry_analysis_model,
         teach_ollama_pattern
     )
     OLLAMA_AVAILABLE = True
@@ -23,9 +42,6 @@ except ImportError:
     OLLAMA_AVAILABLE = False
     logging.warning("⚠️ Ollama service not available. Install ollama_service.py")
 
-# Load environment variables from .env file
-load_dotenv(os.path.join(os.path.dirname(__file__), '.env'))
-
 # Interactive Brokers API Configuration
 try:
     from ib_insync import IB, Stock, util
@@ -34,6 +50,15 @@ except ImportError:
     IBKR_AVAILABLE = False
     logging.warning("⚠️ ib_insync not installed. Install with: pip install ib-insync")
 
+from market_data_stream import MarketDataSubscriptionManager
+from contract_registry import ContractRegistry
+from candles import bars_to_candles, YAHOO_COLUMNS
+from data_cache import StockDataCache
+from bar_store import BarStore
+from history_cache import HistoryCache
+from ibkr_gateway import IBKRGateway
+from pacing import HistoricalDataPacer
+
 # IBKR Connection Settings
 IBKR_HOST = os.getenv('IBKR_HOST', '127.0.0.1')
 IBKR_PORT = int(os.getenv('IBKR_PORT', '4001'))  # 4001 = default IB Gateway port, 7497 = paper trading, 7496 = live
@@ -59,7 +84,8 @@ IBKR_USERNAME = os.getenv('IBKR_USERNAME', 'userconti')
 IBKR_PASSWORD = os.getenv('IBKR_PASSWORD', 'mbnadc21234')
 IBKR_CONNECTED = False
 IBKR_INSTANCE = None
-IBKR_LOCK = threading.Lock()
+# The IB connection is owned by one worker thread - every IBKR call goes through its priority queue (see ibkr_gateway.py)
+IBKR_GATEWAY = IBKRGateway(float(os.getenv('IBKR_REQUEST_TIMEOUT', '120')))  # Seconds a caller waits for its request
 
 # Market Data Subscription Status (Updated: Jan 26, 2026)
 # Current active subscriptions from IBKR portal
@@ -104,6 +130,42 @@ logging.info(f"   ✅ All Level 1 networks: NASDAQ, NYSE, Regional exchanges")
 logging.info(f"   ✅ Subscriber status: Non-Professional")
 logging.info(f"   💰 Total cost: ${MARKET_DATA_SUBSCRIPTIONS['total_monthly_cost']}/month (some fees may be waived)")
 
+# Concurrent scan settings - symbols are fetched as a bounded batch on the ib_insync event loop
+SCAN_CONCURRENT_MODE = os.getenv('SCAN_CONCURRENT_MODE', 'true').lower() == 'true'  # False = legacy one-by-one scan
+SCAN_CONCURRENCY = int(os.getenv('SCAN_CONCURRENCY', '8'))  # Max symbols in flight at once
+SCAN_SYMBOL_DEADLINE = float(os.getenv('SCAN_SYMBOL_DEADLINE', '8'))  # Seconds before a slow symbol is dropped
+SERIAL_SCAN_SYMBOL_LIMIT = 3  # Serial mode only: cap so the scan finishes before the frontend gives up
+
+# Streaming market data - long-lived subscriptions shared by scans, /live polls and trailing stops
+IBKR_MAX_MKT_DATA_LINES = int(os.getenv('IBKR_MAX_MKT_DATA_LINES', '100'))  # Account's simultaneous market data lines
+MKT_DATA_IDLE_SECONDS = float(os.getenv('MKT_DATA_IDLE_SECONDS', '120'))  # Unused lines are cancelled after this long
+MKT_DATA_FIRST_TICK_WAIT = float(os.getenv('MKT_DATA_FIRST_TICK_WAIT', '3'))  # Max wait for the first tick of a new line
+
+# Contract registry - conId/longName resolved once per symbol and reused by every data and order request
+CONTRACT_REGISTRY_PATH = os.path.join(os.path.dirname(__file__), os.getenv('CONTRACT_REGISTRY_PATH', 'contract_registry.json'))  # Relative to backend/
+CONTRACT_REGISTRY_MAX_AGE_DAYS = float(os.getenv('CONTRACT_REGISTRY_MAX_AGE_DAYS', '7'))  # Re-resolve older entries at startup
+CONTRACT_REGISTRY = ContractRegistry(CONTRACT_REGISTRY_PATH, CONTRACT_REGISTRY_MAX_AGE_DAYS)
+MARKET_DATA_STREAM = MarketDataSubscriptionManager(
+    IBKR_MAX_MKT_DATA_LINES, MKT_DATA_IDLE_SECONDS,
+    contract_factory=lambda symbol: CONTRACT_REGISTRY.get_contract(symbol)
+)
+
+# Market movers pipeline - one 5-minute bar request per symbol, fetched concurrently
+MOVERS_SYMBOLS = ['AAPL', 'MSFT', 'GOOGL', 'AMZN', 'TSLA', 'META', 'NVDA', 'AMD', 'NFLX', 'INTC',
+                  'GME', 'AMC', 'PLTR', 'SOFI', 'NIO', 'LCID', 'ATER', 'BBIG', 'SPY', 'QQQ']
+MOVERS_CONCURRENCY = int(os.getenv('MOVERS_CONCURRENCY', '6'))  # Historical requests in flight at once
+MOVERS_SYMBOL_DEADLINE = float(os.getenv('MOVERS_SYMBOL_DEADLINE', '15'))  # Seconds before a slow symbol is dropped
+
+# Batch AI analysis - Level 2 fetches and model calls for a whole scan, pipelined with bounded concurrency
+# (model calls are capped at OLLAMA_NUM_PARALLEL by the shared Ollama client)
+OLLAMA_BATCH_WORKERS = int(os.getenv('OLLAMA_BATCH_WORKERS', '16'))  # Stocks of one batch in progress at once
+LEVEL2_BATCH_CONCURRENCY = int(os.getenv('LEVEL2_BATCH_CONCURRENCY', '3'))  # Order book requests in flight (IBKR allows few depth lines)
+OLLAMA_BATCH_MAX_STOCKS = int(os.getenv('OLLAMA_BATCH_MAX_STOCKS', '50'))  # Larger batches are rejected
+LEVEL2_BATCH_SEMAPHORE = threading.Semaphore(LEVEL2_BATCH_CONCURRENCY)
+
+# Chat model preloaded at boot alongside the analysis model (requests may still pick another)
+OLLAMA_CHAT_MODEL = os.getenv('OLLAMA_CHAT_MODEL', 'llama3.2')
+
 # Auto-adjustable scanner delay (increases by 1s on errors)
 SCANNER_DELAY = 12  # Starting delay in seconds
 SCANNER_DELAY_LOCK = threading.Lock()
@@ -256,10 +318,24 @@ use_serpapi_mode = False  # Switch to True when Yahoo + ScraperAPI both fail
 serpapi_calls_used = 0  # Track monthly usage
 serpapi_calls_reset_date = None  # Reset counter monthly
 
-# In-memory cache for stock data and news
-stock_cache = {}
+# In-memory cache for stock data, keyed by (symbol, timeframe, RTH flag) - see data_cache.py
+STOCK_CACHE_QUOTE_TTL = float(os.getenv('STOCK_CACHE_QUOTE_TTL', '2'))  # Seconds a real-time quote is reused
+STOCK_CACHE_BAR_TTL = float(os.getenv('STOCK_CACHE_BAR_TTL', '30'))  # Seconds historical bars are reused
+STOCK_CACHE_MAX_MB = int(os.getenv('STOCK_CACHE_MAX_MB', '64'))  # LRU eviction above this estimated size
+stock_cache = StockDataCache(STOCK_CACHE_QUOTE_TTL, STOCK_CACHE_BAR_TTL, STOCK_CACHE_MAX_MB * 1024 * 1024)
+# Every historical download is scheduled inside IBKR's pacing limits - see pacing.py
+HISTORICAL_PACER = HistoricalDataPacer(
+    identical_seconds=float(os.getenv('IBKR_PACING_IDENTICAL_SECONDS', '15')),  # No identical request within this many seconds
+    contract_limit=int(os.getenv('IBKR_PACING_CONTRACT_LIMIT', '5')),  # Max requests per contract in 2 seconds
+    window_limit=int(os.getenv('IBKR_PACING_WINDOW_LIMIT', '60')),  # Max small-bar requests per 10 minutes
+    max_open=int(os.getenv('IBKR_PACING_MAX_OPEN', '50'))  # Max simultaneous open requests
+)
+# Historical bars already downloaded, refreshed with gap-only requests - see bar_store.py
+BAR_STORE = BarStore(int(os.getenv('BAR_STORE_MAX_SERIES', '500')), HISTORICAL_PACER)  # Max (symbol, bar size, RTH) series kept
+# Daily bars for the long timeframes, kept on disk as memory-mapped OHLCV files - see history_cache.py
+HISTORY_CACHE_DIR = os.path.join(os.path.dirname(__file__), os.getenv('HISTORY_CACHE_DIR', 'history_cache'))  # Relative to backend/
+HISTORY_CACHE = HistoryCache(HISTORY_CACHE_DIR, float(os.getenv('HISTORY_REFRESH_SECONDS', '60')), HISTORICAL_PACER)  # Min seconds between gap downloads
 # News: IBKR ONLY - no external news caching needed
-cache_lock = threading.Lock()
 
 # Daily discovered stocks for demo/simulation learning
 daily_discovered_stocks = []  # Stores all unique stocks found today
@@ -724,135 +800,158 @@ def track_massive_usage():
 # No external news APIs or scheduled news fetching needed
 
 def connect_ibkr():
-    """Connect to Interactive Brokers TWS/IB Gateway"""
-    global IBKR_CONNECTED, IBKR_INSTANCE
-    
+    """Connect to Interactive Brokers TWS/IB Gateway (on the gateway worker, which owns the connection)"""
     if not IBKR_AVAILABLE:
         logging.error("❌ [IBKR] ib_insync not available - install with: pip install ib_insync")
         return False
     
-    with IBKR_LOCK:
-        # Check if already connected and verify connection is still alive
-        if IBKR_INSTANCE:
-            try:
-                if IBKR_INSTANCE.isConnected():
-                    IBKR_CONNECTED = True
-                    logging.debug("✅ [IBKR] Already connected and verified")
-                    return True
-                else:
-                    # Connection lost, reset state
-                    logging.warning("⚠️ [IBKR] Connection lost, will reconnect")
-                    IBKR_CONNECTED = False
-            except Exception as e:
-                logging.warning(f"⚠️ [IBKR] Connection check failed: {e}, will reconnect")
-                IBKR_CONNECTED = False
-                IBKR_INSTANCE = None
-        
+    # Fast path - connection state is readable from any thread
+    if IBKR_INSTANCE and IBKR_CONNECTED and IBKR_INSTANCE.isConnected():
+        return True
+    
+    try:
+        return IBKR_GATEWAY.call('admin', _connect_ibkr)
+    except Exception as e:
+        logging.error(f"❌ [IBKR] Connection request failed: {e}")
+        return False
+
+def _connect_ibkr():
+    """Connect to Interactive Brokers TWS/IB Gateway - runs on the gateway worker only"""
+    global IBKR_CONNECTED, IBKR_INSTANCE
+    
+    # Check if already connected and verify connection is still alive
+    if IBKR_INSTANCE:
         try:
-            if IBKR_INSTANCE is None:
-                logging.info(f"🔌 [IBKR] Initializing IB instance...")
-                IBKR_INSTANCE = IB()
-                # Start the event loop for ib_insync (required for async operations)
-                util.startLoop()
-                logging.info("✅ [IBKR] IB instance initialized")
+            if IBKR_INSTANCE.isConnected():
+                IBKR_CONNECTED = True
+                logging.debug("✅ [IBKR] Already connected and verified")
+                return True
+            else:
+                # Connection lost, reset state
+                logging.warning("⚠️ [IBKR] Connection lost, will reconnect")
+                IBKR_CONNECTED = False
+        except Exception as e:
+            logging.warning(f"⚠️ [IBKR] Connection check failed: {e}, will reconnect")
+            IBKR_CONNECTED = False
+            IBKR_INSTANCE = None
+    
+    try:
+        if IBKR_INSTANCE is None:
+            logging.info(f"🔌 [IBKR] Initializing IB instance...")
+            IBKR_INSTANCE = IB()
+            # Start the event loop for ib_insync (required for async operations)
+            util.startLoop()
+            logging.info("✅ [IBKR] IB instance initialized")
+        
+        if not IBKR_INSTANCE.isConnected():
+            logging.info(f"🔌 [IBKR] Connecting to {IBKR_HOST}:{IBKR_PORT} (Initial Client ID: {IBKR_CLIENT_ID})...")
+            logging.info(f"🔌 [IBKR] Username: {IBKR_USERNAME}")
+            logging.info(f"🔌 [IBKR] Process ID: {os_sys.getpid()}")
             
-            if not IBKR_INSTANCE.isConnected():
-                logging.info(f"🔌 [IBKR] Connecting to {IBKR_HOST}:{IBKR_PORT} (Initial Client ID: {IBKR_CLIENT_ID})...")
-                logging.info(f"🔌 [IBKR] Username: {IBKR_USERNAME}")
-                logging.info(f"🔌 [IBKR] Process ID: {os_sys.getpid()}")
-                
-                # Try to connect with current client ID, if it fails try alternative IDs
-                max_retries = 15  # Increased retries for better success rate
-                connected = False
-                current_client_id = IBKR_CLIENT_ID
-                tried_ids = set()  # Track tried IDs to avoid duplicates
-                
-                for attempt in range(max_retries):
+            # Try to connect with current client ID, if it fails try alternative IDs
+            max_retries = 15  # Increased retries for better success rate
+            connected = False
+            current_client_id = IBKR_CLIENT_ID
+            tried_ids = set()  # Track tried IDs to avoid duplicates
+            
+            for attempt in range(max_retries):
+                try:
+                    IBKR_INSTANCE.connect(IBKR_HOST, IBKR_PORT, clientId=current_client_id, timeout=10)
+                    IBKR_CONNECTED = True
+                    connected = True
+                    logging.info("✅ [IBKR] Successfully connected to Interactive Brokers!")
+                    logging.info(f"✅ [IBKR] Connection details - Host: {IBKR_HOST}, Port: {IBKR_PORT}, Client ID: {current_client_id}")
+                    # Tickers from a previous session are dead - start the subscription pool fresh
+                    IBKR_GATEWAY.set_ibkr_instance(IBKR_INSTANCE)
+                    MARKET_DATA_STREAM.set_ibkr_instance(IBKR_GATEWAY.client('quote'))
+                    CONTRACT_REGISTRY.set_ibkr_instance(IBKR_GATEWAY.client('contract'))
                     try:
-                        IBKR_INSTANCE.connect(IBKR_HOST, IBKR_PORT, clientId=current_client_id, timeout=10)
-                        IBKR_CONNECTED = True
-                        connected = True
-                        logging.info("✅ [IBKR] Successfully connected to Interactive Brokers!")
-                        logging.info(f"✅ [IBKR] Connection details - Host: {IBKR_HOST}, Port: {IBKR_PORT}, Client ID: {current_client_id}")
-                        # Update global client ID if we used a different one
-                        if current_client_id != IBKR_CLIENT_ID:
-                            logging.info(f"ℹ️ [IBKR] Using Client ID {current_client_id} (original {IBKR_CLIENT_ID} was in use)")
-                        # Log Level 2 subscription status
-                        if MARKET_DATA_SUBSCRIPTIONS['level2']['enabled']:
-                            logging.info("📊 [MARKET DATA] Level 2 subscriptions active:")
-                            logging.info("   ✅ NASDAQ TotalView-OpenView (Level 2) - BookMap compatible")
-                            logging.info("   ✅ Level 1 networks: NASDAQ, NYSE, Regional exchanges")
-                            logging.info("   💡 Order flow analysis and market depth available")
-                        return True
-                    except Exception as connect_error:
-                        error_msg = str(connect_error).lower()
-                        error_code = getattr(connect_error, 'code', None)
-                        # Check for client ID conflict errors (error code 326 or various error messages)
-                        is_client_id_error = (
-                            error_code == 326 or
-                            "client id is already in use" in error_msg or
-                            "clientid" in error_msg or
-                            "already in use" in error_msg or
-                            "326" in error_msg or
-                            "unable to connect as the client id" in error_msg
-                        )
+                        # Trailing stops react to ticks on the gateway worker as they arrive
+                        from ibkr_trading import TRAILING_STOP_ENGINE, ORDER_BOOK, follow_ibkr_connection
+                        follow_ibkr_connection(IBKR_INSTANCE)
+                        TRAILING_STOP_ENGINE.set_ibkr_instance(IBKR_INSTANCE)
+                        ORDER_BOOK.set_ibkr_instance(IBKR_INSTANCE)
+                    except ImportError:
+                        pass
+                    # Update global client ID if we used a different one
+                    if current_client_id != IBKR_CLIENT_ID:
+                        logging.info(f"ℹ️ [IBKR] Using Client ID {current_client_id} (original {IBKR_CLIENT_ID} was in use)")
+                    # Log Level 2 subscription status
+                    if MARKET_DATA_SUBSCRIPTIONS['level2']['enabled']:
+                        logging.info("📊 [MARKET DATA] Level 2 subscriptions active:")
+                        logging.info("   ✅ NASDAQ TotalView-OpenView (Level 2) - BookMap compatible")
+                        logging.info("   ✅ Level 1 networks: NASDAQ, NYSE, Regional exchanges")
+                        logging.info("   💡 Order flow analysis and market depth available")
+                    return True
+                except Exception as connect_error:
+                    error_msg = str(connect_error).lower()
+                    error_code = getattr(connect_error, 'code', None)
+                    # Check for client ID conflict errors (error code 326 or various error messages)
+                    is_client_id_error = (
+                        error_code == 326 or
+                        "client id is already in use" in error_msg or
+                        "clientid" in error_msg or
+                        "already in use" in error_msg or
+                        "326" in error_msg or
+                        "unable to connect as the client id" in error_msg
+                    )
+                    
+                    if is_client_id_error:
+                        # Try random available client ID (not sequential to avoid conflicts)
+                        tried_ids.add(current_client_id)
+                        # Generate random client ID between 1-999, avoiding already tried ones
+                        candidate_found = False
+                        for _ in range(100):  # Try up to 100 random IDs
+                            candidate_id = random.randint(1, 999)
+                            if candidate_id not in tried_ids:
+                                current_client_id = candidate_id
+                                candidate_found = True
+                                break
                         
-                        if is_client_id_error:
-                            # Try random available client ID (not sequential to avoid conflicts)
-                            tried_ids.add(current_client_id)
-                            # Generate random client ID between 1-999, avoiding already tried ones
-                            candidate_found = False
-                            for _ in range(100):  # Try up to 100 random IDs
-                                candidate_id = random.randint(1, 999)
+                        if not candidate_found:
+                            # If we've tried too many, use sequential fallback starting from a random point
+                            start_id = random.randint(1, 999)
+                            for offset in range(999):
+                                candidate_id = ((start_id + offset) % 999) + 1
                                 if candidate_id not in tried_ids:
                                     current_client_id = candidate_id
-                                    candidate_found = True
                                     break
-                            
-                            if not candidate_found:
-                                # If we've tried too many, use sequential fallback starting from a random point
-                                start_id = random.randint(1, 999)
-                                for offset in range(999):
-                                    candidate_id = ((start_id + offset) % 999) + 1
-                                    if candidate_id not in tried_ids:
-                                        current_client_id = candidate_id
-                                        break
-                            
-                            logging.warning(f"⚠️ [IBKR] Client ID {current_client_id if 'current_client_id' in locals() else 'unknown'} conflict detected (attempt {attempt + 1}/{max_retries})")
-                            logging.warning(f"⚠️ [IBKR] Error: {error_msg[:200]}")
-                            logging.info(f"🔄 [IBKR] Retrying with Client ID: {current_client_id}...")
-                            time.sleep(0.5 + (attempt * 0.1))  # Increasing delay with each retry
-                        else:
-                            # Different error, re-raise
-                            logging.error(f"❌ [IBKR] Connection error (not client ID): {error_msg[:200]}")
-                            raise
-                
-                if not connected:
-                    raise Exception(f"Failed to connect after {max_retries} attempts with different client IDs. Tried IDs: {sorted(tried_ids)}")
-            else:
-                IBKR_CONNECTED = True
-                logging.info("✅ [IBKR] Already connected (verified)")
-                return True
-        except ConnectionRefusedError as e:
-            error_msg = f"Connection refused to {IBKR_HOST}:{IBKR_PORT}"
-            logging.error(f"❌ [IBKR] {error_msg}")
-            logging.error(f"❌ [IBKR] Error details: {str(e)}")
-            logging.error("💡 [IBKR] Make sure TWS or IB Gateway is running")
-            logging.error("💡 [IBKR] Check: Configure > API > Settings > Enable ActiveX and Socket Clients")
-            logging.error(f"💡 [IBKR] Verify port {IBKR_PORT} is correct (7497 for TWS paper, 4001 for IB Gateway)")
-            IBKR_CONNECTED = False
-            return False
-        except Exception as e:
-            error_type = type(e).__name__
-            error_msg = str(e)
-            logging.error(f"❌ [IBKR] Connection failed: {error_type}")
-            logging.error(f"❌ [IBKR] Error message: {error_msg}")
-            logging.error(f"💡 [IBKR] Make sure TWS or IB Gateway is running and API is enabled")
-            logging.error(f"💡 [IBKR] Check: Configure > API > Settings > Enable ActiveX and Socket Clients")
-            if "already connected" in error_msg.lower():
-                logging.warning("⚠️ [IBKR] Already connected to another client - check Client ID")
-            IBKR_CONNECTED = False
-            return False
+                        
+                        logging.warning(f"⚠️ [IBKR] Client ID {current_client_id if 'current_client_id' in locals() else 'unknown'} conflict detected (attempt {attempt + 1}/{max_retries})")
+                        logging.warning(f"⚠️ [IBKR] Error: {error_msg[:200]}")
+                        logging.info(f"🔄 [IBKR] Retrying with Client ID: {current_client_id}...")
+                        time.sleep(0.5 + (attempt * 0.1))  # Increasing delay with each retry
+                    else:
+                        # Different error, re-raise
+                        logging.error(f"❌ [IBKR] Connection error (not client ID): {error_msg[:200]}")
+                        raise
+            
+            if not connected:
+                raise Exception(f"Failed to connect after {max_retries} attempts with different client IDs. Tried IDs: {sorted(tried_ids)}")
+        else:
+            IBKR_CONNECTED = True
+            logging.info("✅ [IBKR] Already connected (verified)")
+            return True
+    except ConnectionRefusedError as e:
+        error_msg = f"Connection refused to {IBKR_HOST}:{IBKR_PORT}"
+        logging.error(f"❌ [IBKR] {error_msg}")
+        logging.error(f"❌ [IBKR] Error details: {str(e)}")
+        logging.error("💡 [IBKR] Make sure TWS or IB Gateway is running")
+        logging.error("💡 [IBKR] Check: Configure > API > Settings > Enable ActiveX and Socket Clients")
+        logging.error(f"💡 [IBKR] Verify port {IBKR_PORT} is correct (7497 for TWS paper, 4001 for IB Gateway)")
+        IBKR_CONNECTED = False
+        return False
+    except Exception as e:
+        error_type = type(e).__name__
+        error_msg = str(e)
+        logging.error(f"❌ [IBKR] Connection failed: {error_type}")
+        logging.error(f"❌ [IBKR] Error message: {error_msg}")
+        logging.error(f"💡 [IBKR] Make sure TWS or IB Gateway is running and API is enabled")
+        logging.error(f"💡 [IBKR] Check: Configure > API > Settings > Enable ActiveX and Socket Clients")
+        if "already connected" in error_msg.lower():
+            logging.warning("⚠️ [IBKR] Already connected to another client - check Client ID")
+        IBKR_CONNECTED = False
+        return False
 
 # Keepalive thread to maintain IBKR connection
 def keepalive_ibkr():
@@ -861,18 +960,17 @@ def keepalive_ibkr():
         try:
             time.sleep(30)  # Check every 30 seconds
             if IBKR_AVAILABLE:
-                with IBKR_LOCK:
-                    if IBKR_INSTANCE:
-                        try:
-                            if not IBKR_INSTANCE.isConnected():
-                                # Connection lost, try to reconnect
-                                logging.warning("⚠️ [IBKR KEEPALIVE] Connection lost, attempting reconnect...")
-                                global IBKR_CONNECTED
-                                IBKR_CONNECTED = False
-                                connect_ibkr()
-                        except Exception as e:
-                            logging.warning(f"⚠️ [IBKR KEEPALIVE] Error checking connection: {e}")
+                if IBKR_INSTANCE:
+                    try:
+                        if not IBKR_INSTANCE.isConnected():
+                            # Connection lost, try to reconnect (on the gateway worker)
+                            logging.warning("⚠️ [IBKR KEEPALIVE] Connection lost, attempting reconnect...")
+                            global IBKR_CONNECTED
                             IBKR_CONNECTED = False
+                            connect_ibkr()
+                    except Exception as e:
+                        logging.warning(f"⚠️ [IBKR KEEPALIVE] Error checking connection: {e}")
+                        IBKR_CONNECTED = False
         except Exception as e:
             logging.error(f"❌ [IBKR KEEPALIVE] Error: {e}")
 
@@ -895,8 +993,9 @@ def _adjust_delay_on_error(error_type: str):
         else:
             logging.warning(f"⚠️ Scanner delay at maximum (60s) - error: {error_type}")
 
-def is_market_open() -> bool:
-    """Check if US stock market is currently open (includes premarket: 4:00 AM - 4:00 PM ET, Mon-Fri)"""
+def is_market_open(log_status: bool = True) -> bool:
+    """Check if US stock market is currently open (includes premarket: 4:00 AM - 4:00 PM ET, Mon-Fri)
+    log_status=False skips the status log lines (for periodic background checks)"""
     from datetime import datetime, time
     
     try:
@@ -912,7 +1011,8 @@ def is_market_open() -> bool:
             current_time = now_et.time()
             current_day = now_et.weekday()  # 0=Monday, 6=Sunday
             
-            logging.info(f"🕐 Market status check: ET={now_et.strftime('%Y-%m-%d %H:%M:%S %Z')}, Day={current_day}, Time={current_time}")
+            if log_status:
+                logging.info(f"🕐 Market status check: ET={now_et.strftime('%Y-%m-%d %H:%M:%S %Z')}, Day={current_day}, Time={current_time}")
         else:
             # Fallback without pytz (less accurate - uses local time)
             now_et = datetime.now()
@@ -930,7 +1030,8 @@ def is_market_open() -> bool:
         
         # Check if it's a weekday (Monday=0, Friday=4)
         if current_day >= 5:  # Saturday (5) or Sunday (6)
-            logging.info("📴 Market is CLOSED (Weekend)")
+            if log_status:
+                logging.info("📴 Market is CLOSED (Weekend)")
             return False
         
         # Check if within market hours (premarket OR regular hours)
@@ -938,12 +1039,13 @@ def is_market_open() -> bool:
         is_regular = regular_open <= current_time <= market_close
         is_open = is_premarket or is_regular
         
-        if is_premarket:
-            logging.info(f"🌅 Market is OPEN (PREMARKET: {current_time} - Regular hours start at {regular_open})")
-        elif is_regular:
-            logging.info(f"✅ Market is OPEN (REGULAR HOURS: {current_time})")
-        else:
-            logging.info(f"📴 Market is CLOSED (Current: {current_time}, Premarket: {premarket_start}-{regular_open}, Regular: {regular_open}-{market_close})")
+        if log_status:
+            if is_premarket:
+                logging.info(f"🌅 Market is OPEN (PREMARKET: {current_time} - Regular hours start at {regular_open})")
+            elif is_regular:
+                logging.info(f"✅ Market is OPEN (REGULAR HOURS: {current_time})")
+            else:
+                logging.info(f"📴 Market is CLOSED (Current: {current_time}, Premarket: {premarket_start}-{regular_open}, Regular: {regular_open}-{market_close})")
         
         return is_open
     except Exception as e:
@@ -985,7 +1087,159 @@ def is_premarket() -> bool:
         logging.error(f"❌ Error determining premarket status: {e}")
         return False
 
+def sync_market_data_subscriptions():
+    """Keep a streaming line open for every active scanner symbol and open position, and drop idle ones"""
+    if not IBKR_AVAILABLE or not IBKR_INSTANCE or not IBKR_INSTANCE.isConnected():
+        return
+    
+    with active_symbols_lock:
+        scanner_symbols = list(active_symbols)
+    
+    position_symbols = set()
+    try:
+        position_symbols = {p.contract.symbol for p in IBKR_INSTANCE.positions() if p.position}
+    except Exception as e:
+        logging.debug(f"⚠️ [MARKET DATA] Could not read positions: {e}")
+    try:
+        from ibkr_trading import ACTIVE_TRADES, TRADING_LOCK
+        with TRADING_LOCK:
+            position_symbols.update(t.get('symbol') for t in ACTIVE_TRADES.values() if t.get('symbol'))
+    except ImportError:
+        pass
+    
+    # Positions first so trailing stops keep their lines when the line limit is tight
+    MARKET_DATA_STREAM.sync_consumer('positions', position_symbols)
+    MARKET_DATA_STREAM.sync_consumer('scanner', scanner_symbols)
+    MARKET_DATA_STREAM.evict_idle()
+
+def _build_realtime_quote_result(symbol: str, name: str, current_price: float, bid_price, ask_price, volume: int) -> Dict[str, Any]:
+    """Minimal real-time stock data built from a Level 1 quote (no candles)"""
+    return {
+        'symbol': symbol,
+        'name': name,
+        'currentPrice': round(current_price, 2),
+        'bidPrice': round(bid_price, 2) if bid_price else None,
+        'askPrice': round(ask_price, 2) if ask_price else None,
+        'volume': volume,
+        'currentVolume': volume,
+        'dayHigh': current_price,  # Approximate
+        'dayLow': current_price,   # Approximate
+        'openPrice': current_price,  # Approximate
+        'previousClose': current_price,  # Will try to get later
+        'changePercent': 0.0,  # Will calculate if we get previous close
+        'changeAmount': 0.0,
+        'realtimeOnly': True,
+        'candles': [],  # No candles for real-time only
+        'chartData': {},
+        'float': 0,
+        'avgVolume': None
+    }
+
+def _build_realtime_bar_result(symbol: str, name: str, latest_bar) -> Optional[Dict[str, Any]]:
+    """Screening stock data built from the most recent 5-minute bar (None if the bar has no valid price)"""
+    ticker_last = latest_bar['close']  # Use close of most recent bar
+    ticker_high = latest_bar['high']
+    ticker_low = latest_bar['low']
+    ticker_volume = latest_bar['volume']
+    
+    # For bid/ask, we'll use the close price as approximation (Snapshot Bundle doesn't provide streaming bid/ask)
+    ticker_bid = ticker_last
+    ticker_ask = ticker_last
+    
+    import math
+    
+    def safe_float(value):
+        """Safely convert to float, handling NaN"""
+        if value is None:
+            return None
+        try:
+            val = float(value)
+            if math.isnan(val) or math.isinf(val):
+                return None
+            return val
+        except (ValueError, TypeError):
+            return None
+    
+    def safe_int(value):
+        """Safely convert to int, handling NaN"""
+        if value is None:
+            return None
+        try:
+            val = float(value)
+            if math.isnan(val) or math.isinf(val):
+                return None
+            return int(val)
+        except (ValueError, TypeError):
+            return None
+    
+    current_price = safe_float(ticker_last) if ticker_last is not None else None
+    bid_price = safe_float(ticker_bid) if ticker_bid is not None else None
+    ask_price = safe_float(ticker_ask) if ticker_ask is not None else None
+    spread = (ask_price - bid_price) if (bid_price and ask_price and bid_price != ask_price) else None
+    spread_percent = (spread / bid_price * 100) if (bid_price and spread and bid_price > 0) else None
+    
+    # Get volume and day stats from 1-minute bar
+    current_volume = safe_int(ticker_volume) if ticker_volume is not None else None
+    day_high = safe_float(ticker_high) if ticker_high is not None else None
+    day_low = safe_float(ticker_low) if ticker_low is not None else None
+    
+    # If we don't have a valid current price, we can't proceed
+    if current_price is None:
+        return None
+    
+    # For fast screening, skip previous close fetch (too slow)
+    # Just use current price as previous close (change will be 0%, but stock will still show)
+    previous_close = current_price
+    logging.debug(f"📊 [IBKR REALTIME] [{symbol}] Using current price as previous close for fast screening")
+    
+    change_amount = (current_price - previous_close) if (current_price and previous_close) else 0
+    change_percent = (change_amount / previous_close * 100) if previous_close > 0 else 0
+    
+    market_open = is_market_open()
+    
+    result = {
+        'symbol': symbol,
+        'name': name,
+        'currentPrice': round(current_price, 2) if current_price else None,
+        'previousClose': round(previous_close, 2) if previous_close else None,
+        'dayHigh': round(day_high, 2) if day_high else None,
+        'dayLow': round(day_low, 2) if day_low else None,
+        'currentVolume': current_volume,
+        'bidPrice': round(bid_price, 2) if bid_price else None,
+        'askPrice': round(ask_price, 2) if ask_price else None,
+        'spread': round(spread, 2) if spread else None,
+        'spreadPercent': round(spread_percent, 2) if spread_percent else None,
+        'changeAmount': round(change_amount, 2),
+        'changePercent': round(change_percent, 2),
+        'candles': [],  # No candles for real-time only
+        'chartData': {},  # Will be filled if historical data needed
+        'lastUpdated': datetime.now().isoformat(),
+        'signal': 'BUY' if change_percent > 3 else ('SELL' if change_percent < -3 else 'HOLD'),
+        'dataSource': 'Interactive Brokers',
+        'source': 'Interactive Brokers (Real-time Screening)',
+        'isRealData': True,
+        'marketStatus': 'PREMARKET' if is_premarket() else ('OPEN' if market_open else 'CLOSED'),
+        'hasBidAsk': bid_price is not None and ask_price is not None,
+        'realtimeOnly': True,  # Flag to indicate this is real-time only
+        'float': 0,  # Not available in real-time
+        'avgVolume': None  # Would need historical data
+    }
+    
+    return result
+
+def _stock_cache_key(symbol: str, timeframe: str) -> tuple:
+    """Cache key - premarket (useRTH=False) data is kept apart from regular-hours data"""
+    return (symbol, timeframe, not is_premarket())
+
 def fetch_realtime_ibkr(symbol: str) -> Dict[str, Any]:
+    """Real-time screening data, served from stock_cache while fresh (concurrent callers share one fetch)"""
+    return stock_cache.get_or_fetch(
+        _stock_cache_key(symbol, 'quote'),
+        lambda: _fetch_realtime_ibkr_uncached(symbol),
+        stock_cache.quote_ttl
+    )
+
+def _fetch_realtime_ibkr_uncached(symbol: str) -> Dict[str, Any]:
     """Fetch near real-time stock data using 1-minute historical bars (works with Snapshot Bundle)"""
     import time
     fetch_start = time.time()
@@ -1002,8 +1256,8 @@ def fetch_realtime_ibkr(symbol: str) -> Dict[str, Any]:
     logging.info(f"✅ [IBKR REALTIME] [{symbol}] IBKR connected, using 1-minute historical bars (Snapshot Bundle compatible)...")
     
     try:
-        # Create stock contract
-        contract = Stock(symbol, 'SMART', 'USD')
+        # Qualified contract from the registry (no contract details round trip once known)
+        contract = CONTRACT_REGISTRY.get_contract(symbol)
         
         # Use 5-minute historical bars instead of streaming (works with Snapshot Bundle, faster)
         # Get the most recent 5-minute bar which is close to real-time
@@ -1011,106 +1265,28 @@ def fetch_realtime_ibkr(symbol: str) -> Dict[str, Any]:
         in_premarket = is_premarket()
         use_rth = not in_premarket  # False during premarket to get premarket data
         
-        # Try to get real-time market data first (fastest method)
+        # Streamed quote first - answered from memory when the symbol already has a live line
         try:
-            logging.info(f"📡 [IBKR REALTIME] [{symbol}] Trying real-time market data (fastest)...")
-            ticker = IBKR_INSTANCE.reqMktData(contract, '', False, False)
-            IBKR_INSTANCE.sleep(3)  # Wait 3 seconds for data to arrive
+            quote = MARKET_DATA_STREAM.get_quote(symbol)
+            if not quote and MARKET_DATA_STREAM.acquire(symbol, 'on-demand'):
+                # New line: wait for the first tick only, then leave it streaming for the next read
+                try:
+                    quote = MARKET_DATA_STREAM.wait_for_quote(symbol, MKT_DATA_FIRST_TICK_WAIT)
+                finally:
+                    MARKET_DATA_STREAM.release(symbol, 'on-demand')
             
-            # Check if we got valid data
-            if ticker:
-                current_price = None
-                bid_price = None
-                ask_price = None
-                volume = 0
-                
-                # Try to get last price
-                if hasattr(ticker, 'last') and ticker.last:
-                    try:
-                        current_price = float(ticker.last)
-                    except (ValueError, TypeError):
-                        pass
-                
-                # Try bid/ask
-                if hasattr(ticker, 'bid') and ticker.bid:
-                    try:
-                        bid_price = float(ticker.bid)
-                    except (ValueError, TypeError):
-                        pass
-                        
-                if hasattr(ticker, 'ask') and ticker.ask:
-                    try:
-                        ask_price = float(ticker.ask)
-                    except (ValueError, TypeError):
-                        pass
-                
-                # Try volume
-                if hasattr(ticker, 'volume') and ticker.volume:
-                    try:
-                        volume = int(ticker.volume)
-                    except (ValueError, TypeError):
-                        pass
-                
-                # Use bid/ask midpoint if no last price
-                if not current_price and bid_price and ask_price:
-                    current_price = (bid_price + ask_price) / 2
-                elif not current_price and bid_price:
-                    current_price = bid_price
-                elif not current_price and ask_price:
-                    current_price = ask_price
-                
-                if current_price:
-                    logging.info(f"✅ [IBKR REALTIME] [{symbol}] Got real-time quote: ${current_price:.2f}")
-                    # Cancel market data subscription
-                    try:
-                        IBKR_INSTANCE.cancelMktData(contract)
-                    except:
-                        pass
-                    
-                    # Get contract name
-                    try:
-                        contract_details = IBKR_INSTANCE.reqContractDetails(contract)
-                        name = contract_details[0].longName if contract_details and len(contract_details) > 0 else symbol
-                    except:
-                        name = symbol
-                    
-                    # Use real-time data - create minimal stock data
-                    return {
-                        'symbol': symbol,
-                        'name': name,
-                        'currentPrice': round(current_price, 2),
-                        'bidPrice': round(bid_price, 2) if bid_price else None,
-                        'askPrice': round(ask_price, 2) if ask_price else None,
-                        'volume': volume,
-                        'currentVolume': volume,
-                        'dayHigh': current_price,  # Approximate
-                        'dayLow': current_price,   # Approximate
-                        'openPrice': current_price,  # Approximate
-                        'previousClose': current_price,  # Will try to get later
-                        'changePercent': 0.0,  # Will calculate if we get previous close
-                        'changeAmount': 0.0,
-                        'realtimeOnly': True,
-                        'candles': [],  # No candles for real-time only
-                        'chartData': {},
-                        'float': 0,
-                        'avgVolume': None
-                    }
+            if quote:
+                logging.info(f"✅ [IBKR REALTIME] [{symbol}] Got streamed quote: ${quote['price']:.2f} in {time.time() - fetch_start:.3f}s")
+                name = CONTRACT_REGISTRY.get_name(symbol)
+                return _build_realtime_quote_result(symbol, name, quote['price'], quote['bid'], quote['ask'], quote['volume'])
         except Exception as mkt_error:
             logging.warning(f"⚠️ [IBKR REALTIME] [{symbol}] Real-time market data failed: {mkt_error}, trying historical bars...")
         
-        # Fallback to historical bars if real-time fails
+        # Fallback to historical bars if real-time fails (only new bars are downloaded once stored)
         try:
-            bars = IBKR_INSTANCE.reqHistoricalData(
-                contract,
-                endDateTime='',
-                durationStr='1 D',  # Get 1 day of data (IBKR format)
-                barSizeSetting='5 mins',  # Use 5-minute bars (faster, less likely to timeout)
-                whatToShow='TRADES',
-                useRTH=use_rth
-            )
-            IBKR_INSTANCE.sleep(0.3)  # Reduced wait time for faster scanning
+            df = BAR_STORE.get_bars(IBKR_GATEWAY.client('bars'), contract, symbol, '1 D', '5 mins', use_rth)
             
-            if not bars or len(bars) == 0:
+            if df is None:
                 logging.warning(f"⚠️ [IBKR REALTIME] [{symbol}] No 5-minute bars received")
                 return None
         except Exception as hist_error:
@@ -1118,7 +1294,6 @@ def fetch_realtime_ibkr(symbol: str) -> Dict[str, Any]:
             return None
         
         # Get the most recent bar (last one)
-        df = util.df(bars)
         if df.empty:
             logging.warning(f"⚠️ [IBKR REALTIME] [{symbol}] Empty dataframe from historical data")
             return None
@@ -1126,13 +1301,6 @@ def fetch_realtime_ibkr(symbol: str) -> Dict[str, Any]:
         # Use the most recent bar for current price
         latest_bar = df.iloc[-1]
         ticker_last = latest_bar['close']  # Use close of most recent 1-min bar
-        ticker_high = latest_bar['high']
-        ticker_low = latest_bar['low']
-        ticker_volume = latest_bar['volume']
-        
-        # For bid/ask, we'll use the close price as approximation (Snapshot Bundle doesn't provide streaming bid/ask)
-        ticker_bid = ticker_last
-        ticker_ask = ticker_last
         
         # Check if we have valid price data (not NaN)
         import math
@@ -1150,95 +1318,17 @@ def fetch_realtime_ibkr(symbol: str) -> Dict[str, Any]:
         price_str = f"${ticker_last:.2f}" if (ticker_last and not math.isnan(float(ticker_last))) else "N/A"
         logging.info(f"📊 [IBKR REALTIME] [{symbol}] Price: {price_str} (from 5-min bar)")
         
-        # Get real-time prices - handle NaN values
-        import math
-        
-        def safe_float(value):
-            """Safely convert to float, handling NaN"""
-            if value is None:
-                return None
-            try:
-                val = float(value)
-                if math.isnan(val) or math.isinf(val):
-                    return None
-                return val
-            except (ValueError, TypeError):
-                return None
-        
-        def safe_int(value):
-            """Safely convert to int, handling NaN"""
-            if value is None:
-                return None
-            try:
-                val = float(value)
-                if math.isnan(val) or math.isinf(val):
-                    return None
-                return int(val)
-            except (ValueError, TypeError):
-                return None
-        
-        current_price = safe_float(ticker_last) if ticker_last is not None else None
-        bid_price = safe_float(ticker_bid) if ticker_bid is not None else None
-        ask_price = safe_float(ticker_ask) if ticker_ask is not None else None
-        spread = (ask_price - bid_price) if (bid_price and ask_price and bid_price != ask_price) else None
-        spread_percent = (spread / bid_price * 100) if (bid_price and spread and bid_price > 0) else None
-        
-        # Get volume and day stats from 1-minute bar
-        current_volume = safe_int(ticker_volume) if ticker_volume is not None else None
-        day_high = safe_float(ticker_high) if ticker_high is not None else None
-        day_low = safe_float(ticker_low) if ticker_low is not None else None
+        name = CONTRACT_REGISTRY.get_name(symbol)
+        result = _build_realtime_bar_result(symbol, name, latest_bar)
         
         # If we don't have a valid current price, we can't proceed
-        if current_price is None:
+        if result is None:
             elapsed = time.time() - fetch_start
             logging.warning(f"⚠️ [IBKR REALTIME] [{symbol}] No valid price data after {elapsed:.2f}s")
             return None
         
-        # Get contract details for name
-        contract_details = IBKR_INSTANCE.reqContractDetails(contract)
-        name = symbol
-        if contract_details:
-            name = contract_details[0].longName if contract_details[0].longName else symbol
-        
-        # For fast screening, skip previous close fetch (too slow)
-        # Just use current price as previous close (change will be 0%, but stock will still show)
-        previous_close = current_price
-        logging.debug(f"📊 [IBKR REALTIME] [{symbol}] Using current price as previous close for fast screening")
-        
-        change_amount = (current_price - previous_close) if (current_price and previous_close) else 0
-        change_percent = (change_amount / previous_close * 100) if previous_close > 0 else 0
-        
-        market_open = is_market_open()
         total_elapsed = time.time() - fetch_start
         
-        result = {
-            'symbol': symbol,
-            'name': name,
-            'currentPrice': round(current_price, 2) if current_price else None,
-            'previousClose': round(previous_close, 2) if previous_close else None,
-            'dayHigh': round(day_high, 2) if day_high else None,
-            'dayLow': round(day_low, 2) if day_low else None,
-            'currentVolume': current_volume,
-            'bidPrice': round(bid_price, 2) if bid_price else None,
-            'askPrice': round(ask_price, 2) if ask_price else None,
-            'spread': round(spread, 2) if spread else None,
-            'spreadPercent': round(spread_percent, 2) if spread_percent else None,
-            'changeAmount': round(change_amount, 2),
-            'changePercent': round(change_percent, 2),
-            'candles': [],  # No candles for real-time only
-            'chartData': {},  # Will be filled if historical data needed
-            'lastUpdated': datetime.now().isoformat(),
-            'signal': 'BUY' if change_percent > 3 else ('SELL' if change_percent < -3 else 'HOLD'),
-            'dataSource': 'Interactive Brokers',
-            'source': 'Interactive Brokers (Real-time Screening)',
-            'isRealData': True,
-            'marketStatus': 'PREMARKET' if is_premarket() else ('OPEN' if market_open else 'CLOSED'),
-            'hasBidAsk': bid_price is not None and ask_price is not None,
-            'realtimeOnly': True,  # Flag to indicate this is real-time only
-            'float': 0,  # Not available in real-time
-            'avgVolume': None  # Would need historical data
-        }
-        
         logging.info(f"✅ [IBKR REALTIME] [{symbol}] Real-time data complete in {total_elapsed:.2f}s")
         logging.info(f"📊 [IBKR REALTIME] [{symbol}] Final data: price=${result['currentPrice']}, change={result['changePercent']}%, volume={result['currentVolume']}")
         
@@ -1250,7 +1340,223 @@ def fetch_realtime_ibkr(symbol: str) -> Dict[str, Any]:
         logging.error(f"❌ [IBKR REALTIME] [{symbol}] Traceback:\n{traceback.format_exc()}")
         return None
 
+async def _fetch_realtime_ibkr_async(symbol: str, quote_wait: float) -> Optional[Dict[str, Any]]:
+    """
+    Async twin of fetch_realtime_ibkr for concurrent scans.
+    Reads the streamed quote (waiting only for a new line's first tick), then falls back to the latest 5-minute bar.
+    """
+    entry = await CONTRACT_REGISTRY.resolve_async(symbol)
+    contract = CONTRACT_REGISTRY.get_contract(symbol, resolve=False)
+    name = entry['longName'] if entry else symbol
+    
+    # Streamed quote first - active symbols are already subscribed, new ones wait for their first tick
+    try:
+        quote = MARKET_DATA_STREAM.get_quote(symbol)
+        if not quote and MARKET_DATA_STREAM.acquire(symbol, 'on-demand'):
+            try:
+                quote_deadline = time.time() + quote_wait
+                while not quote and time.time() < quote_deadline:
+                    await asyncio.sleep(0.1)
+                    quote = MARKET_DATA_STREAM.get_quote(symbol)
+            finally:
+                MARKET_DATA_STREAM.release(symbol, 'on-demand')
+        
+        if quote:
+            logging.info(f"✅ [IBKR BATCH] [{symbol}] Got streamed quote: ${quote['price']:.2f}")
+            return _build_realtime_quote_result(symbol, name, quote['price'], quote['bid'], quote['ask'], quote['volume'])
+    except Exception as mkt_error:
+        logging.warning(f"⚠️ [IBKR BATCH] [{symbol}] Real-time market data failed: {mkt_error}, trying historical bars...")
+    
+    # Fallback to the most recent 5-minute bar
+    df = await BAR_STORE.get_bars_async(IBKR_INSTANCE, contract, symbol, '1 D', '5 mins', not is_premarket())
+    if df is None or df.empty:
+        logging.warning(f"⚠️ [IBKR BATCH] [{symbol}] No 5-minute bars received")
+        return None
+    
+    return _build_realtime_bar_result(symbol, name, df.iloc[-1])
+
+def fetch_realtime_ibkr_batch(symbols: List[str], concurrency: int = None, symbol_deadline: float = None) -> Dict[str, Dict[str, Any]]:
+    """
+    Fetch real-time screening data for many symbols at once on the ib_insync event loop.
+    
+    At most `concurrency` symbols are in flight at a time and each symbol gets `symbol_deadline`
+    seconds before it is dropped, so a scan costs roughly one symbol's latency per batch.
+    
+    Goes through stock_cache like fetch_realtime_ibkr: fresh quotes come from the cache and
+    symbols another scan (or a single-symbol fetch) is already fetching are waited for, so
+    concurrent scans share one IBKR request per symbol.
+    
+    Returns:
+        {symbol: stock_data} for every symbol that produced data in time
+    """
+    concurrency = max(1, int(concurrency or SCAN_CONCURRENCY))
+    symbol_deadline = float(symbol_deadline or SCAN_SYMBOL_DEADLINE)
+    keys = {_stock_cache_key(symbol, 'quote'): symbol for symbol in symbols}
+    
+    def fetch_missing(missing: List[tuple]) -> Dict[tuple, Dict[str, Any]]:
+        fetched = _fetch_realtime_ibkr_batch_uncached([keys[key] for key in missing], concurrency, symbol_deadline)
+        return {key: fetched.get(keys[key]) for key in missing}
+    
+    results = stock_cache.get_or_fetch_many(keys, fetch_missing, stock_cache.quote_ttl)
+    return {keys[key]: data for key, data in results.items()}
+
+def _fetch_realtime_ibkr_batch_uncached(symbols: List[str], concurrency: int, symbol_deadline: float) -> Dict[str, Dict[str, Any]]:
+    """The IBKR side of fetch_realtime_ibkr_batch"""
+    batch_start = time.time()
+    if not IBKR_AVAILABLE or not connect_ibkr():
+        logging.warning(f"⚠️ [IBKR BATCH] IBKR not connected - cannot fetch {len(symbols)} symbols")
+        return {}
+    
+    # Leave time for the historical fallback inside the per-symbol deadline
+    quote_wait = min(3.0, symbol_deadline / 2)
+    
+    async def fetch_one(semaphore, symbol):
+        async with semaphore:
+            symbol_start = time.time()
+            try:
+                data = await asyncio.wait_for(_fetch_realtime_ibkr_async(symbol, quote_wait), symbol_deadline)
+                logging.info(f"📡 [IBKR BATCH] [{symbol}] {'Data received' if data else 'No data'} in {time.time() - symbol_start:.2f}s")
+                return symbol, data
+            except asyncio.TimeoutError:
+                logging.warning(f"⏱️ [IBKR BATCH] [{symbol}] Deadline of {symbol_deadline:.1f}s exceeded, skipping")
+            except Exception as e:
+                logging.warning(f"⚠️ [IBKR BATCH] [{symbol}] Fetch failed: {e}")
+            return symbol, None
+    
+    async def fetch_all():
+        semaphore = asyncio.Semaphore(concurrency)
+        return await asyncio.gather(*(fetch_one(semaphore, symbol) for symbol in symbols))
+    
+    logging.info(f"📡 [IBKR BATCH] Fetching {len(symbols)} symbols (concurrency={concurrency}, deadline={symbol_deadline:.1f}s/symbol)...")
+    try:
+        # Runs as one task on the gateway worker - queued orders are still served while it waits on IBKR
+        pairs = IBKR_GATEWAY.call('scan', fetch_all)
+    except Exception as e:
+        logging.error(f"❌ [IBKR BATCH] Batch fetch failed: {e}")
+        return {}
+    
+    results = {symbol: data for symbol, data in pairs if data}
+    logging.info(f"✅ [IBKR BATCH] {len(results)}/{len(symbols)} symbols fetched in {time.time() - batch_start:.2f}s")
+    return results
+
+def _resample_bars(df: pd.DataFrame, rule: str = '1h') -> pd.DataFrame:
+    """Aggregate util.df bars into `rule` buckets, each labelled with the time of its first bar"""
+    buckets = pd.to_datetime(df['date'], utc=True).dt.floor(rule)
+    grouped = df.groupby(buckets.to_numpy(), sort=True)
+    return pd.DataFrame({
+        'date': grouped['date'].first(),
+        'open': grouped['open'].first(),
+        'high': grouped['high'].max(),
+        'low': grouped['low'].min(),
+        'close': grouped['close'].last(),
+        'volume': grouped['volume'].sum()
+    }).reset_index(drop=True)
+
+def _build_mover_stock_data(symbol: str, df_5m: pd.DataFrame) -> Optional[Dict[str, Any]]:
+    """
+    Market mover data from a single 2-day 5-minute bar request.
+    The 24h chart is the same bars resampled to 1 hour, matching fetch_from_ibkr(symbol, '24h').
+    """
+    df_5m = df_5m.dropna(subset=['close'])
+    if df_5m.empty:
+        return None
+    df_1h = _resample_bars(df_5m, '1h')
+    
+    candles_5m = bars_to_candles(df_5m)
+    candles_24h = bars_to_candles(df_1h)
+    
+    current_price = float(df_1h['close'].iloc[-1])
+    previous_close = float(df_1h['close'].iloc[0])
+    change_amount = current_price - previous_close
+    change_percent = (change_amount / previous_close * 100) if previous_close > 0 else 0
+    
+    return {
+        'symbol': symbol,
+        'name': CONTRACT_REGISTRY.get_name(symbol, resolve=False),
+        'currentPrice': round(current_price, 2),
+        'previousClose': round(previous_close, 2),
+        'openPrice': round(float(df_1h['open'].iloc[-1]), 2),
+        'dayHigh': round(float(df_1h['high'].max()), 2),
+        'dayLow': round(float(df_1h['low'].min()), 2),
+        'volume': int(df_1h['volume'].sum()),
+        'avgVolume': int(df_1h['volume'].mean()),
+        'float': 0,
+        'changeAmount': round(change_amount, 2),
+        'changePercent': round(change_percent, 2),
+        'candles': candles_24h,
+        'chartData': {'24h': candles_24h, '5m': candles_5m},
+        'signal': 'BUY' if change_percent > 3 else ('SELL' if change_percent < -3 else 'HOLD'),
+        'lastUpdated': datetime.now().isoformat()
+    }
+
+async def _fetch_mover_async(symbol: str) -> Optional[Dict[str, Any]]:
+    """One historical request per mover - no quote, contract details, news or separate 24h request"""
+    df = await BAR_STORE.get_bars_async(
+        IBKR_INSTANCE, CONTRACT_REGISTRY.get_contract(symbol, resolve=False),
+        symbol, '2 D', '5 mins', not is_premarket()
+    )
+    if df is None or df.empty:
+        return None
+    return _build_mover_stock_data(symbol, df)
+
+def iter_market_movers(symbols: List[str], concurrency: int = None, symbol_deadline: float = None):
+    """
+    Fetch market mover data for many symbols, yielding (symbol, stock_data) as each one finishes.
+    
+    Cached symbols are yielded first. The rest are requested concurrently, at most `concurrency`
+    at a time, and a symbol that misses `symbol_deadline` is yielded with None.
+    """
+    concurrency = max(1, int(concurrency or MOVERS_CONCURRENCY))
+    symbol_deadline = float(symbol_deadline or MOVERS_SYMBOL_DEADLINE)
+    
+    pending = []
+    for symbol in symbols:
+        data = stock_cache.get(_stock_cache_key(symbol, 'movers'))
+        if data:
+            yield symbol, data
+        else:
+            pending.append(symbol)
+    if not pending:
+        return
+    
+    if not IBKR_AVAILABLE or not connect_ibkr():
+        logging.warning(f"⚠️ [MOVERS] IBKR not connected - cannot fetch {len(pending)} symbols")
+        return
+    
+    async def fetch_one(semaphore, symbol):
+        async with semaphore:
+            try:
+                return symbol, await asyncio.wait_for(_fetch_mover_async(symbol), symbol_deadline)
+            except asyncio.TimeoutError:
+                logging.warning(f"⏱️ [MOVERS] [{symbol}] Deadline of {symbol_deadline:.1f}s exceeded, skipping")
+            except Exception as e:
+                logging.warning(f"⚠️ [MOVERS] [{symbol}] Fetch failed: {e}")
+            return symbol, None
+    
+    logging.info(f"📡 [MOVERS] Fetching {len(pending)} symbols (concurrency={concurrency}, {len(symbols) - len(pending)} cached)...")
+    # One task per symbol on the gateway worker; this thread only waits on the futures
+    semaphore = asyncio.Semaphore(concurrency)
+    futures = [IBKR_GATEWAY.submit('scan', fetch_one, semaphore, symbol) for symbol in pending]
+    try:
+        for future in concurrent.futures.as_completed(futures):
+            symbol, data = future.result()
+            if data:
+                stock_cache.put(_stock_cache_key(symbol, 'movers'), data, stock_cache.bar_ttl)
+            yield symbol, data
+    finally:
+        # Client went away mid-stream - don't leave requests running
+        for future in futures:
+            IBKR_GATEWAY.cancel(future)
+
 def fetch_from_ibkr(symbol: str, timeframe: str = '5m') -> Dict[str, Any]:
+    """Full historical stock data, served from stock_cache while fresh (concurrent callers share one fetch)"""
+    return stock_cache.get_or_fetch(
+        _stock_cache_key(symbol, timeframe),
+        lambda: _fetch_from_ibkr_uncached(symbol, timeframe),
+        stock_cache.bar_ttl
+    )
+
+def _fetch_from_ibkr_uncached(symbol: str, timeframe: str = '5m') -> Dict[str, Any]:
     """Fetch stock data from Interactive Brokers API (DEFAULT - Full historical data)"""
     try:
         if not IBKR_AVAILABLE:
@@ -1293,8 +1599,8 @@ def fetch_from_ibkr(symbol: str, timeframe: str = '5m') -> Dict[str, Any]:
         
         duration, bar_size = timeframe_map.get(timeframe, ('2 D', '5 mins'))  # Default to 2 days
         
-        # Create stock contract
-        contract = Stock(symbol, 'SMART', 'USD')
+        # Qualified contract from the registry (resolved once per symbol)
+        contract = CONTRACT_REGISTRY.get_contract(symbol)
         
         # Request historical data - include yesterday's data
         in_premarket = is_premarket()
@@ -1315,32 +1621,31 @@ def fetch_from_ibkr(symbol: str, timeframe: str = '5m') -> Dict[str, Any]:
         # When market is closed, use useRTH=True to get last regular session data
         use_rth = not in_premarket  # False during premarket to get premarket data, True otherwise
         
-        bars = IBKR_INSTANCE.reqHistoricalData(
-            contract,
-            endDateTime='',
-            durationStr=duration,
-            barSizeSetting=bar_size,
-            whatToShow='TRADES',
-            useRTH=use_rth  # False during premarket to include premarket data
-        )
+        # Bars come from the bar store - after the first download only the gap since the last bar is requested.
+        # Daily timeframes are sliced from the on-disk history cache instead.
+        if bar_size == '1 day':
+            df = HISTORY_CACHE.get_daily_bars(IBKR_GATEWAY.client('bars'), contract, symbol, duration, use_rth)
+        else:
+            df = BAR_STORE.get_bars(IBKR_GATEWAY.client('bars'), contract, symbol, duration, bar_size, use_rth)
         
-        if not bars:
+        if df is None:
             logging.warning(f"⚠️ No data returned from IBKR for {symbol}")
             _adjust_delay_on_error("No data returned")
             return None
         
-        # Convert to DataFrame
-        df = util.df(bars)
-        
         if df.empty:
             logging.warning(f"⚠️ Empty DataFrame from IBKR for {symbol}")
             _adjust_delay_on_error("Empty DataFrame")
             return None
         
-        # Get current quote with bid/ask data
-        IBKR_INSTANCE.reqMktData(contract, '', False, False)
-        ticker = IBKR_INSTANCE.ticker(contract)
-        IBKR_INSTANCE.sleep(0.3)  # Further reduced wait time for faster scanning
+        # Get current quote with bid/ask data from the streaming pool (a new line gets a short first-tick wait)
+        quote = MARKET_DATA_STREAM.get_quote(symbol)
+        if not quote and MARKET_DATA_STREAM.acquire(symbol, 'on-demand'):
+            try:
+                quote = MARKET_DATA_STREAM.wait_for_quote(symbol, 0.3)
+            finally:
+                MARKET_DATA_STREAM.release(symbol, 'on-demand')
+        quote = quote or {}
         
         # Helper function to safely convert values, handling NaN
         import math
@@ -1368,8 +1673,8 @@ def fetch_from_ibkr(symbol: str, timeframe: str = '5m') -> Dict[str, Any]:
             except (ValueError, TypeError):
                 return default
         
-        # Get current price - prefer ticker.last, fallback to historical close
-        ticker_price = safe_float_convert(ticker.last) if ticker.last else None
+        # Get current price - prefer the last trade, fallback to historical close
+        ticker_price = safe_float_convert(quote.get('last'))
         hist_close = safe_float_convert(df['close'].iloc[-1]) if len(df) > 0 else None
         current_price = ticker_price if ticker_price else hist_close
         
@@ -1380,54 +1685,29 @@ def fetch_from_ibkr(symbol: str, timeframe: str = '5m') -> Dict[str, Any]:
         previous_close = safe_float_convert(df['close'].iloc[0]) if len(df) > 0 else current_price
         
         # Get bid/ask spread data (if available)
-        bid_price = safe_float_convert(ticker.bid) if ticker.bid else None
-        ask_price = safe_float_convert(ticker.ask) if ticker.ask else None
+        bid_price = safe_float_convert(quote.get('bid'))
+        ask_price = safe_float_convert(quote.get('ask'))
         spread = (ask_price - bid_price) if (bid_price and ask_price) else None
         spread_percent = (spread / bid_price * 100) if (bid_price and spread and bid_price > 0) else None
         
         # Get real-time volume (current day)
-        current_volume = safe_int_convert(ticker.volume) if ticker.volume else None
-        ticker_high = safe_float_convert(ticker.high) if ticker.high else None
-        ticker_low = safe_float_convert(ticker.low) if ticker.low else None
+        current_volume = safe_int_convert(quote.get('volume')) if quote.get('volume') else None
+        ticker_high = safe_float_convert(quote.get('high'))
+        ticker_low = safe_float_convert(quote.get('low'))
         hist_high = safe_float_convert(df['high'].max()) if len(df) > 0 else None
         hist_low = safe_float_convert(df['low'].min()) if len(df) > 0 else None
         day_high = ticker_high if ticker_high else (hist_high if hist_high else current_price)
         day_low = ticker_low if ticker_low else (hist_low if hist_low else current_price)
         
-        # Convert to candles format - handle NaN values
-        candles = []
-        for idx, row in df.iterrows():
-            try:
-                open_val = safe_float_convert(row['open'], 0)
-                high_val = safe_float_convert(row['high'], 0)
-                low_val = safe_float_convert(row['low'], 0)
-                close_val = safe_float_convert(row['close'], 0)
-                vol_val = safe_int_convert(row['volume'], 0)
-                
-                # Skip candles with invalid data
-                if open_val == 0 and high_val == 0 and low_val == 0 and close_val == 0:
-                    continue
-                
-                candles.append({
-                    'time': idx.isoformat() if hasattr(idx, 'isoformat') else str(idx),
-                    'open': round(open_val, 2),
-                    'high': round(high_val, 2),
-                    'low': round(low_val, 2),
-                    'close': round(close_val, 2),
-                    'volume': vol_val
-                })
-            except Exception as e:
-                logging.warning(f"⚠️ [IBKR] [{symbol}] Error converting candle data: {e}")
-                continue
+        # Convert to candles format - NaN prices become 0 and all-zero bars are dropped
+        candles = bars_to_candles(df)
         
         change_amount = current_price - previous_close
         change_percent = (change_amount / previous_close * 100) if previous_close > 0 else 0
         
-        # Get contract details for additional info
-        contract_details = IBKR_INSTANCE.reqContractDetails(contract)
-        name = symbol
-        if contract_details:
-            name = contract_details[0].longName if contract_details[0].longName else symbol
+        # Name and conId come from the contract registry
+        name = CONTRACT_REGISTRY.get_name(symbol)
+        con_id = CONTRACT_REGISTRY.get_con_id(symbol)
         
         # Always fetch 24h data for AI study (if not already fetching 24h)
         chart_data = {timeframe: candles}
@@ -1439,46 +1719,12 @@ def fetch_from_ibkr(symbol: str, timeframe: str = '5m') -> Dict[str, Any]:
                 # Request 24h data with 1-hour bars
                 # During premarket, include premarket data (useRTH=False)
                 in_premarket = is_premarket()
-                hist_24h = IBKR_INSTANCE.reqHistoricalData(
-                    contract,
-                    endDateTime='',
-                    durationStr='1 D',
-                    barSizeSetting='1 hour',
-                    whatToShow='TRADES',
-                    useRTH=not in_premarket  # False during premarket to include premarket data
-                )
-                IBKR_INSTANCE.sleep(0.5)  # Wait for data
+                df_24h = BAR_STORE.get_bars(IBKR_GATEWAY.client('bars'), contract, symbol, '1 D', '1 hour', not in_premarket)
                 
-                if hist_24h and len(hist_24h) > 0:
-                    df_24h = util.df(hist_24h)
-                    if not df_24h.empty:
-                        for idx, row in df_24h.iterrows():
-                            try:
-                                open_val = safe_float_convert(row['open'], 0)
-                                high_val = safe_float_convert(row['high'], 0)
-                                low_val = safe_float_convert(row['low'], 0)
-                                close_val = safe_float_convert(row['close'], 0)
-                                vol_val = safe_int_convert(row['volume'], 0)
-                                
-                                # Skip invalid candles
-                                if open_val == 0 and high_val == 0 and low_val == 0 and close_val == 0:
-                                    continue
-                                
-                                candles_24h.append({
-                                    'time': idx.isoformat() if hasattr(idx, 'isoformat') else str(idx),
-                                    'open': round(open_val, 2),
-                                    'high': round(high_val, 2),
-                                    'low': round(low_val, 2),
-                                    'close': round(close_val, 2),
-                                    'volume': vol_val
-                                })
-                            except Exception as e:
-                                logging.warning(f"⚠️ [IBKR] [{symbol}] Error converting 24h candle: {e}")
-                                continue
-                        chart_data['24h'] = candles_24h
-                        logging.info(f"✅ Added 24h data to {symbol} ({len(candles_24h)} candles)")
-                    else:
-                        logging.warning(f"⚠️ Empty DataFrame for 24h data of {symbol}")
+                if df_24h is not None and not df_24h.empty:
+                    candles_24h = bars_to_candles(df_24h)
+                    chart_data['24h'] = candles_24h
+                    logging.info(f"✅ Added 24h data to {symbol} ({len(candles_24h)} candles)")
                 else:
                     logging.warning(f"⚠️ No 24h bars returned from IBKR for {symbol}")
             except Exception as e:
@@ -1498,18 +1744,16 @@ def fetch_from_ibkr(symbol: str, timeframe: str = '5m') -> Dict[str, Any]:
         # Fetch IBKR news for this stock
         ibkr_news = []
         try:
-            # Get contract details first to get conId
-            if contract_details and len(contract_details) > 0:
-                con_id = contract_details[0].contract.conId
+            # News headlines are requested by conId
+            if con_id:
                 logging.info(f"📰 Fetching IBKR news for {symbol} (conId: {con_id})...")
                 
                 # Request news headlines
-                news_headlines = IBKR_INSTANCE.reqNewsHeadlines(
+                news_headlines = IBKR_GATEWAY.client('news').reqNewsHeadlines(
                     con_id,
                     '',
                     ''
                 )
-                IBKR_INSTANCE.sleep(0.5)  # Wait for news data
                 
                 if news_headlines and len(news_headlines) > 0:
                     for headline in news_headlines[:5]:  # Limit to 5 most recent
@@ -1742,16 +1986,7 @@ class StockScanner:
                 logging.info(f"📊 Also fetching 24h data for {symbol} (AI study)...")
                 hist_24h = ticker.history(period='1d', interval='1h')
                 if not hist_24h.empty and len(hist_24h) > 0:
-                    candles_24h = []
-                    for idx, row in hist_24h.iterrows():
-                        candles_24h.append({
-                            'time': idx.isoformat(),
-                            'open': round(float(row['Open']), 2),
-                            'high': round(float(row['High']), 2),
-                            'low': round(float(row['Low']), 2),
-                            'close': round(float(row['Close']), 2),
-                            'volume': int(row['Volume'])
-                        })
+                    candles_24h = bars_to_candles(hist_24h, YAHOO_COLUMNS, drop_empty=False)
                     logging.info(f"✅ Fetched {len(candles_24h)} candles of 24h data for {symbol}")
             except Exception as e:
                 logging.warning(f"⚠️ Could not fetch 24h data for {symbol}: {e}")
@@ -1785,19 +2020,23 @@ class StockScanner:
                 logging.info(f"📊 Fetching 24h data for {symbol} (AI study)...")
                 hist_24h = ticker.history(period='1d', interval='1h')
                 if not hist_24h.empty and len(hist_24h) > 0:
-                    for idx, row in hist_24h.iterrows():
-                        candles_24h.append({
-                            'time': idx.isoformat(),
-                            'open': round(float(row['Open']), 2),
-                            'high': round(float(row['High']), 2),
-                            'low': round(float(row['Low']), 2),
-                            'close': round(float(row['Close']), 2),
-                            'volume': int(row['Volume'])
-                        })
+                    candles_24h = bars_to_candles(hist_24h, YAHOO_COLUMNS, drop_empty=False)
                     logging.info(f"✅ Fetched {len(candles_24h)} candles of 24h data for {symbol}")
             except Exception as e:
                 logging.warning(f"⚠️ Could not fetch 24h data for {symbol}: {e}")
         
+        # Calculate moving averages (only reported once the full window is available)
+        closes = hist['Close']
+        ma20 = closes.rolling(window=20, min_periods=20).mean().round(2)
+        ma50 = closes.rolling(window=50, min_periods=50).mean().round(2)
+        ma200 = closes.rolling(window=200, min_periods=200).mean().round(2)
+        
+        # Prepare candlestick data with MAs
+        candles = bars_to_candles(
+            hist, YAHOO_COLUMNS, decimals=None, drop_empty=False,
+            extra_columns={'ma20': ma20, 'ma50': ma50, 'ma200': ma200}
+        )
+        
         # Prepare chart data with 24h data included
         chart_data = {timeframe: candles}
         if candles_24h:
@@ -1806,34 +2045,6 @@ class StockScanner:
         elif timeframe == '24h':
             chart_data['24h'] = candles
         
-        # Calculate moving averages
-        closes = hist['Close']
-        ma20 = closes.rolling(window=20, min_periods=1).mean()
-        ma50 = closes.rolling(window=50, min_periods=1).mean()
-        ma200 = closes.rolling(window=200, min_periods=1).mean()
-        
-        # Prepare candlestick data with MAs
-        candles = []
-        for i, (idx, row) in enumerate(hist.iterrows()):
-            candle = {
-                'time': idx.isoformat(),
-                'open': float(row['Open']),
-                'high': float(row['High']),
-                'low': float(row['Low']),
-                'close': float(row['Close']),
-                'volume': int(row['Volume'])
-            }
-            
-            # Add moving averages if available
-            if i >= 19:  # At least 20 periods for MA20
-                candle['ma20'] = round(float(ma20.iloc[i]), 2)
-            if i >= 49:  # At least 50 periods for MA50
-                candle['ma50'] = round(float(ma50.iloc[i]), 2)
-            if i >= 199:  # At least 200 periods for MA200
-                candle['ma200'] = round(float(ma200.iloc[i]), 2)
-            
-            candles.append(candle)
-        
         return {
             'symbol': symbol,
             'name': info.get('longName', symbol),
@@ -1881,10 +2092,11 @@ class StockScanner:
         with active_symbols_lock:
             scan_symbols = list(active_symbols)
         
-        # Limit to first 3 symbols to get more results (with increased timeout)
-        if len(scan_symbols) > 3:
-            scan_symbols = scan_symbols[:3]
-            logging.info(f"🔍 [SCANNER] Limited scan to 3 symbols to balance speed and results")
+        # Concurrent mode covers every active symbol; serial mode keeps the old cap
+        concurrent_scan = criteria.get('concurrentScan', SCAN_CONCURRENT_MODE)
+        if not concurrent_scan and len(scan_symbols) > SERIAL_SCAN_SYMBOL_LIMIT:
+            scan_symbols = scan_symbols[:SERIAL_SCAN_SYMBOL_LIMIT]
+            logging.info(f"🔍 [SCANNER] Limited serial scan to {SERIAL_SCAN_SYMBOL_LIMIT} symbols to balance speed and results")
         
         logging.info(f"🔍 [SCANNER] Scanning {len(scan_symbols)} symbols: {', '.join(scan_symbols)}")
         
@@ -1914,12 +2126,24 @@ class StockScanner:
         logging.info(f"✅ [SCANNER] IBKR is connected and ready")
         
         # OPTION 2: Real-time Screening (DEFAULT) - Fast, 10-20 stocks per minute
-        logging.info(f"🔍 [SCANNER] Starting REAL-TIME screening (10-20 stocks/min)")
+        if concurrent_scan:
+            logging.info(f"🔍 [SCANNER] Starting CONCURRENT real-time screening ({len(scan_symbols)} symbols in one batch)")
+        else:
+            logging.info(f"🔍 [SCANNER] Starting REAL-TIME screening (10-20 stocks/min)")
         
         results = []
         newly_added = []
         symbol_count = 0
         
+        # Concurrent mode: fetch every symbol up front as one bounded batch
+        prefetched = {}
+        if concurrent_scan:
+            prefetched = fetch_realtime_ibkr_batch(
+                scan_symbols,
+                concurrency=criteria.get('scanConcurrency', SCAN_CONCURRENCY),
+                symbol_deadline=criteria.get('symbolDeadline', SCAN_SYMBOL_DEADLINE)
+            )
+        
         for symbol in scan_symbols:
             symbol_count += 1
             symbol_start = time.time()
@@ -1927,31 +2151,37 @@ class StockScanner:
             
             # Add timeout protection for each symbol (max 60 seconds per symbol to allow for slow IBKR responses)
             stock_data = None
-            try:
-                # Use real-time screening first (FAST - reqMktData)
+            if concurrent_scan:
+                stock_data = prefetched.get(symbol)
+                if stock_data is None:
+                    logging.info(f"⚠️ [SCANNER] [{symbol}] No data within the per-symbol deadline, skipping")
+                    continue
+            else:
                 try:
-                    logging.info(f"📡 [SCANNER] [{symbol}] Fetching real-time data (fast mode)...")
-                    stock_data = fetch_realtime_ibkr(symbol)
-                    if stock_data:
-                        logging.info(f"✅ [SCANNER] [{symbol}] Real-time data received")
-                except Exception as rt_error:
-                    logging.warning(f"⚠️ [SCANNER] [{symbol}] Real-time fetch failed: {rt_error}")
-                
-                # If real-time fails, fall back to full historical data (with timeout)
-                if not stock_data:
-                    logging.info(f"📊 [SCANNER] [{symbol}] Real-time unavailable, trying historical data...")
+                    # Use real-time screening first (FAST - reqMktData)
                     try:
-                        stock_data = self.get_stock_data(symbol, timeframe)
+                        logging.info(f"📡 [SCANNER] [{symbol}] Fetching real-time data (fast mode)...")
+                        stock_data = fetch_realtime_ibkr(symbol)
                         if stock_data:
-                            logging.info(f"✅ [SCANNER] [{symbol}] Historical data received")
-                    except Exception as hist_error:
-                        logging.warning(f"⚠️ [SCANNER] [{symbol}] Historical data fetch failed: {hist_error}")
+                            logging.info(f"✅ [SCANNER] [{symbol}] Real-time data received")
+                    except Exception as rt_error:
+                        logging.warning(f"⚠️ [SCANNER] [{symbol}] Real-time fetch failed: {rt_error}")
+                
+                    # If real-time fails, fall back to full historical data (with timeout)
+                    if not stock_data:
+                        logging.info(f"📊 [SCANNER] [{symbol}] Real-time unavailable, trying historical data...")
+                        try:
+                            stock_data = self.get_stock_data(symbol, timeframe)
+                            if stock_data:
+                                logging.info(f"✅ [SCANNER] [{symbol}] Historical data received")
+                        except Exception as hist_error:
+                            logging.warning(f"⚠️ [SCANNER] [{symbol}] Historical data fetch failed: {hist_error}")
                         
-            except Exception as symbol_error:
-                symbol_elapsed = time.time() - symbol_start
-                logging.error(f"❌ [SCANNER] [{symbol}] Error after {symbol_elapsed:.2f}s: {symbol_error}")
-                # Continue to next symbol - don't fail entire scan
-                continue
+                except Exception as symbol_error:
+                    symbol_elapsed = time.time() - symbol_start
+                    logging.error(f"❌ [SCANNER] [{symbol}] Error after {symbol_elapsed:.2f}s: {symbol_error}")
+                    # Continue to next symbol - don't fail entire scan
+                    continue
             
             if stock_data is None:
                 continue
@@ -2244,7 +2474,10 @@ def scan_stocks():
             'autoAdjusted': True,
             'mode': 'IBKR_REALTIME_SCREENING',  # Option 2: Real-time screening (default)
             'scanSpeed': '10-20 stocks per minute',
-            'method': 'reqMktData (real-time quotes)'
+            'method': 'reqMktData (real-time quotes)',
+            'concurrentScan': SCAN_CONCURRENT_MODE,
+            'scanConcurrency': SCAN_CONCURRENCY,
+            'symbolDeadline': SCAN_SYMBOL_DEADLINE
         }
         
         logging.info(f"✅ [SCANNER API] IBKR Status: connected={ibkr_connected}, port={IBKR_PORT}")
@@ -2272,104 +2505,82 @@ def scan_stocks():
             'error': error_msg
         }), 500
 
+def _format_mover(stock_data: Dict[str, Any]) -> Dict[str, Any]:
+    """Market movers response entry for one stock"""
+    change_percent = stock_data.get('changePercent', 0)
+    return {
+        'symbol': stock_data['symbol'],
+        'name': stock_data['name'],
+        'currentPrice': stock_data['currentPrice'],
+        'previousClose': stock_data['previousClose'],
+        'changeAmount': stock_data['changeAmount'],
+        'changePercent': stock_data['changePercent'],
+        'volume': stock_data['volume'],
+        'avgVolume': stock_data['avgVolume'],
+        'float': stock_data.get('float', 0),
+        'dayHigh': stock_data['dayHigh'],
+        'dayLow': stock_data['dayLow'],
+        'openPrice': stock_data['openPrice'],
+        'candles': stock_data.get('candles', []),  # 24h candles as primary
+        'chartData': stock_data.get('chartData', {}),  # Includes both 24h and 5m
+        'source': f'Interactive Brokers - Real 24h Data for AI Study',
+        'isHot': abs(change_percent) > 5,
+        'signal': stock_data.get('signal', 'HOLD'),
+        'has24hData': '24h' in stock_data.get('chartData', {}),
+        'has5mData': '5m' in stock_data.get('chartData', {})
+    }
+
+def _sort_movers(stocks: List[Dict[str, Any]], movers_type: str) -> List[Dict[str, Any]]:
+    """Sort movers for the requested type and drop the ones that don't match it"""
+    if movers_type == 'gainers':
+        stocks = sorted(stocks, key=lambda x: x['changePercent'], reverse=True)
+        return [s for s in stocks if s['changePercent'] >= 0]
+    if movers_type == 'losers':
+        stocks = sorted(stocks, key=lambda x: x['changePercent'])
+        return [s for s in stocks if s['changePercent'] <= 0]
+    if movers_type == 'active':
+        return sorted(stocks, key=lambda x: x['volume'], reverse=True)
+    return stocks
+
 @app.route('/api/market-movers', methods=['GET'])
 def get_market_movers():
     """Fetch real market movers from Interactive Brokers ONLY"""
     try:
         movers_type = request.args.get('type', 'gainers')  # gainers, losers, active
+        stream = request.args.get('stream', 'false').lower() == 'true'  # SSE: one event per stock as it arrives
         
         if not IBKR_AVAILABLE:
             return jsonify({
                 'success': False,
-                'error': 'Interactive Brokers API not available. Install ib-insync: pip install ib-insync'
-            }), 500
-        
-        if not connect_ibkr():
-            return jsonify({
-                'success': False,
-                'error': f'Cannot connect to Interactive Brokers. Make sure TWS/IB Gateway is running and logged in as {IBKR_USERNAME}'
-            }), 500
-        
-        # Use IBKR to get market movers
-        # Get popular symbols and fetch their data
-        popular_symbols = ['AAPL', 'MSFT', 'GOOGL', 'AMZN', 'TSLA', 'META', 'NVDA', 'AMD', 'NFLX', 'INTC',
-                          'GME', 'AMC', 'PLTR', 'SOFI', 'NIO', 'LCID', 'ATER', 'BBIG', 'SPY', 'QQQ']
-        
-        stocks = []
-        
-        # Fetch ALL popular symbols with 24h data for AI study
-        for symbol in popular_symbols:  # Process all symbols
-            try:
-                # Fetch from IBKR with 24h timeframe (ensures 24h data for AI study)
-                logging.info(f"📊 Fetching {symbol} with 24h data for AI study...")
-                stock_data = fetch_from_ibkr(symbol, '24h')
-                if not stock_data:
-                    logging.warning(f"⚠️ No data for {symbol}, skipping...")
-                    continue
-                
-                # Ensure 24h data is in chartData
-                if '24h' not in stock_data.get('chartData', {}):
-                    if stock_data.get('candles'):
-                        stock_data['chartData']['24h'] = stock_data['candles']
-                        logging.info(f"✅ Added 24h data to chartData for {symbol}")
-                
-                # Also fetch 5m data for detailed view
-                if '5m' not in stock_data.get('chartData', {}):
-                    try:
-                        stock_5m = fetch_from_ibkr(symbol, '5m')
-                        if stock_5m and stock_5m.get('candles'):
-                            stock_data['chartData']['5m'] = stock_5m['candles']
-                            logging.info(f"✅ Added 5m data to chartData for {symbol}")
-                    except Exception as e:
-                        logging.warning(f"⚠️ Could not fetch 5m data for {symbol}: {e}")
-                
-                # Filter based on movers type (but still include all for study)
-                change_percent = stock_data.get('changePercent', 0)
-                
-                # Add all stocks for study, but mark them by type
-                stocks.append({
-                    'symbol': stock_data['symbol'],
-                    'name': stock_data['name'],
-                    'currentPrice': stock_data['currentPrice'],
-                    'previousClose': stock_data['previousClose'],
-                    'changeAmount': stock_data['changeAmount'],
-                    'changePercent': stock_data['changePercent'],
-                    'volume': stock_data['volume'],
-                    'avgVolume': stock_data['avgVolume'],
-                    'float': stock_data.get('float', 0),
-                    'dayHigh': stock_data['dayHigh'],
-                    'dayLow': stock_data['dayLow'],
-                    'openPrice': stock_data['openPrice'],
-                    'candles': stock_data.get('candles', []),  # 24h candles as primary
-                    'chartData': stock_data.get('chartData', {}),  # Includes both 24h and 5m
-                    'source': f'Interactive Brokers - Real 24h Data for AI Study',
-                    'isHot': abs(change_percent) > 5,
-                    'signal': stock_data.get('signal', 'HOLD'),
-                    'has24hData': '24h' in stock_data.get('chartData', {}),
-                    'has5mData': '5m' in stock_data.get('chartData', {})
-                })
-                
-            except Exception as e:
-                logging.warning(f"⚠️ Error processing {symbol} from IBKR: {e}")
-                continue
+                'error': 'Interactive Brokers API not available. Install ib-insync: pip install ib-insync'
+            }), 500
+        
+        if not connect_ibkr():
+            return jsonify({
+                'success': False,
+                'error': f'Cannot connect to Interactive Brokers. Make sure TWS/IB Gateway is running and logged in as {IBKR_USERNAME}'
+            }), 500
         
-        # Sort by change percent, but return ALL stocks for AI study
-        if movers_type == 'gainers':
-            stocks.sort(key=lambda x: x['changePercent'], reverse=True)
-        elif movers_type == 'losers':
-            stocks.sort(key=lambda x: x['changePercent'])
-        elif movers_type == 'active':
-            stocks.sort(key=lambda x: x['volume'], reverse=True)
+        # One concurrent pass over the movers list (see iter_market_movers)
+        if stream:
+            def generate():
+                stocks = []
+                for symbol, stock_data in iter_market_movers(MOVERS_SYMBOLS):
+                    if not stock_data:
+                        continue
+                    stock = _format_mover(stock_data)
+                    stocks.append(stock)
+                    yield f"event: stock\ndata: {json.dumps(stock)}\n\n"
+                filtered_stocks = _sort_movers(stocks, movers_type)
+                yield f"event: done\ndata: {json.dumps({'count': len(filtered_stocks), 'type': movers_type, 'symbols': [s['symbol'] for s in filtered_stocks]})}\n\n"
+            
+            return Response(stream_with_context(generate()), mimetype='text/event-stream')
         
-        # Filter by type if needed, but prioritize showing all with 24h data
-        filtered_stocks = stocks
-        if movers_type == 'gainers':
-            filtered_stocks = [s for s in stocks if s['changePercent'] >= 0]
-        elif movers_type == 'losers':
-            filtered_stocks = [s for s in stocks if s['changePercent'] <= 0]
-        # 'active' shows all
+        fetch_start = time.time()
+        stocks = [_format_mover(stock_data) for _, stock_data in iter_market_movers(MOVERS_SYMBOLS) if stock_data]
+        filtered_stocks = _sort_movers(stocks, movers_type)
         
-        logging.info(f"✅ Returning {len(filtered_stocks)} stocks with 24h data for AI study")
+        logging.info(f"✅ Returning {len(filtered_stocks)} stocks with 24h data for AI study ({time.time() - fetch_start:.2f}s)")
         
         return jsonify({
             'success': True,
@@ -2803,18 +3014,18 @@ def keepalive_ibkr():
         try:
             time.sleep(30)  # Check every 30 seconds
             if IBKR_AVAILABLE:
-                with IBKR_LOCK:
-                    if IBKR_INSTANCE:
-                        try:
-                            if not IBKR_INSTANCE.isConnected():
-                                # Connection lost, try to reconnect
-                                logging.warning("⚠️ [IBKR KEEPALIVE] Connection lost, attempting reconnect...")
-                                global IBKR_CONNECTED
-                                IBKR_CONNECTED = False
-                                connect_ibkr()
-                        except Exception as e:
-                            logging.warning(f"⚠️ [IBKR KEEPALIVE] Error checking connection: {e}")
+                if IBKR_INSTANCE:
+                    try:
+                        if not IBKR_INSTANCE.isConnected():
+                            # Connection lost, try to reconnect (on the gateway worker)
+                            logging.warning("⚠️ [IBKR KEEPALIVE] Connection lost, attempting reconnect...")
+                            global IBKR_CONNECTED
                             IBKR_CONNECTED = False
+                            connect_ibkr()
+                    except Exception as e:
+                        logging.warning(f"⚠️ [IBKR KEEPALIVE] Error checking connection: {e}")
+                        IBKR_CONNECTED = False
+                sync_market_data_subscriptions()
         except Exception as e:
             logging.error(f"❌ [IBKR KEEPALIVE] Error: {e}")
 
@@ -2856,6 +3067,14 @@ def health_check():
                     connection_error = "IBKR instance not initialized. Check ib_insync is installed and TWS/IB Gateway is running."
             except Exception as e:
                 connection_error = f"Error checking connection: {str(e)}"
+        
+        try:
+            from ibkr_trading import TRAILING_STOP_ENGINE, ORDER_BOOK
+            trailing_stop_stats = TRAILING_STOP_ENGINE.get_stats()
+            order_book_stats = ORDER_BOOK.get_stats()
+        except ImportError:
+            trailing_stop_stats = None
+            order_book_stats = None
     
         return jsonify({
             'status': 'healthy',
@@ -2868,6 +3087,24 @@ def health_check():
             'marketDataSubscriptions': MARKET_DATA_SUBSCRIPTIONS,
             'level2Available': MARKET_DATA_SUBSCRIPTIONS['level2']['enabled'],
             'bookmapReady': MARKET_DATA_SUBSCRIPTIONS['level2']['bookmap_compatible'],
+            'marketDataStream': MARKET_DATA_STREAM.get_stats(),
+            'stockCache': stock_cache.get_stats(),
+            'contractRegistry': CONTRACT_REGISTRY.get_stats(),
+            'barStore': BAR_STORE.get_stats(),
+            'historyCache': HISTORY_CACHE.get_stats(),
+            'ibkrGateway': IBKR_GATEWAY.get_stats(),
+            'historicalPacing': HISTORICAL_PACER.get_stats(),
+            'trailingStops': trailing_stop_stats,
+            'orderBook': order_book_stats,
+            'tradeJournal': TRADE_JOURNAL.get_stats() if TRADE_JOURNAL is not None else None,
+            'eodFlatten': LAST_EOD_FLATTEN,
+            'verdictCache': VERDICT_CACHE.get_stats() if OLLAMA_AVAILABLE else None,
+            'ollamaClient': OLLAMA_CLIENT.get_stats() if OLLAMA_AVAILABLE else None,
+            'rulesEngine': RULES_ENGINE.get_stats() if OLLAMA_AVAILABLE else None,
+            'ollamaResponseParsing': get_parse_stats() if OLLAMA_AVAILABLE else None,
+            'ollamaWarmup': OLLAMA_WARMUP.get_stats() if OLLAMA_AVAILABLE else None,
+            'ollamaPrompts': get_prompt_stats() if OLLAMA_AVAILABLE else None,
+            'ollamaKnowledge': KNOWLEDGE_MODEL.get_stats() if OLLAMA_AVAILABLE else None,
             'timestamp': datetime.now().isoformat()
         })
     except Exception as e:
@@ -2946,6 +3183,13 @@ def ollama_status():
     
     try:
         status = check_ollama_connection()
+        status['verdictCache'] = VERDICT_CACHE.get_stats()
+        status['client'] = OLLAMA_CLIENT.get_stats()
+        status['rulesEngine'] = RULES_ENGINE.get_stats()
+        status['responseParsing'] = get_parse_stats()
+        status['warmup'] = OLLAMA_WARMUP.get_stats()
+        status['prompts'] = get_prompt_stats()
+        status['knowledge'] = KNOWLEDGE_MODEL.get_stats()
         return jsonify(status)
     except Exception as e:
         return jsonify({
@@ -2953,6 +3197,82 @@ def ollama_status():
             'error': str(e)
         }), 500
 
+def _fetch_level2_for_analysis(symbol: str, tag: str) -> Optional[Dict[str, Any]]:
+    """REAL Level 2 order book for an AI analysis, or None if unavailable"""
+    try:
+        from fetch_level2_data import fetch_level2_order_book
+        level2_data = fetch_level2_order_book(symbol, num_levels=10)
+        if level2_data:
+            level2_data['timestamp'] = datetime.now().isoformat()
+            logging.info(f"📊 [{tag}] Fetched REAL Level 2 data for {symbol}: {level2_data.get('totalBidSize', 0):,} bids, {level2_data.get('totalAskSize', 0):,} asks")
+        return level2_data
+    except Exception as e:
+        logging.debug(f"⚠️ [{tag}] Could not fetch Level 2 data for {symbol}: {e}")
+        return None
+
+def _analyze_scan_stock(stock: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    One batch entry: Level 2 fetch (behind its own semaphore), then the analysis. Only a
+    real generation waits for an Ollama client slot; rules-engine and cached verdicts return
+    right away, so they never queue behind inferences.
+    """
+    symbol = stock.get('symbol', '')
+    candles = stock.get('candles', [])
+    if not candles:
+        return {'symbol': symbol, 'success': False, 'error': 'No candle data provided'}
+    
+    current_price = stock.get('currentPrice', 0)
+    volume = stock.get('volume', 0)
+    avg_volume = stock.get('avgVolume', 0)
+    
+    start = time.time()
+    level2_data = None
+    if not RULES_ENGINE.settles(candles, current_price, volume, avg_volume):
+        with LEVEL2_BATCH_SEMAPHORE:
+            level2_data = _fetch_level2_for_analysis(symbol, 'OLLAMA BATCH')
+    result = analyze_candlesticks_with_ollama(
+        candles=candles,
+        symbol=symbol,
+        current_price=current_price,
+        volume=volume,
+        avg_volume=avg_volume,
+        detected_patterns=stock.get('detectedPatterns', None),
+        level2_data=level2_data,
+        stock_float=stock.get('float', None)
+    )
+    result['symbol'] = symbol
+    result['elapsed'] = round(time.time() - start, 2)
+    return result
+
+def _iter_batch_analysis(stocks: List[Dict[str, Any]]):
+    """Yield (index, result) for every stock as its analysis finishes"""
+    # Stocks a hard rule settles are answered here, without taking a worker
+    pending = []
+    for index, stock in enumerate(stocks):
+        if stock.get('candles') and RULES_ENGINE.settles(stock['candles'], stock.get('currentPrice', 0),
+                                                         stock.get('volume', 0), stock.get('avgVolume', 0)):
+            yield index, _analyze_scan_stock(stock)
+        else:
+            pending.append(index)
+    if not pending:
+        return
+    
+    workers = min(len(pending), OLLAMA_BATCH_WORKERS)
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers, thread_name_prefix='ollama-batch') as executor:
+        futures = {executor.submit(_analyze_scan_stock, stocks[index]): index for index in pending}
+        try:
+            for future in concurrent.futures.as_completed(futures):
+                index = futures[future]
+                try:
+                    yield index, future.result()
+                except Exception as e:
+                    logging.error(f"❌ [OLLAMA BATCH] {stocks[index].get('symbol', '')} failed: {e}")
+                    yield index, {'symbol': stocks[index].get('symbol', ''), 'success': False, 'error': str(e)}
+        finally:
+            # Client went away - drop the stocks that haven't started
+            for future in futures:
+                future.cancel()
+
 @app.route('/api/ollama/analyze', methods=['POST'])
 def ollama_analyze():
     """Analyze candlestick patterns using Ollama AI"""
@@ -2977,20 +3297,29 @@ def ollama_analyze():
                 'error': 'No candle data provided'
             }), 400
         
-        # Fetch Level 2 data if available (REAL order book data)
-        level2_data = None
-        try:
-            from fetch_level2_data import fetch_level2_order_book
-            level2_data = fetch_level2_order_book(symbol, num_levels=10)
-            if level2_data:
-                level2_data['timestamp'] = datetime.now().isoformat()
-                logging.info(f"📊 [OLLAMA] Fetched REAL Level 2 data for {symbol}: {level2_data.get('totalBidSize', 0):,} bids, {level2_data.get('totalAskSize', 0):,} asks")
-        except Exception as e:
-            logging.debug(f"⚠️ [OLLAMA] Could not fetch Level 2 data for {symbol}: {e}")
+        # Fetch Level 2 data if available (REAL order book data) - not needed when the rules engine settles the verdict
+        level2_data = None if RULES_ENGINE.settles(candles, current_price, volume, avg_volume) else _fetch_level2_for_analysis(symbol, 'OLLAMA')
         
         # Get float data if available in request
         stock_float = data.get('float', None)
         
+        # SSE mode: forward tokens as the model writes them, plus each verdict field as soon as it is complete
+        if request.args.get('stream', 'false').lower() == 'true':
+            def generate():
+                for event, payload in stream_candlestick_analysis(
+                    candles=candles,
+                    symbol=symbol,
+                    current_price=current_price,
+                    volume=volume,
+                    avg_volume=avg_volume,
+                    detected_patterns=detected_patterns,
+                    level2_data=level2_data,
+                    stock_float=stock_float
+                ):
+                    yield f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+            
+            return Response(stream_with_context(generate()), mimetype='text/event-stream')
+        
         result = analyze_candlesticks_with_ollama(
             candles=candles,
             symbol=symbol,
@@ -3010,6 +3339,70 @@ def ollama_analyze():
             'error': str(e)
         }), 500
 
+@app.route('/api/ollama/analyze-batch', methods=['POST'])
+def ollama_analyze_batch():
+    """
+    Analyze a whole scan result set with Ollama AI.
+    
+    Body: {"stocks": [scan results with symbol, candles, currentPrice, volume, avgVolume, float, detectedPatterns]}
+    Streams one SSE `result` event per stock as it finishes (?stream=false returns one JSON response instead).
+    """
+    if not OLLAMA_AVAILABLE:
+        return jsonify({
+            'success': False,
+            'error': 'Ollama service not available'
+        }), 503
+    
+    try:
+        data = request.json or {}
+        stocks = [s for s in data.get('stocks', []) if isinstance(s, dict) and s.get('symbol')]
+        stream = request.args.get('stream', 'true').lower() == 'true'
+        
+        if not stocks:
+            return jsonify({
+                'success': False,
+                'error': 'No stocks provided'
+            }), 400
+        if len(stocks) > OLLAMA_BATCH_MAX_STOCKS:
+            return jsonify({
+                'success': False,
+                'error': f'Too many stocks ({len(stocks)}), maximum is {OLLAMA_BATCH_MAX_STOCKS}'
+            }), 400
+        
+        logging.info(f"🤖 [OLLAMA BATCH] Analyzing {len(stocks)} stocks (workers: {OLLAMA_BATCH_WORKERS}, model calls: {OLLAMA_CLIENT.num_parallel}, Level 2: {LEVEL2_BATCH_CONCURRENCY})")
+        batch_start = time.time()
+        
+        if stream:
+            def generate():
+                succeeded = 0
+                for index, result in _iter_batch_analysis(stocks):
+                    succeeded += 1 if result.get('success') else 0
+                    yield f"event: result\ndata: {json.dumps({'index': index, **result})}\n\n"
+                elapsed = time.time() - batch_start
+                logging.info(f"✅ [OLLAMA BATCH] {succeeded}/{len(stocks)} analyses in {elapsed:.2f}s")
+                yield f"event: done\ndata: {json.dumps({'count': len(stocks), 'succeeded': succeeded, 'elapsed': round(elapsed, 2)})}\n\n"
+            
+            return Response(stream_with_context(generate()), mimetype='text/event-stream')
+        
+        results = [None] * len(stocks)
+        for index, result in _iter_batch_analysis(stocks):
+            results[index] = result
+        elapsed = time.time() - batch_start
+        logging.info(f"✅ [OLLAMA BATCH] {sum(1 for r in results if r.get('success'))}/{len(stocks)} analyses in {elapsed:.2f}s")
+        
+        return jsonify({
+            'success': True,
+            'results': results,
+            'count': len(results),
+            'elapsed': round(elapsed, 2)
+        })
+    except Exception as e:
+        logging.error(f"❌ [OLLAMA] Batch analysis endpoint error: {e}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
 @app.route('/api/ollama/teach', methods=['POST'])
 def ollama_teach():
     """Teach Ollama a new candlestick pattern"""
@@ -3045,101 +3438,79 @@ def ollama_teach():
             'error': str(e)
         }), 500
 
-@app.route('/api/ollama/teach-all', methods=['POST'])
-def ollama_teach_all():
-    """Teach Ollama ALL candlestick patterns from the codebase"""
+def _rebuild_knowledge(tag: str):
+    """
+    The teaching modules are compiled into the knowledge model (see knowledge_model), so
+    re-teaching means making sure the model for the current knowledge version exists - no
+    teaching generations. It is only recreated when asked for (?rebuild=true).
+    """
     if not OLLAMA_AVAILABLE:
         return jsonify({
             'success': False,
             'error': 'Ollama service not available'
         }), 503
     
-    if teach_all_patterns_to_ollama is None:
-        return jsonify({
-            'success': False,
-            'error': 'Pattern teaching module not available'
-        }), 503
-    
-    try:
-        logging.info("📚 [OLLAMA] Starting comprehensive pattern teaching...")
-        result = teach_all_patterns_to_ollama()
-        
-        if result.get('success'):
-            logging.info(f"✅ [OLLAMA] Teaching complete: {result.get('message')}")
-        else:
-            logging.error(f"❌ [OLLAMA] Teaching failed: {result.get('error')}")
-        
-        return jsonify(result)
-    except Exception as e:
-        logging.error(f"❌ [OLLAMA] Teaching all patterns error: {e}")
+    rebuild = request.args.get('rebuild', 'false').lower() == 'true'
+    logging.info(f"📚 [{tag}] {'Rebuilding' if rebuild else 'Checking'} knowledge model {KNOWLEDGE_MODEL.name}...")
+    ready = KNOWLEDGE_MODEL.ensure(rebuild=rebuild)
+    register_analysis_warmup()  # Analyses may have switched model - keep that one warm instead
+    if ready:
         return jsonify({
-            'success': False,
-            'error': str(e)
-        }), 500
+            'success': True,
+            'message': f'Knowledge compiled into {KNOWLEDGE_MODEL.name}',
+            'patterns_taught': KNOWLEDGE_PATTERN_COUNT,
+            'knowledge': KNOWLEDGE_MODEL.get_stats()
+        })
+    return jsonify({
+        'success': False,
+        'error': KNOWLEDGE_MODEL.get_stats()['error'],
+        'knowledge': KNOWLEDGE_MODEL.get_stats()
+    }), 500
+
+@app.route('/api/ollama/teach-all', methods=['POST'])
+def ollama_teach_all():
+    """Teach Ollama ALL candlestick patterns from the codebase"""
+    return _rebuild_knowledge('OLLAMA')
 
 @app.route('/api/ollama/teach-ibkr', methods=['POST'])
 def ollama_teach_ibkr():
     """Teach Ollama about IBKR trading capabilities"""
-    if not OLLAMA_AVAILABLE:
-        return jsonify({
-            'success': False,
-            'error': 'Ollama service not available'
-        }), 503
-    
-    try:
-        from ollama_ibkr_trading import teach_ibkr_trading_to_ollama
-        logging.info("📚 [OLLAMA IBKR] Starting IBKR trading knowledge teaching...")
-        result = teach_ibkr_trading_to_ollama()
-        
-        if result.get('success'):
-            logging.info(f"✅ [OLLAMA IBKR] Teaching complete: {result.get('message')}")
-        else:
-            logging.error(f"❌ [OLLAMA IBKR] Teaching failed: {result.get('error')}")
-        
-        return jsonify(result)
-    except ImportError:
-        return jsonify({
-            'success': False,
-            'error': 'IBKR trading teaching module not available'
-        }), 503
-    except Exception as e:
-        logging.error(f"❌ [OLLAMA IBKR] Teaching error: {e}")
-        return jsonify({
-            'success': False,
-            'error': str(e)
-        }), 500
+    return _rebuild_knowledge('OLLAMA IBKR')
 
 @app.route('/api/ollama/teach-level2', methods=['POST'])
 def ollama_teach_level2():
     """Teach Ollama about Level 2 market data and order flow analysis"""
-    if not OLLAMA_AVAILABLE:
-        return jsonify({
-            'success': False,
-            'error': 'Ollama service not available'
-        }), 503
+    return _rebuild_knowledge('OLLAMA LEVEL2')
+
+def _build_trade_decision(symbol: str, analysis: Dict[str, Any], current_price: float, account_balance: float, risk_tolerance: str) -> Dict[str, Any]:
+    """Trading decision from an AI analysis"""
+    signal = analysis.get('signal', 'HOLD')
     
-    try:
-        from ollama_level2_teaching import teach_level2_to_ollama
-        logging.info("📚 [OLLAMA LEVEL2] Starting Level 2 market data knowledge teaching...")
-        result = teach_level2_to_ollama()
-        
-        if result.get('success'):
-            logging.info(f"✅ [OLLAMA LEVEL2] Teaching complete: {result.get('message')}")
-        else:
-            logging.error(f"❌ [OLLAMA LEVEL2] Teaching failed: {result.get('error')}")
-        
-        return jsonify(result)
-    except ImportError:
-        return jsonify({
-            'success': False,
-            'error': 'Level 2 teaching module not available'
-        }), 503
-    except Exception as e:
-        logging.error(f"❌ [OLLAMA LEVEL2] Teaching error: {e}")
-        return jsonify({
-            'success': False,
-            'error': str(e)
-        }), 500
+    # Build trading decision (framework for future buy/sell implementation)
+    decision = {
+        'symbol': symbol,
+        'action': signal,  # BUY, SELL, or HOLD
+        'confidence': analysis.get('confidence', 'LOW'),
+        'reasoning': analysis.get('reasoning', ''),
+        'entryPrice': analysis.get('entryPrice'),
+        'stopLoss': analysis.get('stopLoss'),
+        'takeProfit': analysis.get('takeProfit'),
+        'pattern': analysis.get('pattern'),
+        'timestamp': datetime.now().isoformat(),
+        'readyToExecute': False  # Will be True when buy/sell is implemented
+    }
+    
+    # For now, we only return the decision
+    # When buy/sell is implemented, this will trigger actual trades
+    if signal == 'BUY' and analysis.get('confidence') == 'HIGH':
+        decision['readyToExecute'] = True
+        decision['recommendedQuantity'] = calculate_position_size(
+            account_balance=account_balance,
+            entry_price=analysis.get('entryPrice') or current_price,
+            risk_tolerance=risk_tolerance
+        )
+    
+    return decision
 
 @app.route('/api/ollama/trade-decision', methods=['POST'])
 def ollama_trade_decision():
@@ -3172,22 +3543,13 @@ def ollama_trade_decision():
         # Get detected patterns if provided
         detected_patterns = data.get('detectedPatterns', None)
         
-        # Fetch Level 2 data if available (REAL order book data)
-        level2_data = None
-        try:
-            from fetch_level2_data import fetch_level2_order_book
-            level2_data = fetch_level2_order_book(symbol, num_levels=10)
-            if level2_data:
-                level2_data['timestamp'] = datetime.now().isoformat()
-                logging.info(f"📊 [AUTO-TRADE] Fetched REAL Level 2 data for {symbol}: {level2_data.get('totalBidSize', 0):,} bids, {level2_data.get('totalAskSize', 0):,} asks")
-        except Exception as e:
-            logging.debug(f"⚠️ [AUTO-TRADE] Could not fetch Level 2 data for {symbol}: {e}")
+        # Fetch Level 2 data if available (REAL order book data) - not needed when the rules engine settles the verdict
+        level2_data = None if RULES_ENGINE.settles(candles, current_price, volume, avg_volume) else _fetch_level2_for_analysis(symbol, 'AUTO-TRADE')
         
         # Get float data if available
         stock_float = data.get('float', None)
         
-        # Analyze with Ollama (using REAL data)
-        analysis_result = analyze_candlesticks_with_ollama(
+        analysis_args = dict(
             candles=candles,
             symbol=symbol,
             current_price=current_price,
@@ -3198,39 +3560,26 @@ def ollama_trade_decision():
             stock_float=stock_float  # Pass float data if available
         )
         
-        if not analysis_result.get('success'):
-            return jsonify(analysis_result), 500
-        
-        analysis = analysis_result.get('analysis', {})
-        signal = analysis.get('signal', 'HOLD')
+        # SSE mode: tokens and verdict fields as they are generated, then the decision
+        if request.args.get('stream', 'false').lower() == 'true':
+            def generate():
+                for event, payload in stream_candlestick_analysis(**analysis_args):
+                    if event == 'result' and payload.get('success'):
+                        decision = _build_trade_decision(symbol, payload.get('analysis', {}), current_price, account_balance, risk_tolerance)
+                        event, payload = 'decision', {'success': True, 'decision': decision}
+                    yield f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+            
+            return Response(stream_with_context(generate()), mimetype='text/event-stream')
         
-        # Build trading decision (framework for future buy/sell implementation)
-        decision = {
-            'symbol': symbol,
-            'action': signal,  # BUY, SELL, or HOLD
-            'confidence': analysis.get('confidence', 'LOW'),
-            'reasoning': analysis.get('reasoning', ''),
-            'entryPrice': analysis.get('entryPrice'),
-            'stopLoss': analysis.get('stopLoss'),
-            'takeProfit': analysis.get('takeProfit'),
-            'pattern': analysis.get('pattern'),
-            'timestamp': datetime.now().isoformat(),
-            'readyToExecute': False  # Will be True when buy/sell is implemented
-        }
+        # Analyze with Ollama (using REAL data)
+        analysis_result = analyze_candlesticks_with_ollama(**analysis_args)
         
-        # For now, we only return the decision
-        # When buy/sell is implemented, this will trigger actual trades
-        if signal == 'BUY' and analysis.get('confidence') == 'HIGH':
-            decision['readyToExecute'] = True
-            decision['recommendedQuantity'] = calculate_position_size(
-                account_balance=account_balance,
-                entry_price=analysis.get('entryPrice') or current_price,
-                risk_tolerance=risk_tolerance
-            )
+        if not analysis_result.get('success'):
+            return jsonify(analysis_result), 500
         
         return jsonify({
             'success': True,
-            'decision': decision
+            'decision': _build_trade_decision(symbol, analysis_result.get('analysis', {}), current_price, account_balance, risk_tolerance)
         })
     except Exception as e:
         logging.error(f"❌ [OLLAMA] Trade decision error: {e}")
@@ -3251,7 +3600,7 @@ def ollama_chat():
     try:
         data = request.json
         message = data.get('message', '').strip()
-        model = data.get('model', 'llama3.2')  # Default model
+        model = data.get('model', OLLAMA_CHAT_MODEL)
         context = data.get('context', '')  # Optional context about stocks/scanner
         
         if not message:
@@ -3260,24 +3609,39 @@ def ollama_chat():
                 'error': 'Message is required'
             }), 400
         
-        # Import ollama client
-        import requests as req
-        
-        OLLAMA_BASE_URL = os.getenv('OLLAMA_BASE_URL', 'http://localhost:11434')
-        
         # Build prompt with context if provided
         prompt = message
         if context:
             prompt = f"Context: {context}\n\nUser: {message}\n\nAssistant:"
         
+        # SSE mode: forward the reply token by token
+        if request.args.get('stream', 'false').lower() == 'true':
+            def generate():
+                reply = []
+                try:
+                    for text in iter_ollama_tokens({'model': model, 'prompt': prompt}, operation='chat', timeout=60):
+                        reply.append(text)
+                        yield f"event: token\ndata: {json.dumps({'text': text})}\n\n"
+                except Exception as e:
+                    logging.error(f"❌ [OLLAMA CHAT] Stream error: {e}")
+                    yield f"event: error\ndata: {json.dumps({'success': False, 'error': str(e)})}\n\n"
+                    return
+                reply = ''.join(reply) or 'No response from Ollama'
+                OLLAMA_WARMUP.register(model)  # Ollama served it, so the name is real
+                logging.info(f"✅ [OLLAMA CHAT] User: {message[:50]}... | Response: {reply[:50]}...")
+                yield f"event: done\ndata: {json.dumps({'success': True, 'message': reply, 'model': model})}\n\n"
+            
+            return Response(stream_with_context(generate()), mimetype='text/event-stream')
+        
         # Call Ollama API
-        response = req.post(
-            f"{OLLAMA_BASE_URL}/api/generate",
+        response = OLLAMA_CLIENT.post(
+            '/api/generate',
             json={
                 'model': model,
                 'prompt': prompt,
                 'stream': False
             },
+            operation='chat',
             timeout=60
         )
         
@@ -3289,6 +3653,9 @@ def ollama_chat():
         
         result = response.json()
         reply = result.get('response', 'No response from Ollama')
+        # Kept resident during market hours while it stays loaded - only once Ollama served it,
+        # so a mistyped model name never becomes a warm-up entry
+        OLLAMA_WARMUP.register(model)
         
         logging.info(f"✅ [OLLAMA CHAT] User: {message[:50]}... | Response: {reply[:50]}...")
         
@@ -3642,6 +4009,13 @@ def ollama_execute_trade():
 DAILY_TRADES: Dict[str, Dict[str, bool]] = {}  # {date: {'buyUsed': bool, 'sellUsed': bool}}
 DAILY_TRADES_LOCK = threading.Lock()
 
+# Limit usage is journaled with the rest of the trading state, so a restart doesn't reset it
+try:
+    from ibkr_trading import TRADE_JOURNAL
+    DAILY_TRADES.update(TRADE_JOURNAL.daily_limits())
+except ImportError:
+    TRADE_JOURNAL = None
+
 def get_today_date() -> str:
     """Get today's date in YYYY-MM-DD format"""
     return datetime.now().strftime('%Y-%m-%d')
@@ -3695,6 +4069,9 @@ def mark_daily_trade_used(date: str, action: str):
             DAILY_TRADES[date]['buyUsed'] = True
         elif action == 'SELL':
             DAILY_TRADES[date]['sellUsed'] = True
+        
+        if TRADE_JOURNAL is not None:
+            TRADE_JOURNAL.append('daily', date, DAILY_TRADES[date])
 
 def get_daily_trades_status(date: str) -> Dict[str, bool]:
     """Get daily trade status for a given date"""
@@ -3703,64 +4080,37 @@ def get_daily_trades_status(date: str) -> Dict[str, bool]:
             return {'buyUsed': False, 'sellUsed': False}
         return DAILY_TRADES[date].copy()
 
+LAST_EOD_FLATTEN: Optional[Dict[str, Any]] = None  # Report of the last end-of-day flatten (/api/health)
+
 def close_all_positions_before_market_close():
-    """Close all open positions before market close (3:50 PM ET)"""
-    from ibkr_trading import get_open_positions, place_market_order
-    from ib_insync import Stock
+    """Close all open positions before market close (3:50 PM ET) in one batch"""
+    global LAST_EOD_FLATTEN
+    from ibkr_trading import flatten_all_positions
     
     if not IBKR_AVAILABLE or not IBKR_CONNECTED or not IBKR_INSTANCE:
-        return
+        return None
     
     try:
-        positions_result = get_open_positions()
-        if not positions_result.get('success'):
-            return
-        
-        positions = positions_result.get('positions', [])
-        if not positions:
-            return
-        
-        # Close each position
-        for pos in positions:
-            symbol = pos.get('symbol')
-            quantity = abs(int(pos.get('position', 0)))
-            
-            if quantity == 0:
-                continue
-            
-            # Determine action (if position is positive, we need to sell)
-            action = 'SELL' if pos.get('position', 0) > 0 else 'BUY'
-            
-            try:
-                logging.info(f"🔚 [EOD CLOSE] Closing position: {symbol} {quantity} shares ({action})")
-                result = place_market_order(
-                    symbol=symbol,
-                    action=action,
-                    quantity=quantity,
-                    stop_loss_percent=None,  # No stop loss on closing orders
-                    take_profit_percent=None  # No take profit on closing orders
-                )
-                
-                if result.get('success'):
-                    logging.info(f"✅ [EOD CLOSE] Successfully closed {symbol} position")
-                else:
-                    logging.error(f"❌ [EOD CLOSE] Failed to close {symbol}: {result.get('error')}")
-            except Exception as e:
-                logging.error(f"❌ [EOD CLOSE] Error closing {symbol}: {e}")
-                
+        result = flatten_all_positions(timeout=float(os.getenv('EOD_FLATTEN_TIMEOUT', '60')))  # Max seconds to wait for the fills
     except Exception as e:
         logging.error(f"❌ [EOD CLOSE] Error closing positions: {e}")
+        result = {'success': False, 'error': str(e)}
+    LAST_EOD_FLATTEN = {**result, 'at': datetime.now().isoformat()}
+    return result
 
 def monitor_trailing_stops():
-    """Background thread to monitor and update trailing stops, and close positions before market close"""
-    from ibkr_trading import update_trailing_stop, ACTIVE_TRADES, TRADING_LOCK
-    from ib_insync import Stock
+    """
+    Background thread that closes positions before market close and reconciles native
+    trailing stops. Client-side stops move on streaming ticks (TRAILING_STOP_ENGINE) and their
+    quote lines are held by the trades themselves, so nothing here polls prices.
+    """
+    from ibkr_trading import reconcile_native_trails
     
     last_eod_check = None
     
     while True:
         try:
-            time.sleep(10)  # Check every 10 seconds
+            time.sleep(60)  # Well inside the 10-minute EOD window
             
             if not IBKR_AVAILABLE or not IBKR_CONNECTED or not IBKR_INSTANCE:
                 continue
@@ -3777,44 +4127,9 @@ def monitor_trailing_stops():
                     close_all_positions_before_market_close()
                     last_eod_check = now
             
-            # Get current positions and update trailing stops
-            with TRADING_LOCK:
-                active_order_ids = list(ACTIVE_TRADES.keys())
+            # Native trails run at IBKR - only reconcile their state with the broker
+            reconcile_native_trails()
             
-            for order_id in active_order_ids:
-                try:
-                    with TRADING_LOCK:
-                        trade_info = ACTIVE_TRADES.get(order_id)
-                    if not trade_info:
-                        continue
-                    
-                    symbol = trade_info.get('symbol')
-                    if not symbol:
-                        continue
-                    
-                    # Get current market price
-                    with IBKR_LOCK:
-                        contract = Stock(symbol, 'SMART', 'USD')
-                        IBKR_INSTANCE.reqMktData(contract, '', False, False)
-                        ticker = IBKR_INSTANCE.ticker(contract)
-                        IBKR_INSTANCE.sleep(0.5)
-                        
-                        current_price = ticker.marketPrice() or ticker.last or 0
-                        if current_price == 0:
-                            continue
-                    
-                    # Update trailing stop
-                    update_result = update_trailing_stop(order_id, current_price)
-                    if update_result:
-                        logging.info(f"📈 [TRAILING STOP] Updated stop for {symbol}: ${update_result.get('new_stop_loss'):.2f} (profit locked: {update_result.get('profit_locked'):.2f}%)")
-                        
-                        # TODO: Update the actual stop loss order in IBKR
-                        # This would require finding the stop loss order and modifying it
-                        
-                except Exception as e:
-                    logging.warning(f"⚠️ [TRAILING STOP] Error monitoring order {order_id}: {e}")
-                    continue
-                    
         except Exception as e:
             logging.error(f"❌ [TRAILING STOP] Monitor error: {e}")
             time.sleep(30)  # Wait longer on error
@@ -3961,6 +4276,19 @@ def trade_buy():
                 'error': 'Limit price is required for LIMIT orders'
             }), 400
         
+        # Default: queue the order and answer with its handle - the outcome, fills and
+        # rejections follow on /api/trade/events. ?wait=true waits for the placement.
+        if request.args.get('wait', 'false').lower() != 'true':
+            from ibkr_trading import submit_order
+            handle = submit_order(symbol, 'BUY', quantity, order_type, limit_price,
+                                  stop_loss_percent, take_profit_percent)
+            logging.info(f"📨 [TRADE] BUY order queued: {symbol} x{quantity} (handle {handle['handle']})")
+            return jsonify({
+                'success': True,
+                **handle,
+                'message': f'BUY order for {quantity} shares of {symbol} submitted'
+            }), 202
+        
         # Place order
         if order_type == 'MARKET':
             result = place_market_order(
@@ -4037,6 +4365,19 @@ def trade_sell():
                 'error': 'Limit price is required for LIMIT orders'
             }), 400
         
+        # Default: queue the order and answer with its handle - the outcome, fills and
+        # rejections follow on /api/trade/events. ?wait=true waits for the placement.
+        if request.args.get('wait', 'false').lower() != 'true':
+            from ibkr_trading import submit_order
+            handle = submit_order(symbol, 'SELL', quantity, order_type, limit_price,
+                                  stop_loss_percent, take_profit_percent)
+            logging.info(f"📨 [TRADE] SELL order queued: {symbol} x{quantity} (handle {handle['handle']})")
+            return jsonify({
+                'success': True,
+                **handle,
+                'message': f'SELL order for {quantity} shares of {symbol} submitted'
+            }), 202
+        
         # Place order
         if order_type == 'MARKET':
             result = place_market_order(
@@ -4110,6 +4451,56 @@ def get_order(order_id):
             'error': str(e)
         }), 500
 
+@app.route('/api/trade/submission/<handle_id>', methods=['GET'])
+def get_order_submission(handle_id):
+    """State of a queued order (handle from /api/trade/buy or /sell): Queued, Accepted or Failed"""
+    try:
+        from ibkr_trading import ORDER_BOOK
+    except ImportError:
+        return jsonify({
+            'success': False,
+            'error': 'Trading service not available'
+        }), 503
+    
+    handle = ORDER_BOOK.get_handle(handle_id)
+    if handle is None:
+        return jsonify({
+            'success': False,
+            'error': 'Unknown order handle'
+        }), 404
+    return jsonify({'success': True, **handle})
+
+@app.route('/api/trade/events', methods=['GET'])
+def trade_events():
+    """
+    SSE stream of order events: queued, accepted, failed, status, fill (partial fills
+    included), error and rejected. Each event carries its sequence number as the SSE id, so
+    a reconnecting EventSource resumes after the last event it saw (or pass ?since=).
+    """
+    try:
+        from ibkr_trading import ORDER_BOOK
+    except ImportError:
+        return jsonify({
+            'success': False,
+            'error': 'Trading service not available'
+        }), 503
+    
+    since = request.headers.get('Last-Event-ID') or request.args.get('since')
+    since = int(since) if since and since.isdigit() else ORDER_BOOK.last_seq()
+    
+    def generate():
+        last_seq = since
+        while True:
+            events = ORDER_BOOK.wait_events(last_seq, timeout=15)
+            if not events:
+                yield ": keepalive\n\n"  # Keeps proxies from closing an idle stream
+                continue
+            for event in events:
+                last_seq = event['seq']
+                yield f"id: {event['seq']}\nevent: {event['type']}\ndata: {json.dumps(event['data'])}\n\n"
+    
+    return Response(stream_with_context(generate()), mimetype='text/event-stream')
+
 @app.route('/api/trade/cancel/<int:order_id>', methods=['POST'])
 def cancel_trade_order(order_id):
     """Cancel an order by order ID"""
@@ -4141,10 +4532,20 @@ if __name__ == '__main__':
             logging.info("🔌 [STARTUP] Attempting to connect to IBKR...")
             connect_ibkr()
             
+            # Resolve contracts for everything we scan before the first request needs them
+            if IBKR_INSTANCE and IBKR_INSTANCE.isConnected():
+                with active_symbols_lock:
+                    warm_symbols = set(SEED_SYMBOLS) | set(active_symbols)
+                try:
+                    IBKR_GATEWAY.call('contract', CONTRACT_REGISTRY.warm, warm_symbols)
+                except Exception as e:
+                    logging.warning(f"⚠️ [CONTRACTS] Startup warm-up failed: {e}")
+            sync_market_data_subscriptions()
+            
             # Initialize trading service with IBKR instance
             if TRADING_AVAILABLE and IBKR_INSTANCE:
                 try:
-                    set_ibkr_instance(IBKR_INSTANCE, IBKR_LOCK)
+                    set_ibkr_instance(IBKR_GATEWAY.client('order'), CONTRACT_REGISTRY, MARKET_DATA_STREAM)
                     logging.info("✅ [TRADING] Trading service initialized")
                 except Exception as e:
                     logging.warning(f"⚠️ [TRADING] Failed to initialize trading service: {e}")
@@ -4165,55 +4566,19 @@ if __name__ == '__main__':
         ibkr_init_thread = threading.Thread(target=init_ibkr_connection, daemon=True)
         ibkr_init_thread.start()
     
-    # Teach Ollama about IBKR trading and Level 2 data on startup
-    def teach_ollama_ibkr():
-        if OLLAMA_AVAILABLE:
-            try:
-                # Teach IBKR trading
-                from ollama_ibkr_trading import teach_ibkr_trading_to_ollama
-                logging.info("📚 [STARTUP] Teaching Ollama about IBKR trading...")
-                result = teach_ibkr_trading_to_ollama()
-                if result.get('success'):
-                    logging.info("✅ [STARTUP] Ollama learned IBKR trading successfully")
-                else:
-                    logging.warning(f"⚠️ [STARTUP] Ollama IBKR teaching failed: {result.get('error')}")
-            except Exception as e:
-                logging.warning(f"⚠️ [STARTUP] Could not teach Ollama IBKR: {e}")
-            
-            try:
-                # Teach Level 2 market data
-                from ollama_level2_teaching import teach_level2_to_ollama
-                logging.info("📚 [STARTUP] Teaching Ollama about Level 2 market data...")
-                result = teach_level2_to_ollama()
-                if result.get('success'):
-                    logging.info("✅ [STARTUP] Ollama learned Level 2 market data successfully")
-                else:
-                    logging.warning(f"⚠️ [STARTUP] Ollama Level 2 teaching failed: {result.get('error')}")
-                
-                # Teach relative volume (RVOL)
-                from ollama_volume_teaching import teach_relative_volume_to_ollama
-                logging.info("📚 [STARTUP] Teaching Ollama about relative volume (RVOL)...")
-                result = teach_relative_volume_to_ollama()
-                if result.get('success'):
-                    logging.info("✅ [STARTUP] Ollama learned relative volume successfully")
-                else:
-                    logging.warning(f"⚠️ [STARTUP] Ollama relative volume teaching failed: {result.get('error')}")
-                
-                # Teach stock float
-                from ollama_float_teaching import teach_float_to_ollama
-                logging.info("📚 [STARTUP] Teaching Ollama about stock float...")
-                result = teach_float_to_ollama()
-                if result.get('success'):
-                    logging.info("✅ [STARTUP] Ollama learned stock float successfully")
-                else:
-                    logging.warning(f"⚠️ [STARTUP] Ollama float teaching failed: {result.get('error')}")
-            except Exception as e:
-                logging.warning(f"⚠️ [STARTUP] Could not teach Ollama Level 2: {e}")
+    # Knowledge model (built once per knowledge version, no teaching generations), then
+    # preload the analysis and chat models and keep them loaded during market hours
+    def prepare_ollama():
+        if prepare_analysis_model():
+            logging.info(f"✅ [STARTUP] Analysis knowledge model {KNOWLEDGE_MODEL.name} ready")
+        OLLAMA_WARMUP.register(OLLAMA_CHAT_MODEL)
+        OLLAMA_WARMUP.set_active_hours(lambda: is_market_open(log_status=False))
+        OLLAMA_WARMUP.set_before_check(retry_analysis_model)
+        OLLAMA_WARMUP.start()
     
-    # Start Ollama teaching in background thread
     if OLLAMA_AVAILABLE:
-        ollama_teach_thread = threading.Thread(target=teach_ollama_ibkr, daemon=True)
-        ollama_teach_thread.start()
+        ollama_prepare_thread = threading.Thread(target=prepare_ollama, daemon=True)
+        ollama_prepare_thread.start()
     
     # Start Flask server immediately
     logging.info("🚀 [STARTUP] Starting Flask server on port 5000...")
@@ -0,0 +1,230 @@
+"""
+Incremental Bar Store
+Keeps the historical bars already downloaded per (symbol, bar size, useRTH) and, on
+refresh, requests only the gap since the last stored bar instead of the full window
+"""
+import asyncio
+import logging
+import math
+import threading
+import time
+from collections import OrderedDict
+from datetime import timedelta
+from typing import Dict, Any, Optional, Tuple
+
+import pandas as pd
+
+# IBKR duration unit -> approximate calendar days / trading sessions
+_DURATION_DAYS = {'S': 1 / 86400, 'D': 1, 'W': 7, 'M': 31, 'Y': 366}
+_DURATION_SESSIONS = {'S': 1 / 23400, 'D': 1, 'W': 5, 'M': 22, 'Y': 252}
+
+# IBKR bar size -> seconds
+_BAR_SECONDS = {
+    'secs': 1, 'sec': 1, 'min': 60, 'mins': 60, 'hour': 3600, 'hours': 3600,
+    'day': 86400, 'days': 86400, 'week': 604800, 'month': 2678400
+}
+
+# Intraday gaps longer than this are re-downloaded in full (IBKR caps 'N S' requests at one day)
+MAX_GAP_SECONDS = 86400
+
+def parse_duration(duration: str) -> Tuple[int, str]:
+    """'2 D' -> (2, 'D')"""
+    amount, unit = duration.split()
+    return int(amount), unit.upper()
+
+def bar_size_seconds(bar_size: str) -> int:
+    """'5 mins' -> 300, '1 day' -> 86400"""
+    amount, unit = bar_size.split()
+    return int(amount) * _BAR_SECONDS[unit.lower()]
+
+class BarStore:
+    """
+    LRU store of bar DataFrames (util.df layout, 'date' column) keyed by
+    (symbol, bar_size, use_rth, what_to_show).
+
+    A request whose window is already covered is answered with a gap request: only the
+    bars since the last stored bar are downloaded, merged in, and the still-forming last
+    bar is replaced by its fresh version.
+    """
+
+    def __init__(self, max_series: int = 500, pacer=None):
+        self.max_series = max_series
+        self.pacer = pacer  # Optional HistoricalDataPacer every download goes through
+        self._lock = threading.Lock()
+        # key -> {'df', 'duration', 'duration_days', 'updated'}
+        self._series: "OrderedDict[tuple, Dict[str, Any]]" = OrderedDict()
+        self._key_locks: Dict[tuple, threading.Lock] = {}
+        self._async_key_locks: Dict[tuple, asyncio.Lock] = {}  # Same per-series serialization on the event loop
+        self._full_fetches = 0
+        self._gap_fetches = 0
+        self._bars_downloaded = 0
+
+    # ---- planning / merging (shared by the sync and async paths) ----
+
+    def _key_lock(self, key: tuple) -> threading.Lock:
+        with self._lock:
+            return self._key_locks.setdefault(key, threading.Lock())
+
+    def _async_key_lock(self, key: tuple) -> asyncio.Lock:
+        with self._lock:
+            return self._async_key_locks.setdefault(key, asyncio.Lock())
+
+    def _plan(self, key: tuple, duration: str, bar_size: str) -> Tuple[str, bool]:
+        """Return (durationStr to request, is_gap_request)"""
+        amount, unit = parse_duration(duration)
+        with self._lock:
+            series = self._series.get(key)
+        if series is None or series['df'].empty or series['duration_days'] < amount * _DURATION_DAYS[unit]:
+            return duration, False
+
+        last_bar = pd.Timestamp(series['df']['date'].iloc[-1])
+        now = pd.Timestamp.now(tz=last_bar.tz) if last_bar.tz is not None else pd.Timestamp.now()
+        step = bar_size_seconds(bar_size)
+        # From the start of the last (possibly still forming) bar, plus one bar of slack
+        gap_seconds = max(0.0, (now - last_bar).total_seconds()) + step
+
+        if step >= 86400:
+            return f"{max(1, math.ceil(gap_seconds / 86400))} D", True
+        if gap_seconds > MAX_GAP_SECONDS:
+            return duration, False
+        return f"{max(60, int(math.ceil(gap_seconds)))} S", True
+
+    def _merge(self, key: tuple, df: pd.DataFrame, duration: str, bar_size: str, is_gap: bool) -> pd.DataFrame:
+        """Store a full download, or splice gap bars onto the stored series"""
+        with self._lock:
+            series = self._series.get(key)
+
+            if not is_gap or series is None:
+                merged = df.reset_index(drop=True)
+                self._full_fetches += 1
+            else:
+                stored = series['df']
+                if df is not None and not df.empty:
+                    # New bars win - this also replaces the stored, still-forming last bar
+                    first_new = df['date'].iloc[0]
+                    merged = pd.concat([stored[stored['date'] < first_new], df], ignore_index=True)
+                    # Drop what has scrolled out of the stored window
+                    merged = self._window(merged, series['duration'], bar_size)
+                else:
+                    merged = stored
+                duration = series['duration']
+                self._gap_fetches += 1
+
+            amount, unit = parse_duration(duration)
+            self._bars_downloaded += 0 if df is None else len(df)
+            self._series[key] = {
+                'df': merged,
+                'duration': duration,
+                'duration_days': amount * _DURATION_DAYS[unit],
+                'updated': time.time()
+            }
+            self._series.move_to_end(key)
+            while len(self._series) > self.max_series:
+                evicted, _ = self._series.popitem(last=False)
+                self._key_locks.pop(evicted, None)
+                self._async_key_locks.pop(evicted, None)
+        return merged
+
+    @staticmethod
+    def _window(df: pd.DataFrame, duration: str, bar_size: str) -> pd.DataFrame:
+        """Trim a stored series to the window a full request for `duration` would return"""
+        if df.empty:
+            return df
+        amount, unit = parse_duration(duration)
+        if bar_size_seconds(bar_size) >= 86400:
+            last = pd.Timestamp(df['date'].iloc[-1])
+            cutoff = last - timedelta(days=amount * _DURATION_DAYS[unit])
+            return df[pd.to_datetime(df['date']) > cutoff].reset_index(drop=True)
+        # Intraday: keep the last N trading sessions
+        sessions = max(1, math.ceil(amount * _DURATION_SESSIONS[unit]))
+        times = pd.to_datetime(df['date'])
+        if times.dt.tz is not None:
+            times = times.dt.tz_convert('America/New_York')
+        session_dates = times.dt.date
+        keep = sorted(session_dates.unique())[-sessions:]
+        return df[session_dates.isin(keep)].reset_index(drop=True)
+
+    def _request(self, ib, contract, **params):
+        if self.pacer is not None:
+            return self.pacer.request(ib, contract, **params)
+        return ib.reqHistoricalData(contract, **params)
+
+    async def _request_async(self, ib, contract, **params):
+        if self.pacer is not None:
+            return await self.pacer.request_async(ib, contract, **params)
+        return await ib.reqHistoricalDataAsync(contract, **params)
+
+    # ---- public API ----
+
+    def get_bars(self, ib, contract, symbol: str, duration: str, bar_size: str,
+                 use_rth: bool, what_to_show: str = 'TRADES') -> Optional[pd.DataFrame]:
+        """
+        Bars for (symbol, bar_size, use_rth) covering `duration`, downloading only what is missing.
+
+        Returns:
+            DataFrame in util.df layout, or None if IBKR returned nothing
+        """
+        from ib_insync import util
+
+        key = (symbol.upper(), bar_size, bool(use_rth), what_to_show)
+        with self._key_lock(key):
+            request_duration, is_gap = self._plan(key, duration, bar_size)
+            bars = self._request(
+                ib,
+                contract,
+                endDateTime='',
+                durationStr=request_duration,
+                barSizeSetting=bar_size,
+                whatToShow=what_to_show,
+                useRTH=use_rth
+            )
+            df = util.df(bars) if bars else None
+            if not is_gap and (df is None or df.empty):
+                return None
+            if is_gap:
+                logging.debug(f"📈 [BAR STORE] [{symbol}] {bar_size}: gap request {request_duration} -> {0 if df is None else len(df)} bars")
+            merged = self._merge(key, df, duration, bar_size, is_gap)
+        return self._window(merged, duration, bar_size)
+
+    async def get_bars_async(self, ib, contract, symbol: str, duration: str, bar_size: str,
+                             use_rth: bool, what_to_show: str = 'TRADES') -> Optional[pd.DataFrame]:
+        """
+        Async twin of get_bars() for code running on the ib_insync event loop. Coroutines for
+        the same series wait for each other like get_bars() callers do, so the ones that
+        queue up behind a download are answered with a small gap request.
+        """
+        from ib_insync import util
+
+        key = (symbol.upper(), bar_size, bool(use_rth), what_to_show)
+        async with self._async_key_lock(key):
+            request_duration, is_gap = self._plan(key, duration, bar_size)
+            bars = await self._request_async(
+                ib,
+                contract,
+                endDateTime='',
+                durationStr=request_duration,
+                barSizeSetting=bar_size,
+                whatToShow=what_to_show,
+                useRTH=use_rth
+            )
+            df = util.df(bars) if bars else None
+            if not is_gap and (df is None or df.empty):
+                return None
+            merged = self._merge(key, df, duration, bar_size, is_gap)
+        return self._window(merged, duration, bar_size)
+
+    def invalidate(self, symbol: str = None):
+        with self._lock:
+            for key in list(self._series):
+                if symbol is None or key[0] == symbol.upper():
+                    del self._series[key]
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'series': len(self._series),
+                'bars': sum(len(series['df']) for series in self._series.values()),
+                'fullFetches': self._full_fetches,
+                'gapFetches': self._gap_fetches,
+                'barsDownloaded': self._bars_downloaded
+            }
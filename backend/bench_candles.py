@@ -0,0 +1,99 @@
+"""
+Benchmark: vectorized bars_to_candles vs the old DataFrame.iterrows() conversion
+Run: python bench_candles.py [num_bars] [repeats]
+"""
+import math
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from candles import bars_to_candles
+
+def legacy_bars_to_candles(df):
+    """The per-row conversion fetch_from_ibkr used before candles.py (kept here for comparison)"""
+    def safe_float_convert(value, default=None):
+        if value is None:
+            return default
+        try:
+            val = float(value)
+            if math.isnan(val) or math.isinf(val):
+                return default
+            return val
+        except (ValueError, TypeError):
+            return default
+
+    def safe_int_convert(value, default=None):
+        if value is None:
+            return default
+        try:
+            val = float(value)
+            if math.isnan(val) or math.isinf(val):
+                return default
+            return int(val)
+        except (ValueError, TypeError):
+            return default
+
+    candles = []
+    for idx, row in df.iterrows():
+        open_val = safe_float_convert(row['open'], 0)
+        high_val = safe_float_convert(row['high'], 0)
+        low_val = safe_float_convert(row['low'], 0)
+        close_val = safe_float_convert(row['close'], 0)
+        vol_val = safe_int_convert(row['volume'], 0)
+        if open_val == 0 and high_val == 0 and low_val == 0 and close_val == 0:
+            continue
+        candles.append({
+            'time': row['date'].isoformat(),
+            'open': round(open_val, 2),
+            'high': round(high_val, 2),
+            'low': round(low_val, 2),
+            'close': round(close_val, 2),
+            'volume': vol_val
+        })
+    return candles
+
+def make_bars(num_bars):
+    """Random-walk 5-minute bars shaped like util.df(bars), with some NaN and empty rows"""
+    rng = np.random.default_rng(42)
+    close = 10 + np.cumsum(rng.normal(0, 0.05, num_bars))
+    df = pd.DataFrame({
+        'date': pd.date_range('2026-01-05 09:30', periods=num_bars, freq='5min', tz='US/Eastern'),
+        'open': close + rng.normal(0, 0.02, num_bars),
+        'high': close + 0.1,
+        'low': close - 0.1,
+        'close': close,
+        'volume': rng.integers(1_000, 500_000, num_bars).astype(float)
+    })
+    df.loc[df.sample(frac=0.01, random_state=1).index, 'volume'] = np.nan
+    df.loc[df.sample(frac=0.01, random_state=2).index, ['open', 'high', 'low', 'close']] = 0.0
+    return df
+
+def best_of(func, df, repeats):
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func(df)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+if __name__ == '__main__':
+    num_bars = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    repeats = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    df = make_bars(num_bars)
+
+    print(f"📊 Converting {num_bars} bars (best of {repeats})...")
+    legacy = legacy_bars_to_candles(df)
+    vectorized = bars_to_candles(df)
+    if legacy != vectorized:
+        mismatch = next(i for i, (a, b) in enumerate(zip(legacy, vectorized)) if a != b) if len(legacy) == len(vectorized) else None
+        print(f"❌ Outputs differ (legacy={len(legacy)} candles, vectorized={len(vectorized)}, first mismatch at {mismatch})")
+        sys.exit(1)
+    print(f"✅ Outputs identical ({len(vectorized)} candles)")
+
+    legacy_time = best_of(legacy_bars_to_candles, df, repeats)
+    vectorized_time = best_of(bars_to_candles, df, repeats)
+    print(f"   iterrows:   {legacy_time * 1000:8.2f} ms")
+    print(f"   vectorized: {vectorized_time * 1000:8.2f} ms")
+    print(f"🚀 Speedup: {legacy_time / vectorized_time:.1f}x")
@@ -0,0 +1,111 @@
+"""
+Candle Serialization
+Vectorized conversion of OHLCV bar DataFrames (IBKR util.df / yfinance history)
+into the candle dicts sent to the frontend and to Ollama
+"""
+from datetime import datetime
+from typing import List, Dict, Any, Optional
+
+import numpy as np
+import pandas as pd
+
+# Output key -> source column
+IBKR_COLUMNS = {'open': 'open', 'high': 'high', 'low': 'low', 'close': 'close', 'volume': 'volume'}
+YAHOO_COLUMNS = {'open': 'Open', 'high': 'High', 'low': 'Low', 'close': 'Close', 'volume': 'Volume'}
+
+PRICE_KEYS = ('open', 'high', 'low', 'close')
+
+def _clean(values) -> np.ndarray:
+    """Float array with NaN/inf replaced by 0"""
+    arr = pd.to_numeric(pd.Series(values), errors='coerce').to_numpy(dtype=float, na_value=np.nan, copy=True)
+    arr[~np.isfinite(arr)] = 0.0
+    return arr
+
+def _iso_times(values) -> np.ndarray:
+    """ISO-8601 strings for a column/index of bar times (datetime, tz-aware datetime or date)"""
+    if not isinstance(values, pd.Index):
+        values = pd.Index(values)
+
+    if isinstance(values, pd.DatetimeIndex) or pd.api.types.is_datetime64_any_dtype(values.dtype):
+        times = pd.DatetimeIndex(values)
+        unit = 'us' if (times.microsecond != 0).any() else 's'
+        if times.tz is None:
+            if unit == 's' and (times == times.normalize()).all():
+                # Daily bars - plain dates, as datetime.date.isoformat() writes them
+                unit = 'D'
+            return np.datetime_as_string(times.to_numpy(), unit=unit)
+        # Wall-clock time plus its UTC offset (+HH:MM, as isoformat writes it)
+        wall = times.tz_localize(None)
+        stamps = np.datetime_as_string(wall.to_numpy(), unit=unit)
+        offset_seconds = np.asarray((wall - times.tz_convert('UTC').tz_localize(None)).total_seconds(), dtype=np.int64)
+        unique_offsets, inverse = np.unique(offset_seconds, return_inverse=True)
+        suffixes = np.array([
+            f"{'-' if offset < 0 else '+'}{abs(offset) // 3600:02d}:{abs(offset) % 3600 // 60:02d}"
+            for offset in unique_offsets.tolist()
+        ])
+        return np.char.add(stamps, suffixes[inverse])
+
+    if values.dtype == object and len(values) and isinstance(values[0], datetime):
+        # Mixed offsets (e.g. across a DST change) don't fit one DatetimeIndex
+        return np.array([value.isoformat() for value in values])
+
+    # datetime.date (daily bars) stringifies as ISO already; anything else as str()
+    return values.astype(str).to_numpy()
+
+def bars_to_candles(df: pd.DataFrame,
+                    columns: Dict[str, str] = None,
+                    time_column: Optional[str] = 'date',
+                    decimals: Optional[int] = 2,
+                    drop_empty: bool = True,
+                    extra_columns: Dict[str, Any] = None) -> List[Dict[str, Any]]:
+    """
+    Convert an OHLCV DataFrame to a list of candle dicts using column operations.
+
+    Args:
+        df: Bars, one row per candle
+        columns: Output key -> source column (IBKR_COLUMNS by default)
+        time_column: Column holding the bar time; the index is used if it is missing
+        decimals: Round prices to this many decimals (None = leave as is)
+        drop_empty: Skip bars whose open/high/low/close are all 0 or NaN
+        extra_columns: Additional per-row values (e.g. moving averages), added as is; NaN entries are omitted
+
+    Returns:
+        [{'time', 'open', 'high', 'low', 'close', 'volume', ...}, ...]
+    """
+    if df is None or len(df) == 0:
+        return []
+
+    columns = columns or IBKR_COLUMNS
+    prices = np.column_stack([_clean(df[columns[key]]) for key in PRICE_KEYS])
+    volume = _clean(df[columns['volume']]).astype(np.int64)
+
+    if time_column and time_column in df.columns:
+        times = _iso_times(df[time_column])
+    else:
+        times = _iso_times(df.index)
+
+    if decimals is not None:
+        prices = np.round(prices, decimals)
+
+    extras = {}
+    for name, values in (extra_columns or {}).items():
+        extras[name] = pd.to_numeric(pd.Series(values), errors='coerce').to_numpy(dtype=float, na_value=np.nan)
+
+    if drop_empty:
+        keep = (prices != 0).any(axis=1)
+        if not keep.all():
+            prices, volume, times = prices[keep], volume[keep], times[keep]
+            extras = {name: values[keep] for name, values in extras.items()}
+
+    keys = ('time',) + PRICE_KEYS + ('volume',)
+    candles = [
+        dict(zip(keys, row))
+        for row in zip(times.tolist(), *prices.T.tolist(), volume.tolist())
+    ]
+
+    for name, values in extras.items():
+        for candle, value in zip(candles, values.tolist()):
+            if value == value:  # NaN != NaN
+                candle[name] = value
+
+    return candles
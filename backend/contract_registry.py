@@ -0,0 +1,214 @@
+"""
+IBKR Contract Registry
+Resolves each symbol's contract details (conId, longName, primary exchange) once and
+reuses the qualified contract for every data and order request. Entries are persisted
+to a JSON snapshot so a restart doesn't pay the lookups again.
+"""
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Any, Optional, Iterable
+
+try:
+    from ib_insync import Stock
+except ImportError:
+    Stock = None
+
+class ContractRegistry:
+    """
+    symbol -> {'conId', 'longName', 'primaryExchange', 'currency', 'resolvedAt'}.
+
+    `get_contract` hands out a fresh Stock with conId/primaryExchange filled in when the
+    symbol is known, so IBKR doesn't have to resolve it again and the contract is hashable
+    (required by IB.ticker()). Unknown symbols are resolved with one reqContractDetails call.
+
+    Lookups usually run on the IBKR event loop, so a newly resolved symbol only marks the
+    snapshot dirty; it is written from a background timer `save_delay` seconds later (one
+    write for a burst of new symbols), and `warm()` writes it once at the end.
+    """
+
+    def __init__(self, snapshot_path: str, max_age_days: float = 7.0, save_delay: float = 5.0):
+        self.snapshot_path = snapshot_path
+        self.max_age_seconds = max_age_days * 86400
+        self.save_delay = save_delay
+        self._ib = None
+        self._lock = threading.Lock()
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self._dirty = False
+        self._save_timer: Optional[threading.Timer] = None
+        self._lookups = 0
+        self._resolved = 0
+        self._failed = 0
+        self._load()
+
+    def set_ibkr_instance(self, ib_instance):
+        self._ib = ib_instance
+
+    # ---- persistence ----
+
+    def _load(self):
+        if not self.snapshot_path or not os.path.exists(self.snapshot_path):
+            return
+        try:
+            with open(self.snapshot_path, 'r', encoding='utf-8') as f:
+                self._entries = json.load(f).get('contracts', {})
+            logging.info(f"📇 [CONTRACTS] Loaded {len(self._entries)} contracts from {self.snapshot_path}")
+        except Exception as e:
+            logging.warning(f"⚠️ [CONTRACTS] Could not read snapshot {self.snapshot_path}: {e}")
+            self._entries = {}
+
+    def _save(self):
+        if not self.snapshot_path:
+            return
+        with self._lock:
+            payload = {'savedAt': datetime.now().isoformat(), 'contracts': dict(self._entries)}
+            self._dirty = False
+        tmp_path = f"{self.snapshot_path}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(payload, f, indent=1, sort_keys=True)
+            os.replace(tmp_path, self.snapshot_path)
+        except Exception as e:
+            logging.warning(f"⚠️ [CONTRACTS] Could not write snapshot {self.snapshot_path}: {e}")
+
+    def _save_later(self):
+        """Write the snapshot from a background thread after `save_delay` (once per burst)"""
+        with self._lock:
+            if not self.snapshot_path or self._save_timer is not None:
+                return
+            self._save_timer = threading.Timer(self.save_delay, self._save_if_dirty)
+            self._save_timer.daemon = True
+            self._save_timer.start()
+
+    def _save_if_dirty(self):
+        with self._lock:
+            self._save_timer = None
+            dirty = self._dirty
+        if dirty:
+            self._save()
+
+    # ---- lookups ----
+
+    def lookup(self, symbol: str) -> Optional[Dict[str, Any]]:
+        """Registry entry from memory only (None if the symbol was never resolved)"""
+        with self._lock:
+            self._lookups += 1
+            return self._entries.get(symbol.upper())
+
+    def _is_stale(self, entry: Dict[str, Any]) -> bool:
+        return time.time() - entry.get('resolvedAt', 0) > self.max_age_seconds
+
+    def _store(self, symbol: str, details) -> Optional[Dict[str, Any]]:
+        if not details:
+            with self._lock:
+                self._failed += 1
+            logging.warning(f"⚠️ [CONTRACTS] No contract details for {symbol}")
+            return None
+        contract = details[0].contract
+        entry = {
+            'conId': contract.conId,
+            'longName': details[0].longName or symbol,
+            'primaryExchange': contract.primaryExchange or '',
+            'currency': contract.currency or 'USD',
+            'resolvedAt': time.time()
+        }
+        with self._lock:
+            self._entries[symbol] = entry
+            self._resolved += 1
+            self._dirty = True
+        return entry
+
+    def _new_contract(self, symbol: str, entry: Optional[Dict[str, Any]]):
+        if entry:
+            return Stock(symbol, 'SMART', entry.get('currency', 'USD'),
+                         conId=entry['conId'], primaryExchange=entry.get('primaryExchange', ''))
+        return Stock(symbol, 'SMART', 'USD')
+
+    def resolve(self, symbol: str) -> Optional[Dict[str, Any]]:
+        """Registry entry, calling reqContractDetails once if the symbol is unknown"""
+        symbol = symbol.upper()
+        entry = self.lookup(symbol)
+        if entry or self._ib is None or Stock is None:
+            return entry
+        try:
+            entry = self._store(symbol, self._ib.reqContractDetails(Stock(symbol, 'SMART', 'USD')))
+        except Exception as e:
+            logging.warning(f"⚠️ [CONTRACTS] Could not resolve {symbol}: {e}")
+            return None
+        if entry:
+            self._save_later()
+        return entry
+
+    async def resolve_async(self, symbol: str) -> Optional[Dict[str, Any]]:
+        """Async twin of resolve() for code running on the ib_insync event loop"""
+        symbol = symbol.upper()
+        entry = self.lookup(symbol)
+        if entry or self._ib is None or Stock is None:
+            return entry
+        try:
+            entry = self._store(symbol, await self._ib.reqContractDetailsAsync(Stock(symbol, 'SMART', 'USD')))
+        except Exception as e:
+            logging.warning(f"⚠️ [CONTRACTS] Could not resolve {symbol}: {e}")
+            return None
+        if entry:
+            self._save_later()
+        return entry
+
+    def get_contract(self, symbol: str, resolve: bool = True):
+        """Fresh Stock contract, qualified with the registered conId when available"""
+        symbol = symbol.upper()
+        entry = self.resolve(symbol) if resolve else self.lookup(symbol)
+        return self._new_contract(symbol, entry)
+
+    def get_name(self, symbol: str, resolve: bool = True) -> str:
+        entry = self.resolve(symbol) if resolve else self.lookup(symbol)
+        return entry['longName'] if entry else symbol
+
+    def get_con_id(self, symbol: str, resolve: bool = True) -> Optional[int]:
+        entry = self.resolve(symbol) if resolve else self.lookup(symbol)
+        return entry['conId'] if entry else None
+
+    def warm(self, symbols: Iterable[str]) -> int:
+        """
+        Resolve every unknown or stale symbol in one concurrent batch and save the snapshot.
+        Runs the ib_insync event loop, so call it on the IBKR gateway worker.
+
+        Returns:
+            Number of symbols (re)resolved
+        """
+        if self._ib is None or Stock is None:
+            return 0
+        with self._lock:
+            todo = sorted({s.upper() for s in symbols if s and (s.upper() not in self._entries or self._is_stale(self._entries[s.upper()]))})
+        if not todo:
+            return 0
+
+        import asyncio
+        from ib_insync import util
+
+        async def resolve_one(symbol):
+            try:
+                return self._store(symbol, await self._ib.reqContractDetailsAsync(Stock(symbol, 'SMART', 'USD')))
+            except Exception as e:
+                logging.warning(f"⚠️ [CONTRACTS] Could not resolve {symbol}: {e}")
+                return None
+
+        start = time.time()
+        results = util.run(asyncio.gather(*(resolve_one(symbol) for symbol in todo)))
+        resolved = sum(1 for entry in results if entry)
+        self._save()
+        logging.info(f"📇 [CONTRACTS] Warmed {resolved}/{len(todo)} contracts in {time.time() - start:.2f}s")
+        return resolved
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'contracts': len(self._entries),
+                'lookups': self._lookups,
+                'resolved': self._resolved,
+                'failed': self._failed,
+                'snapshotPath': self.snapshot_path
+            }
@@ -0,0 +1,219 @@
+"""
+Stock Data Cache
+TTL + LRU cache for IBKR quotes and bars, keyed by (symbol, timeframe, RTH flag),
+with single-flight de-duplication so concurrent callers share one in-flight request
+"""
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Optional
+
+# Rough per-item costs used to keep the cache inside its memory budget
+_BASE_ENTRY_BYTES = 2_048
+_CANDLE_BYTES = 400
+
+def estimate_size(value: Any) -> int:
+    """Approximate memory footprint of a stock data dict (dominated by its candles)"""
+    if not isinstance(value, dict):
+        return _BASE_ENTRY_BYTES
+    num_candles = len(value.get('candles') or [])
+    for candles in (value.get('chartData') or {}).values():
+        if candles is not value.get('candles'):
+            num_candles += len(candles or [])
+    return _BASE_ENTRY_BYTES + num_candles * _CANDLE_BYTES
+
+class _InFlight:
+    """A fetch that other callers for the same key can wait on"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+class StockDataCache:
+    """
+    Thread-safe cache for stock data dicts.
+
+    Entries expire after their TTL and the least recently used ones are evicted once the
+    estimated size passes `max_bytes`. `get_or_fetch` runs at most one fetch per key at a
+    time - later callers block until it finishes and get the same result (`get_or_fetch_many`
+    does the same for a batch of keys).
+    """
+
+    def __init__(self, quote_ttl: float = 2.0, bar_ttl: float = 30.0, max_bytes: int = 64 * 1024 * 1024):
+        self.quote_ttl = quote_ttl
+        self.bar_ttl = bar_ttl
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        # key -> (value, expires_at, size)
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._in_flight: Dict[Hashable, _InFlight] = {}
+        self._bytes = 0
+        self._hits = 0
+        self._misses = 0
+        self._shared = 0
+        self._evictions = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Return a fresh cached value (a shallow copy) or None"""
+        with self._lock:
+            value = self._get_locked(key)
+            if value is None:
+                self._misses += 1
+                return None
+            self._hits += 1
+            return dict(value) if isinstance(value, dict) else value
+
+    def _get_locked(self, key: Hashable) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        value, expires_at, size = entry
+        if expires_at <= time.time():
+            del self._entries[key]
+            self._bytes -= size
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def put(self, key: Hashable, value: Any, ttl: float):
+        """Store a value (None is never cached)"""
+        if value is None:
+            return
+        size = estimate_size(value)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[2]
+            self._entries[key] = (value, time.time() + ttl, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes and self._entries:
+                _, (_, _, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self._evictions += 1
+
+    def get_or_fetch(self, key: Hashable, fetch: Callable[[], Any], ttl: float, wait_timeout: float = 120.0) -> Optional[Any]:
+        """
+        Return the cached value for `key`, or call `fetch()` once and cache its result.
+
+        Concurrent callers for a key that is already being fetched wait for that fetch
+        instead of issuing their own request.
+        """
+        with self._lock:
+            value = self._get_locked(key)
+            if value is not None:
+                self._hits += 1
+                return dict(value) if isinstance(value, dict) else value
+            self._misses += 1
+            flight = self._in_flight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._in_flight[key] = _InFlight()
+            else:
+                self._shared += 1
+
+        if not leader:
+            if not flight.done.wait(wait_timeout):
+                logging.warning(f"⏱️ [CACHE] Timed out waiting for in-flight fetch of {key}")
+                return None
+            if flight.error is not None:
+                raise flight.error
+            value = flight.result
+            return dict(value) if isinstance(value, dict) else value
+
+        try:
+            flight.result = fetch()
+            self.put(key, flight.result, ttl)
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                self._in_flight.pop(key, None)
+            flight.done.set()
+
+        value = flight.result
+        return dict(value) if isinstance(value, dict) else value
+
+    def get_or_fetch_many(self, keys: Iterable[Hashable], fetch_many: Callable[[List[Hashable]], Dict[Hashable, Any]],
+                          ttl: float, wait_timeout: float = 120.0) -> Dict[Hashable, Any]:
+        """
+        Batch form of get_or_fetch: cached keys are served from the cache, keys another
+        caller is already fetching are waited for, and the rest are fetched with one
+        `fetch_many(missing_keys)` call returning {key: value}.
+
+        Keys without a value (not returned, or a shared fetch that failed or timed out) are
+        left out of the result instead of failing the whole batch.
+        """
+        results: Dict[Hashable, Any] = {}
+        leading: Dict[Hashable, _InFlight] = {}
+        following: Dict[Hashable, _InFlight] = {}
+        with self._lock:
+            for key in dict.fromkeys(keys):
+                value = self._get_locked(key)
+                if value is not None:
+                    self._hits += 1
+                    results[key] = value
+                    continue
+                self._misses += 1
+                flight = self._in_flight.get(key)
+                if flight is None:
+                    leading[key] = self._in_flight[key] = _InFlight()
+                else:
+                    following[key] = flight
+                    self._shared += 1
+
+        if leading:
+            try:
+                fetched = fetch_many(list(leading)) or {}
+                for key, flight in leading.items():
+                    flight.result = fetched.get(key)
+                    self.put(key, flight.result, ttl)
+            except Exception as e:
+                for flight in leading.values():
+                    flight.error = e
+                raise
+            finally:
+                with self._lock:
+                    for key in leading:
+                        self._in_flight.pop(key, None)
+                for flight in leading.values():
+                    flight.done.set()
+            results.update({key: flight.result for key, flight in leading.items()})
+
+        deadline = time.time() + wait_timeout
+        for key, flight in following.items():
+            if not flight.done.wait(max(0.0, deadline - time.time())):
+                logging.warning(f"⏱️ [CACHE] Timed out waiting for in-flight fetch of {key}")
+            elif flight.error is None:
+                results[key] = flight.result
+
+        return {key: dict(value) if isinstance(value, dict) else value
+                for key, value in results.items() if value is not None}
+
+    def invalidate(self, symbol: str = None):
+        """Drop every entry for `symbol` (keys start with the symbol), or everything"""
+        with self._lock:
+            for key in list(self._entries):
+                if symbol is None or (isinstance(key, tuple) and key and key[0] == symbol):
+                    self._bytes -= self._entries.pop(key)[2]
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'maxBytes': self.max_bytes,
+                'hits': self._hits,
+                'misses': self._misses,
+                'hitRate': round(self._hits / lookups, 3) if lookups else 0.0,
+                'sharedFetches': self._shared,
+                'inFlight': len(self._in_flight),
+                'evictions': self._evictions,
+                'quoteTtl': self.quote_ttl,
+                'barTtl': self.bar_ttl
+            }
@@ -17,8 +17,7 @@ def fetch_level2_order_book(symbol: str, num_levels: int = 10) -> Optional[Dict[
         Dictionary with bids and asks, or None if unavailable
     """
     try:
-        from app import IBKR_AVAILABLE, IBKR_INSTANCE, IBKR_LOCK, connect_ibkr
-        from ib_insync import Stock
+        from app import IBKR_AVAILABLE, IBKR_INSTANCE, IBKR_GATEWAY, CONTRACT_REGISTRY, connect_ibkr
         
         if not IBKR_AVAILABLE:
             logging.debug(f"⚠️ [LEVEL2] IBKR not available for {symbol}")
@@ -29,72 +28,72 @@ def fetch_level2_order_book(symbol: str, num_levels: int = 10) -> Optional[Dict[
             logging.debug(f"⚠️ [LEVEL2] Could not connect to IBKR for {symbol}")
             return None
         
-        with IBKR_LOCK:
-            if not IBKR_INSTANCE or not IBKR_INSTANCE.isConnected():
-                logging.debug(f"⚠️ [LEVEL2] IBKR not connected for {symbol}")
-                return None
-            
-            # Create contract
-            contract = Stock(symbol, 'SMART', 'USD')
-            
-            # Request market depth (Level 2)
-            # Note: reqMktDepth requires Level 2 subscription
-            logging.info(f"📊 [LEVEL2] Requesting order book depth for {symbol}...")
-            
-            # Subscribe to market depth
-            IBKR_INSTANCE.reqMktDepth(contract, num_levels)
-            IBKR_INSTANCE.sleep(0.5)  # Wait for data
-            
-            # Get market depth from ticker
-            ticker = IBKR_INSTANCE.ticker(contract)
-            
-            # Extract bid and ask data
-            bids = []
-            asks = []
-            
-            if hasattr(ticker, 'domBids') and ticker.domBids:
-                for bid in ticker.domBids[:num_levels]:
-                    bids.append({
-                        'price': float(bid.price) if bid.price else 0.0,
-                        'size': int(bid.size) if bid.size else 0,
-                        'marketMaker': bid.marketMaker if hasattr(bid, 'marketMaker') else 'Unknown'
-                    })
-            
-            if hasattr(ticker, 'domAsks') and ticker.domAsks:
-                for ask in ticker.domAsks[:num_levels]:
-                    asks.append({
-                        'price': float(ask.price) if ask.price else 0.0,
-                        'size': int(ask.size) if ask.size else 0,
-                        'marketMaker': ask.marketMaker if hasattr(ask, 'marketMaker') else 'Unknown'
-                    })
-            
-            if not bids and not asks:
-                logging.debug(f"⚠️ [LEVEL2] No order book data available for {symbol}")
-                return None
-            
-            # Calculate totals
-            total_bid_size = sum(b['size'] for b in bids)
-            total_ask_size = sum(a['size'] for a in asks)
-            bid_ask_ratio = total_bid_size / total_ask_size if total_ask_size > 0 else 1.0
-            
-            level2_data = {
-                'symbol': symbol,
-                'bids': bids,
-                'asks': asks,
-                'totalBidSize': total_bid_size,
-                'totalAskSize': total_ask_size,
-                'bidAskRatio': bid_ask_ratio,
-                'bestBid': float(bids[0]['price']) if bids else None,
-                'bestAsk': float(asks[0]['price']) if asks else None,
-                'spread': float(asks[0]['price'] - bids[0]['price']) if (bids and asks) else None,
-                'timestamp': None  # Will be set by caller
-            }
-            
-            logging.info(f"✅ [LEVEL2] Retrieved order book for {symbol}: {len(bids)} bid levels, {len(asks)} ask levels")
-            logging.info(f"   Total Bids: {total_bid_size:,} shares, Total Asks: {total_ask_size:,} shares, Ratio: {bid_ask_ratio:.2f}")
-            
-            return level2_data
-            
+        if not IBKR_INSTANCE or not IBKR_INSTANCE.isConnected():
+            logging.debug(f"⚠️ [LEVEL2] IBKR not connected for {symbol}")
+            return None
+        
+        # Qualified contract from the shared registry
+        contract = CONTRACT_REGISTRY.get_contract(symbol)
+        
+        # Request market depth (Level 2)
+        # Note: reqMktDepth requires Level 2 subscription
+        logging.info(f"📊 [LEVEL2] Requesting order book depth for {symbol}...")
+        
+        # Subscribe to market depth (sent by the IBKR gateway worker, which keeps the book updating)
+        ib = IBKR_GATEWAY.client('depth')
+        ticker = ib.reqMktDepth(contract, num_levels)
+        ib.sleep(0.5)  # Wait for data - no lock held, other IBKR requests keep flowing
+        
+        # Extract bid and ask data
+        bids = []
+        asks = []
+        
+        if hasattr(ticker, 'domBids') and ticker.domBids:
+            for bid in ticker.domBids[:num_levels]:
+                bids.append({
+                    'price': float(bid.price) if bid.price else 0.0,
+                    'size': int(bid.size) if bid.size else 0,
+                    'marketMaker': bid.marketMaker if hasattr(bid, 'marketMaker') else 'Unknown'
+                })
+        
+        if hasattr(ticker, 'domAsks') and ticker.domAsks:
+            for ask in ticker.domAsks[:num_levels]:
+                asks.append({
+                    'price': float(ask.price) if ask.price else 0.0,
+                    'size': int(ask.size) if ask.size else 0,
+                    'marketMaker': ask.marketMaker if hasattr(ask, 'marketMaker') else 'Unknown'
+                })
+        
+        # One-shot read - free the depth line (IBKR allows only a few at a time)
+        ib.cancelMktDepth(contract)
+        
+        if not bids and not asks:
+            logging.debug(f"⚠️ [LEVEL2] No order book data available for {symbol}")
+            return None
+        
+        # Calculate totals
+        total_bid_size = sum(b['size'] for b in bids)
+        total_ask_size = sum(a['size'] for a in asks)
+        bid_ask_ratio = total_bid_size / total_ask_size if total_ask_size > 0 else 1.0
+        
+        level2_data = {
+            'symbol': symbol,
+            'bids': bids,
+            'asks': asks,
+            'totalBidSize': total_bid_size,
+            'totalAskSize': total_ask_size,
+            'bidAskRatio': bid_ask_ratio,
+            'bestBid': float(bids[0]['price']) if bids else None,
+            'bestAsk': float(asks[0]['price']) if asks else None,
+            'spread': float(asks[0]['price'] - bids[0]['price']) if (bids and asks) else None,
+            'timestamp': None  # Will be set by caller
+        }
+        
+        logging.info(f"✅ [LEVEL2] Retrieved order book for {symbol}: {len(bids)} bid levels, {len(asks)} ask levels")
+        logging.info(f"   Total Bids: {total_bid_size:,} shares, Total Asks: {total_ask_size:,} shares, Ratio: {bid_ask_ratio:.2f}")
+        
+        return level2_data
+        
     except Exception as e:
         logging.warning(f"⚠️ [LEVEL2] Error fetching Level 2 data for {symbol}: {e}")
         return None
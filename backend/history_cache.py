@@ -0,0 +1,218 @@
+"""
+On-Disk Daily History Cache
+One file per (symbol, useRTH) of fixed-width OHLCV records, opened with numpy.memmap.
+Multi-year daily charts are served by slicing the mapped file (no download, only the
+requested window is copied), and only the days since the last stored bar are requested
+from IBKR.
+"""
+import json
+import logging
+import math
+import os
+import threading
+import time
+from typing import Dict, Any, Optional
+
+import numpy as np
+import pandas as pd
+
+from bar_store import parse_duration
+
+# One record per daily bar; ts = bar date as epoch seconds (midnight UTC)
+HISTORY_DTYPE = np.dtype([
+    ('ts', '<i8'),
+    ('open', '<f8'),
+    ('high', '<f8'),
+    ('low', '<f8'),
+    ('close', '<f8'),
+    ('volume', '<f8')
+])
+
+_DAY_SECONDS = 86400
+_DURATION_DAYS = {'D': 1, 'W': 7, 'M': 31, 'Y': 366}
+
+class HistoryCache:
+    """
+    Daily bar files under `directory`: <SYMBOL>_<rth|eth>.ohlcv plus a small .meta JSON
+    recording how many days of history the file is known to cover.
+    """
+
+    def __init__(self, directory: str, refresh_seconds: float = 60.0, pacer=None):
+        self.directory = directory
+        self.refresh_seconds = refresh_seconds  # Minimum time between gap downloads per file
+        self.pacer = pacer  # Optional HistoricalDataPacer every download goes through
+        self._lock = threading.Lock()
+        self._symbol_locks: Dict[str, threading.Lock] = {}
+        self._hits = 0
+        self._full_downloads = 0
+        self._gap_downloads = 0
+
+    # ---- files ----
+
+    def _path(self, symbol: str, use_rth: bool) -> str:
+        return os.path.join(self.directory, f"{symbol.upper()}_{'rth' if use_rth else 'eth'}.ohlcv")
+
+    def _symbol_lock(self, path: str) -> threading.Lock:
+        with self._lock:
+            return self._symbol_locks.setdefault(path, threading.Lock())
+
+    def _read_meta(self, path: str) -> Dict[str, Any]:
+        try:
+            with open(f"{path}.meta", 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _write_meta(self, path: str, meta: Dict[str, Any]):
+        with open(f"{path}.meta", 'w', encoding='utf-8') as f:
+            json.dump(meta, f)
+
+    def open(self, symbol: str, use_rth: bool) -> Optional[np.memmap]:
+        """Read-only memmap of every stored bar (None if nothing is stored)"""
+        path = self._path(symbol, use_rth)
+        try:
+            if os.path.getsize(path) < HISTORY_DTYPE.itemsize:
+                return None
+        except OSError:
+            return None
+        return np.memmap(path, dtype=HISTORY_DTYPE, mode='r')
+
+    @staticmethod
+    def _records_from_frame(df: pd.DataFrame) -> np.ndarray:
+        """util.df daily bars -> structured records"""
+        records = np.empty(len(df), dtype=HISTORY_DTYPE)
+        dates = pd.to_datetime(pd.Series(df['date']).astype(str))
+        if dates.dt.tz is not None:
+            dates = dates.dt.tz_localize(None)
+        records['ts'] = dates.to_numpy().astype('datetime64[D]').astype('datetime64[s]').astype(np.int64)
+        for column in ('open', 'high', 'low', 'close', 'volume'):
+            records[column] = pd.to_numeric(df[column], errors='coerce').to_numpy(dtype=float, na_value=np.nan)
+        return records
+
+    def write(self, symbol: str, use_rth: bool, df: pd.DataFrame, covered_days: Optional[float] = None):
+        """
+        Store daily bars. With `covered_days` the file is replaced (full download); otherwise
+        bars from the first new date onward replace the stored ones, so today's still-forming
+        bar is replaced and older bars are kept.
+
+        Either way a new file is written and renamed over the old one, so readers never see a
+        partial write or a truncation. If the rename fails (on Windows a file that is still
+        mapped can't be replaced) the stored bars are kept and the failure is logged.
+        """
+        if df is None or df.empty:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(symbol, use_rth)
+        records = self._records_from_frame(df)
+
+        full = covered_days is not None or not os.path.exists(path)
+        if not full:
+            stored = self.open(symbol, use_rth)
+            if stored is not None:
+                start = int(np.searchsorted(stored['ts'], records['ts'][0], side='left'))
+                records = np.concatenate([stored[:start], records])
+            del stored
+
+        tmp_path = f"{path}.tmp"
+        try:
+            records.tofile(tmp_path)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logging.warning(f"⚠️ [HISTORY] [{symbol}] Could not replace {path}, keeping the stored bars: {e}")
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            return
+        if full:
+            self._write_meta(path, {'coveredDays': covered_days or 0, 'written': time.time()})
+
+    # ---- serving ----
+
+    def _request(self, ib, contract, **params):
+        if self.pacer is not None:
+            return self.pacer.request(ib, contract, **params)
+        return ib.reqHistoricalData(contract, **params)
+
+    def get_daily_bars(self, ib, contract, symbol: str, duration: str, use_rth: bool) -> Optional[pd.DataFrame]:
+        """
+        Daily bars covering `duration` ('1 Y', '10 Y', ...), downloading only what the file lacks.
+
+        Returns:
+            DataFrame in util.df layout (copied out of the mapped file), or None
+        """
+        from ib_insync import util
+
+        amount, unit = parse_duration(duration)
+        wanted_days = amount * _DURATION_DAYS[unit]
+        path = self._path(symbol, use_rth)
+
+        with self._symbol_lock(path):
+            stored = self.open(symbol, use_rth)
+            covered_days = self._read_meta(path).get('coveredDays', 0)
+
+            if stored is None or covered_days < wanted_days:
+                bars = self._request(ib, contract, endDateTime='', durationStr=duration,
+                                     barSizeSetting='1 day', whatToShow='TRADES', useRTH=use_rth)
+                if not bars:
+                    return None
+                del stored
+                self.write(symbol, use_rth, util.df(bars), covered_days=wanted_days)
+                with self._lock:
+                    self._full_downloads += 1
+                logging.info(f"💾 [HISTORY] [{symbol}] Stored {len(bars)} daily bars ({duration})")
+            else:
+                # Re-request from the last stored day (its bar may still have been forming)
+                gap_days = math.ceil((time.time() - int(stored['ts'][-1])) / _DAY_SECONDS)
+                del stored
+                if time.time() - os.path.getmtime(path) >= self.refresh_seconds:
+                    bars = self._request(ib, contract, endDateTime='', durationStr=f"{min(max(gap_days, 1) + 1, 365)} D",
+                                         barSizeSetting='1 day', whatToShow='TRADES', useRTH=use_rth)
+                    if bars:
+                        self.write(symbol, use_rth, util.df(bars))
+                    with self._lock:
+                        self._gap_downloads += 1
+                else:
+                    with self._lock:
+                        self._hits += 1
+
+            return self.slice(symbol, use_rth, wanted_days)
+
+    def slice(self, symbol: str, use_rth: bool, days: float) -> Optional[pd.DataFrame]:
+        """
+        Last `days` calendar days of stored bars as a DataFrame. The window is copied so the
+        file isn't left mapped while the caller uses it (a mapped file can't be replaced on
+        Windows)
+        """
+        stored = self.open(symbol, use_rth)
+        if stored is None:
+            return None
+        start_ts = int(stored['ts'][-1]) - int(days * _DAY_SECONDS)
+        view = np.array(stored[int(np.searchsorted(stored['ts'], start_ts, side='right')):])
+        del stored
+        return pd.DataFrame({
+            'date': view['ts'].astype('datetime64[s]').astype('datetime64[D]'),
+            'open': view['open'],
+            'high': view['high'],
+            'low': view['low'],
+            'close': view['close'],
+            'volume': view['volume']
+        }, copy=False)
+
+    def get_stats(self) -> Dict[str, Any]:
+        files = 0
+        size = 0
+        if os.path.isdir(self.directory):
+            for name in os.listdir(self.directory):
+                if name.endswith('.ohlcv'):
+                    files += 1
+                    size += os.path.getsize(os.path.join(self.directory, name))
+        with self._lock:
+            return {
+                'directory': self.directory,
+                'files': files,
+                'bytes': size,
+                'hits': self._hits,
+                'fullDownloads': self._full_downloads,
+                'gapDownloads': self._gap_downloads
+            }
@@ -0,0 +1,257 @@
+"""
+IBKR Gateway Worker
+One thread owns the ib_insync event loop and the IB connection. Everything else submits
+typed requests (order, quote, bars, depth, account, ...) through a priority queue and
+gets a future back, so orders and stop updates are served before queued scan traffic
+and no request thread ever runs the event loop itself.
+"""
+import asyncio
+import concurrent.futures
+import functools
+import inspect
+import itertools
+import logging
+import queue
+import threading
+import time
+from typing import Dict, Any, Callable, Optional
+
+# Lower runs first; requests of the same priority run in submission order
+REQUEST_PRIORITIES = {
+    'order': 0,     # New orders, cancels
+    'stop': 0,      # Stop / trailing stop modifications
+    'account': 1,   # Balances, positions
+    'admin': 1,     # Connect / reconnect
+    'quote': 2,     # Market data lines
+    'depth': 2,     # Level 2 order book
+    'contract': 3,  # Contract details
+    'bars': 4,      # Historical bars
+    'news': 4,
+    'scan': 5       # Scanner / market mover batches
+}
+
+# IB methods that only read state ib_insync already keeps in memory - safe to call from any thread
+_LOCAL_METHODS = frozenset({
+    'isConnected', 'ticker', 'tickers', 'pendingTickers', 'positions', 'portfolio', 'trades',
+    'openTrades', 'orders', 'openOrders', 'fills', 'executions', 'accountValues', 'managedAccounts'
+})
+
+class _Request:
+    __slots__ = ('priority', 'seq', 'kind', 'fn', 'args', 'kwargs', 'future', 'submitted')
+
+    def __init__(self, priority, seq, kind, fn, args, kwargs):
+        self.priority = priority
+        self.seq = seq
+        self.kind = kind
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.future = concurrent.futures.Future()
+        self.submitted = time.time()
+
+    def __lt__(self, other):
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+class IBClient:
+    """
+    Stand-in for an IB instance that runs every call on the gateway worker as `kind` requests.
+
+    Calls with an ...Async twin (reqHistoricalData, reqContractDetails, ...) run the async version
+    as a task, so the worker keeps serving other requests while IBKR answers. Calls made on the
+    worker itself (e.g. from a scan task) go straight to the IB instance.
+    """
+
+    def __init__(self, gateway: 'IBKRGateway', kind: str):
+        self._gateway = gateway
+        self._kind = kind
+
+    def sleep(self, seconds: float = 0.02) -> bool:
+        """ib.sleep() on the worker; a plain wait anywhere else (the worker keeps the loop running)"""
+        if self._gateway.in_worker() and self._gateway.ib is not None:
+            return self._gateway.ib.sleep(seconds)
+        time.sleep(seconds)
+        return True
+
+    def __getattr__(self, name: str):
+        ib = self._gateway.ib
+        if ib is None:
+            raise ConnectionError('IBKR gateway has no IB instance (not connected yet)')
+        attr = getattr(ib, name)
+        if not inspect.ismethod(attr) or name in _LOCAL_METHODS or self._gateway.in_worker():
+            return attr
+        target = attr if name.endswith('Async') else getattr(ib, f"{name}Async", attr)
+        return functools.partial(self._gateway.call, self._kind, target)
+
+class IBKRGateway:
+    """
+    Single IBKR I/O worker.
+
+    `submit(kind, fn, *args)` queues fn to run on the worker thread and returns a
+    concurrent.futures.Future. A plain function runs to completion on the worker; a coroutine
+    function is started as a task on the worker's loop (its future resolves when the task does),
+    so long network waits don't hold up the queue. While idle the worker keeps the event loop
+    running, which keeps streaming tickers and order status up to date.
+    """
+
+    def __init__(self, request_timeout: float = 120.0, idle_poll: float = 0.05):
+        self.request_timeout = request_timeout
+        self.idle_poll = idle_poll
+        self.ib = None
+        self._queue: "queue.PriorityQueue[_Request]" = queue.PriorityQueue()
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wake: Optional[asyncio.Event] = None
+        self._ready = threading.Event()
+        self._tasks: Dict[concurrent.futures.Future, asyncio.Task] = {}
+        # kind -> {'submitted', 'started', 'completed', 'failed', 'waitSeconds'}
+        self._stats: Dict[str, Dict[str, float]] = {}
+        self._max_queue = 0
+
+    def set_ibkr_instance(self, ib_instance):
+        self.ib = ib_instance
+
+    def client(self, kind: str) -> IBClient:
+        """IB look-alike that sends its calls through this gateway as `kind` requests"""
+        return IBClient(self, kind)
+
+    # ---- worker ----
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name='ibkr-gateway', daemon=True)
+            self._thread.start()
+        self._ready.wait()
+        logging.info("✅ [IBKR GATEWAY] Worker started")
+
+    def in_worker(self) -> bool:
+        return threading.current_thread() is self._thread
+
+    def _run(self):
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+        try:
+            # Sync IB calls made from inside scan tasks need a re-entrant loop
+            from ib_insync import util
+            util.patchAsyncio()
+        except ImportError:
+            pass
+        self._wake = asyncio.Event()
+        self._ready.set()
+
+        while True:
+            self._wake.clear()
+            try:
+                request = self._queue.get_nowait()
+            except queue.Empty:
+                self._loop.run_until_complete(self._idle())
+                continue
+            try:
+                self._execute(request)
+            except Exception as e:
+                logging.error(f"❌ [IBKR GATEWAY] Worker error on {request.kind} request: {e}")
+
+    async def _idle(self):
+        """Run the event loop until a request arrives (or idle_poll passes)"""
+        try:
+            await asyncio.wait_for(self._wake.wait(), self.idle_poll)
+        except asyncio.TimeoutError:
+            pass
+
+    def _execute(self, request: _Request):
+        future = request.future
+        if not future.set_running_or_notify_cancel():
+            return
+        with self._lock:
+            self._stats[request.kind]['started'] += 1
+            self._stats[request.kind]['waitSeconds'] += time.time() - request.submitted
+        try:
+            result = request.fn(*request.args, **request.kwargs)
+        except BaseException as e:
+            self._finish(request, error=e)
+            return
+        if not inspect.isawaitable(result):
+            self._finish(request, result=result)
+            return
+
+        task = asyncio.ensure_future(result, loop=self._loop)
+        with self._lock:
+            self._tasks[future] = task
+
+        def on_done(task):
+            with self._lock:
+                self._tasks.pop(future, None)
+            if task.cancelled():
+                self._finish(request, error=concurrent.futures.CancelledError())
+            elif task.exception() is not None:
+                self._finish(request, error=task.exception())
+            else:
+                self._finish(request, result=task.result())
+        task.add_done_callback(on_done)
+
+    def _finish(self, request: _Request, result: Any = None, error: BaseException = None):
+        with self._lock:
+            self._stats[request.kind]['failed' if error is not None else 'completed'] += 1
+        if error is not None:
+            request.future.set_exception(error)
+        else:
+            request.future.set_result(result)
+
+    # ---- public API ----
+
+    def submit(self, kind: str, fn: Callable, *args, **kwargs) -> concurrent.futures.Future:
+        """Queue fn(*args, **kwargs) for the worker and return its future"""
+        if kind not in REQUEST_PRIORITIES:
+            raise ValueError(f"Unknown IBKR request kind: {kind}")
+        self.start()
+        request = _Request(REQUEST_PRIORITIES[kind], next(self._seq), kind, fn, args, kwargs)
+        with self._lock:
+            stats = self._stats.setdefault(kind, {'submitted': 0, 'started': 0, 'completed': 0, 'failed': 0, 'waitSeconds': 0.0})
+            stats['submitted'] += 1
+        self._queue.put(request)
+        self._max_queue = max(self._max_queue, self._queue.qsize())
+        try:
+            self._loop.call_soon_threadsafe(self._wake.set)
+        except RuntimeError:
+            pass  # Loop closed during interpreter shutdown
+        return request.future
+
+    def call(self, kind: str, fn: Callable, *args, **kwargs) -> Any:
+        """
+        Run fn on the worker and wait for its result (re-raising its exception).
+        Called on the worker itself, fn runs immediately instead of being queued.
+        """
+        if self.in_worker():
+            return fn(*args, **kwargs)
+        return self.submit(kind, fn, *args, **kwargs).result(timeout=self.request_timeout)
+
+    def cancel(self, future: concurrent.futures.Future):
+        """Cancel a queued request, or the task of a running coroutine request"""
+        if future.cancel():
+            return
+        with self._lock:
+            task = self._tasks.get(future)
+        if task is not None:
+            self._loop.call_soon_threadsafe(task.cancel)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            kinds = {
+                kind: {
+                    'submitted': stats['submitted'],
+                    'completed': stats['completed'],
+                    'failed': stats['failed'],
+                    'avgQueueWaitMs': round(stats['waitSeconds'] / stats['started'] * 1000, 1) if stats['started'] else 0.0
+                }
+                for kind, stats in self._stats.items()
+            }
+            return {
+                'running': self._thread is not None and self._thread.is_alive(),
+                'queued': self._queue.qsize(),
+                'maxQueued': self._max_queue,
+                'runningTasks': len(self._tasks),
+                'kinds': kinds
+            }
@@ -3,22 +3,182 @@ Interactive Brokers Trading Service
 Handles buy/sell orders with stop loss and take profit
 """
 import logging
+import math
+import os
 import traceback
 import threading
-from typing import Dict, Any, Optional
+import time
+from typing import Dict, Any, List, Optional, Tuple
 from ib_insync import IB, Stock, MarketOrder, LimitOrder, StopOrder, StopLimitOrder, Order, Trade
+from ib_insync.util import UNSET_DOUBLE
+from concurrent.futures import ThreadPoolExecutor
+
+from order_book import OrderBook
+from trade_journal import TradeJournal
 from datetime import datetime
 
-# Import IBKR connection from app.py
-# This will be set by the main app
+# IBKR connection from app.py - set by the main app to a gateway client, so every call
+# runs on the IBKR gateway worker as an 'order' request (ahead of queued scan traffic)
 IBKR_INSTANCE: Optional[IB] = None
-IBKR_LOCK = None  # Will be set by app.py
+CONTRACT_REGISTRY = None  # Shared contract registry from app.py (optional)
+MARKET_DATA_STREAM = None  # Shared streaming quote subscriptions from app.py (optional)
+# Trailing stops as IBKR TRAIL orders (trail at the broker) - false trails them client-side on ticks
+NATIVE_TRAILING = os.getenv('IBKR_NATIVE_TRAILING', 'true').lower() == 'true'
+# Trading state journal (active trades, stop moves, daily limits, orders and fills), replayed at startup
+TRADE_JOURNAL = TradeJournal(os.path.join(os.path.dirname(__file__), os.getenv('TRADE_JOURNAL_PATH', 'trade_journal.db')))  # Relative to backend/
 
-def set_ibkr_instance(ib_instance: IB, ib_lock):
-    """Set the IBKR instance and lock from the main app"""
-    global IBKR_INSTANCE, IBKR_LOCK
+def set_ibkr_instance(ib_instance: IB, contract_registry=None, market_data_stream=None):
+    """Set the IBKR instance (an IBKRGateway client), contract registry and quote stream from the main app"""
+    global IBKR_INSTANCE, CONTRACT_REGISTRY, MARKET_DATA_STREAM
     IBKR_INSTANCE = ib_instance
-    IBKR_LOCK = ib_lock
+    CONTRACT_REGISTRY = contract_registry
+    MARKET_DATA_STREAM = market_data_stream
+
+def _get_contract(symbol: str) -> Stock:
+    """Qualified contract from the registry, or a plain SMART-routed stock without one"""
+    if CONTRACT_REGISTRY is not None:
+        return CONTRACT_REGISTRY.get_contract(symbol)
+    return Stock(symbol, 'SMART', 'USD')
+
+def bracket_prices(action: str, reference_price: float, stop_loss_percent: Optional[float] = None,
+                   take_profit_percent: Optional[float] = None,
+                   trailing_stop_percent: Optional[float] = None) -> Tuple[Optional[float], Optional[float]]:
+    """
+    (stop_loss_price, take_profit_price) around the entry price; a trailing stop without an
+    explicit stop loss starts `trailing_stop_percent` away from the entry
+    """
+    direction = 1 if action == 'BUY' else -1
+    stop_percent = stop_loss_percent or trailing_stop_percent
+    stop_loss_price = reference_price * (1 - direction * stop_percent / 100) if stop_percent else None
+    take_profit_price = reference_price * (1 + direction * take_profit_percent / 100) if take_profit_percent else None
+    return stop_loss_price, take_profit_price
+
+def build_exit_orders(action: str, quantity: int, parent_order_id: int, stop_loss_price: Optional[float] = None,
+                      take_profit_price: Optional[float] = None, trailing_percent: Optional[float] = None,
+                      trail_limit_offset: Optional[float] = None) -> List[Order]:
+    """
+    Child orders of a bracket: take profit (LMT) and stop loss, one OCA group so a fill of
+    either cancels the other. With `trailing_percent` the stop is a native TRAIL order
+    starting at `stop_loss_price` (TRAIL LIMIT with `trail_limit_offset`), so IBKR trails it.
+    The last order transmits the whole bracket.
+    """
+    exit_action = 'SELL' if action == 'BUY' else 'BUY'
+    orders = []
+    if take_profit_price:
+        orders.append(LimitOrder(exit_action, quantity, lmtPrice=round_to_tick(take_profit_price)))
+    if stop_loss_price:
+        if trailing_percent:
+            stop_order = Order(
+                action=exit_action,
+                totalQuantity=quantity,
+                orderType='TRAIL LIMIT' if trail_limit_offset else 'TRAIL',
+                trailingPercent=trailing_percent,
+                trailStopPrice=round_to_tick(stop_loss_price)
+            )
+            if trail_limit_offset:
+                stop_order.lmtPriceOffset = trail_limit_offset
+        else:
+            stop_order = StopOrder(exit_action, quantity, stopPrice=round_to_tick(stop_loss_price))
+        orders.append(stop_order)
+    
+    for order in orders:
+        order.parentId = parent_order_id
+        order.ocaGroup = f"BRACKET-{parent_order_id}"
+        order.ocaType = 1  # Cancel the remaining exit when one fills
+        order.transmit = False
+    if orders:
+        orders[-1].transmit = True
+    return orders
+
+def _place_bracket(contract, parent_order: Order, action: str, quantity: int, reference_price: float,
+                   stop_loss_percent: Optional[float], take_profit_percent: Optional[float],
+                   trailing_stop_percent: Optional[float]) -> Dict[str, Any]:
+    """
+    Place `parent_order` with its exit orders as one bracket, and register trailing trades
+    (native ones only for reconciliation)
+    
+    Returns:
+        {'parentOrderId', 'stopLossPrice', 'takeProfitPrice', 'stopOrderType'}
+    """
+    parent_order.transmit = False  # Children need the parent's id; the last child transmits all
+    parent_trade = IBKR_INSTANCE.placeOrder(contract, parent_order)
+    parent_order_id = parent_trade.order.orderId
+    logging.info(f"✅ [TRADING] Parent order placed: Order ID {parent_order_id}")
+    
+    native = bool(trailing_stop_percent) and NATIVE_TRAILING
+    stop_loss_price, take_profit_price = bracket_prices(action, reference_price, stop_loss_percent,
+                                                        take_profit_percent, trailing_stop_percent)
+    children = build_exit_orders(action, quantity, parent_order_id, stop_loss_price, take_profit_price,
+                                 trailing_stop_percent if native else None)
+    for order in children:
+        IBKR_INSTANCE.placeOrder(contract, order)
+        price = {'LMT': order.lmtPrice, 'STP': order.auxPrice}.get(order.orderType, order.trailStopPrice)
+        logging.info(f"✅ [TRADING] Bracket order placed: {order.orderType} {order.action} {order.totalQuantity} @ ${price:.2f} (OCA {order.ocaGroup})")
+    if not children:
+        parent_order.transmit = True
+        IBKR_INSTANCE.placeOrder(contract, parent_order)
+    
+    stop_order = children[-1] if stop_loss_price else None
+    if trailing_stop_percent and stop_order is not None:
+        register_trade_for_trailing(
+            order_id=parent_order_id,
+            symbol=contract.symbol,
+            action=action,
+            entry_price=reference_price,
+            initial_stop_loss=stop_loss_price,
+            trailing_percent=trailing_stop_percent,
+            stop_order_id=stop_order.orderId,
+            native=native
+        )
+        logging.info(f"📈 [TRADING] Trailing stop enabled: {trailing_stop_percent}% ({'IBKR TRAIL order' if native else 'client-side'})")
+    
+    return {
+        'parentOrderId': parent_order_id,
+        'stopLossPrice': stop_loss_price,
+        'takeProfitPrice': take_profit_price,
+        'stopOrderType': stop_order.orderType if stop_order is not None else None
+    }
+
+# Orders placed in the background; state and events come from IBKR's order events
+ORDER_BOOK = OrderBook(journal=TRADE_JOURNAL)
+_ORDER_EXECUTOR = ThreadPoolExecutor(max_workers=2, thread_name_prefix='order-submit')
+
+def submit_order(
+    symbol: str,
+    action: str,
+    quantity: int,
+    order_type: str = 'MARKET',
+    limit_price: Optional[float] = None,
+    stop_loss_percent: Optional[float] = None,
+    take_profit_percent: Optional[float] = None,
+    trailing_stop_percent: Optional[float] = None
+) -> Dict[str, Any]:
+    """
+    Queue an order and return its handle right away
+    
+    The order is placed (place_market_order / place_limit_order) on a background thread.
+    Its outcome ('accepted' with the orderId, or 'failed'), then status changes, fills and
+    rejections are published as ORDER_BOOK events.
+    
+    Returns:
+        Handle dict ({'handle', 'status': 'Queued', ...})
+    """
+    handle = ORDER_BOOK.create_handle(symbol, action, quantity, order_type)
+    
+    def place():
+        try:
+            if order_type == 'LIMIT':
+                result = place_limit_order(symbol, action, quantity, limit_price, stop_loss_percent,
+                                           take_profit_percent, trailing_stop_percent)
+            else:
+                result = place_market_order(symbol, action, quantity, stop_loss_percent,
+                                            take_profit_percent, trailing_stop_percent)
+        except Exception as e:
+            result = {'success': False, 'error': str(e), 'message': f'Error placing {action} order for {symbol}: {e}'}
+        ORDER_BOOK.resolve_handle(handle['handle'], result)
+    
+    _ORDER_EXECUTOR.submit(place)
+    return handle
 
 def place_market_order(
     symbol: str,
@@ -37,6 +197,7 @@ def place_market_order(
         quantity: Number of shares
         stop_loss_percent: Stop loss as percentage (e.g., 2.0 for 2%)
         take_profit_percent: Take profit as percentage (e.g., 5.0 for 5%)
+        trailing_stop_percent: Trail the stop this percentage behind the best price (IBKR TRAIL order)
     
     Returns:
         Dict with order details and status
@@ -48,129 +209,59 @@ def place_market_order(
             'message': 'Interactive Brokers is not connected. Please connect first.'
         }
     
-    if IBKR_LOCK is None:
-        return {
-            'success': False,
-            'error': 'IBKR lock not initialized',
-            'message': 'Trading service not properly initialized'
-        }
-    
     try:
-        with IBKR_LOCK:
-            # Create stock contract
-            contract = Stock(symbol, 'SMART', 'USD')
-            
-            # Get current market price
-            IBKR_INSTANCE.reqMktData(contract, '', False, False)
-            ticker = IBKR_INSTANCE.ticker(contract)
-            IBKR_INSTANCE.sleep(0.5)  # Wait for market data
-            
-            if not ticker.marketPrice():
-                # Fallback: use last price
-                current_price = ticker.last or ticker.close or 0
-                if current_price == 0:
-                    return {
-                        'success': False,
-                        'error': 'No market price available',
-                        'message': f'Could not get current price for {symbol}'
-                    }
-            else:
-                current_price = ticker.marketPrice()
-            
-            logging.info(f"📈 [TRADING] Placing {action} order for {quantity} shares of {symbol} at ${current_price:.2f}")
-            
-            # Create parent market order
-            parent_order = MarketOrder(action, quantity)
-            parent_order.transmit = False  # Don't transmit until bracket is ready
-            
-            # Place parent order
-            parent_trade = IBKR_INSTANCE.placeOrder(contract, parent_order)
-            parent_order_id = parent_trade.order.orderId
-            
-            logging.info(f"✅ [TRADING] Parent order placed: Order ID {parent_order_id}")
-            
-            # Calculate stop loss and take profit prices
-            if action == 'BUY':
-                if stop_loss_percent:
-                    stop_loss_price = current_price * (1 - stop_loss_percent / 100)
-                if take_profit_percent:
-                    take_profit_price = current_price * (1 + take_profit_percent / 100)
-            else:  # SELL
-                if stop_loss_percent:
-                    stop_loss_price = current_price * (1 + stop_loss_percent / 100)
-                if take_profit_percent:
-                    take_profit_price = current_price * (1 - take_profit_percent / 100)
-            
-            # Create bracket orders
-            bracket_orders = []
-            
-            # Take profit order (if specified)
-            if take_profit_percent:
-                take_profit_order = LimitOrder(
-                    'SELL' if action == 'BUY' else 'BUY',
-                    quantity,
-                    lmtPrice=take_profit_price
-                )
-                take_profit_order.parentId = parent_order_id
-                take_profit_order.transmit = False
-                bracket_orders.append(take_profit_order)
-                logging.info(f"🎯 [TRADING] Take profit set at ${take_profit_price:.2f} ({take_profit_percent}%)")
-            
-            # Stop loss order (if specified)
-            if stop_loss_percent:
-                stop_loss_order = StopOrder(
-                    'SELL' if action == 'BUY' else 'BUY',
-                    quantity,
-                    stopPrice=stop_loss_price
-                )
-                stop_loss_order.parentId = parent_order_id
-                stop_loss_order.transmit = True  # Last order transmits all
-                bracket_orders.append(stop_loss_order)
-                logging.info(f"🛑 [TRADING] Stop loss set at ${stop_loss_price:.2f} ({stop_loss_percent}%)")
-            
-            # Place bracket orders
-            bracket_trades = []
-            for order in bracket_orders:
-                trade = IBKR_INSTANCE.placeOrder(contract, order)
-                bracket_trades.append(trade)
-                logging.info(f"✅ [TRADING] Bracket order placed: {order.action} {order.totalQuantity} @ ${order.auxPrice or order.lmtPrice:.2f}")
-            
-            # Now transmit the parent order
-            parent_order.transmit = True
-            IBKR_INSTANCE.placeOrder(contract, parent_order)
-            
-            # Register for trailing stop if specified
-            if trailing_stop_percent and stop_loss_percent:
-                register_trade_for_trailing(
-                    order_id=parent_order_id,
-                    symbol=symbol,
-                    action=action,
-                    entry_price=current_price,
-                    initial_stop_loss=stop_loss_price,
-                    trailing_percent=trailing_stop_percent
-                )
-                logging.info(f"📈 [TRADING] Trailing stop enabled: {trailing_stop_percent}%")
-            
-            result = {
-                'success': True,
-                'orderId': parent_order_id,
-                'symbol': symbol,
-                'action': action,
-                'quantity': quantity,
-                'entryPrice': current_price,
-                'stopLossPrice': stop_loss_price if stop_loss_percent else None,
-                'stopLossPercent': stop_loss_percent,
-                'takeProfitPrice': take_profit_price if take_profit_percent else None,
-                'takeProfitPercent': take_profit_percent,
-                'trailingStopPercent': trailing_stop_percent,
-                'timestamp': datetime.now().isoformat(),
-                'status': 'Submitted',
-                'message': f'{action} order placed for {quantity} shares of {symbol}'
-            }
-            
-            logging.info(f"✅ [TRADING] Order complete: {result['message']}")
-            return result
-            
+        # Create stock contract
+        contract = _get_contract(symbol)
+        
+        # Get current market price
+        IBKR_INSTANCE.reqMktData(contract, '', False, False)
+        ticker = IBKR_INSTANCE.ticker(contract)
+        # Wait for market data - only until the first price arrives (the gateway worker keeps ticks flowing)
+        price_deadline = time.time() + 0.5
+        while not ticker.marketPrice() > 0 and time.time() < price_deadline:
+            IBKR_INSTANCE.sleep(0.05)
+        
+        if not ticker.marketPrice():
+            # Fallback: use last price
+            current_price = ticker.last or ticker.close or 0
+            if current_price == 0:
+                return {
+                    'success': False,
+                    'error': 'No market price available',
+                    'message': f'Could not get current price for {symbol}'
+                }
+        else:
+            current_price = ticker.marketPrice()
+        
+        logging.info(f"📈 [TRADING] Placing {action} order for {quantity} shares of {symbol} at ${current_price:.2f}")
+        
+        bracket = _place_bracket(contract, MarketOrder(action, quantity), action, quantity, current_price,
+                                 stop_loss_percent, take_profit_percent, trailing_stop_percent)
+        parent_order_id = bracket['parentOrderId']
+        stop_loss_price = bracket['stopLossPrice']
+        take_profit_price = bracket['takeProfitPrice']
+        
+        result = {
+            'success': True,
+            'orderId': parent_order_id,
+            'symbol': symbol,
+            'action': action,
+            'quantity': quantity,
+            'entryPrice': current_price,
+            'stopLossPrice': stop_loss_price,
+            'stopLossPercent': stop_loss_percent,
+            'takeProfitPrice': take_profit_price,
+            'takeProfitPercent': take_profit_percent,
+            'trailingStopPercent': trailing_stop_percent,
+            'stopOrderType': bracket['stopOrderType'],
+            'timestamp': datetime.now().isoformat(),
+            'status': 'Submitted',
+            'message': f'{action} order placed for {quantity} shares of {symbol}'
+        }
+        
+        logging.info(f"✅ [TRADING] Order complete: {result['message']}")
+        return result
+        
     except Exception as e:
         error_msg = f"Error placing {action} order for {symbol}: {str(e)}"
         logging.error(f"❌ [TRADING] {error_msg}")
@@ -200,6 +291,7 @@ def place_limit_order(
         limit_price: Limit price for the order
         stop_loss_percent: Stop loss as percentage
         take_profit_percent: Take profit as percentage
+        trailing_stop_percent: Trail the stop this percentage behind the best price (IBKR TRAIL order)
     
     Returns:
         Dict with order details and status
@@ -211,101 +303,38 @@ def place_limit_order(
             'message': 'Interactive Brokers is not connected'
         }
     
-    if IBKR_LOCK is None:
-        return {
-            'success': False,
-            'error': 'IBKR lock not initialized'
-        }
-    
     try:
-        with IBKR_LOCK:
-            contract = Stock(symbol, 'SMART', 'USD')
-            
-            # Create parent limit order
-            parent_order = LimitOrder(action, quantity, lmtPrice=limit_price)
-            parent_order.transmit = False
-            
-            # Place parent order
-            parent_trade = IBKR_INSTANCE.placeOrder(contract, parent_order)
-            parent_order_id = parent_trade.order.orderId
-            
-            logging.info(f"📈 [TRADING] Placing LIMIT {action} order for {quantity} shares of {symbol} at ${limit_price:.2f}")
-            
-            # Calculate stop loss and take profit prices
-            if action == 'BUY':
-                if stop_loss_percent:
-                    stop_loss_price = limit_price * (1 - stop_loss_percent / 100)
-                if take_profit_percent:
-                    take_profit_price = limit_price * (1 + take_profit_percent / 100)
-            else:  # SELL
-                if stop_loss_percent:
-                    stop_loss_price = limit_price * (1 + stop_loss_percent / 100)
-                if take_profit_percent:
-                    take_profit_price = limit_price * (1 - take_profit_percent / 100)
-            
-            # Create bracket orders
-            bracket_orders = []
-            
-            if take_profit_percent:
-                take_profit_order = LimitOrder(
-                    'SELL' if action == 'BUY' else 'BUY',
-                    quantity,
-                    lmtPrice=take_profit_price
-                )
-                take_profit_order.parentId = parent_order_id
-                take_profit_order.transmit = False
-                bracket_orders.append(take_profit_order)
-            
-            if stop_loss_percent:
-                stop_loss_order = StopOrder(
-                    'SELL' if action == 'BUY' else 'BUY',
-                    quantity,
-                    stopPrice=stop_loss_price
-                )
-                stop_loss_order.parentId = parent_order_id
-                stop_loss_order.transmit = True
-                bracket_orders.append(stop_loss_order)
-            
-            # Place bracket orders
-            for order in bracket_orders:
-                IBKR_INSTANCE.placeOrder(contract, order)
-            
-            # Transmit parent order
-            parent_order.transmit = True
-            IBKR_INSTANCE.placeOrder(contract, parent_order)
-            
-            # Register for trailing stop if specified
-            if trailing_stop_percent and stop_loss_percent:
-                register_trade_for_trailing(
-                    order_id=parent_order_id,
-                    symbol=symbol,
-                    action=action,
-                    entry_price=limit_price,
-                    initial_stop_loss=stop_loss_price,
-                    trailing_percent=trailing_stop_percent
-                )
-                logging.info(f"📈 [TRADING] Trailing stop enabled: {trailing_stop_percent}%")
-            
-            result = {
-                'success': True,
-                'orderId': parent_order_id,
-                'symbol': symbol,
-                'action': action,
-                'quantity': quantity,
-                'limitPrice': limit_price,
-                'stopLossPrice': stop_loss_price if stop_loss_percent else None,
-                'stopLossPercent': stop_loss_percent,
-                'takeProfitPrice': take_profit_price if take_profit_percent else None,
-                'takeProfitPercent': take_profit_percent,
-                'trailingStopPercent': trailing_stop_percent,
-                'timestamp': datetime.now().isoformat(),
-                'status': 'Submitted',
-                'message': f'LIMIT {action} order placed for {quantity} shares of {symbol} at ${limit_price:.2f}'
-            }
-            
-            logging.info(f"✅ [TRADING] Limit order complete: {result['message']}")
-            return result
-            
+        contract = _get_contract(symbol)
+        
+        logging.info(f"📈 [TRADING] Placing LIMIT {action} order for {quantity} shares of {symbol} at ${limit_price:.2f}")
+        
+        bracket = _place_bracket(contract, LimitOrder(action, quantity, lmtPrice=limit_price), action, quantity, limit_price,
+                                 stop_loss_percent, take_profit_percent, trailing_stop_percent)
+        parent_order_id = bracket['parentOrderId']
+        stop_loss_price = bracket['stopLossPrice']
+        take_profit_price = bracket['takeProfitPrice']
+        
+        result = {
+            'success': True,
+            'orderId': parent_order_id,
+            'symbol': symbol,
+            'action': action,
+            'quantity': quantity,
+            'limitPrice': limit_price,
+            'stopLossPrice': stop_loss_price,
+            'stopLossPercent': stop_loss_percent,
+            'takeProfitPrice': take_profit_price,
+            'takeProfitPercent': take_profit_percent,
+            'trailingStopPercent': trailing_stop_percent,
+            'stopOrderType': bracket['stopOrderType'],
+            'timestamp': datetime.now().isoformat(),
+            'status': 'Submitted',
+            'message': f'LIMIT {action} order placed for {quantity} shares of {symbol} at ${limit_price:.2f}'
+        }
+        
+        logging.info(f"✅ [TRADING] Limit order complete: {result['message']}")
+        return result
+        
     except Exception as e:
         error_msg = f"Error placing limit {action} order for {symbol}: {str(e)}"
         logging.error(f"❌ [TRADING] {error_msg}")
@@ -350,7 +379,15 @@ def cancel_order(order_id: int) -> Dict[str, Any]:
         }
 
 def get_order_status(order_id: int) -> Dict[str, Any]:
-    """Get status of an order"""
+    """Get status of an order (from the in-memory order book; IBKR's trade list as fallback)"""
+    order = ORDER_BOOK.get_order(order_id)
+    if order is not None:
+        return {
+            'success': True,
+            **order,
+            'message': f"Order {order_id} status: {order['status']}"
+        }
+    
     if not IBKR_INSTANCE or not IBKR_INSTANCE.isConnected():
         return {
             'success': False,
@@ -385,6 +422,21 @@ def get_order_status(order_id: int) -> Dict[str, Any]:
 ACTIVE_TRADES: Dict[int, Dict[str, Any]] = {}  # {order_id: {symbol, entry_price, stop_loss_price, trailing_percent, highest_price}}
 TRADING_LOCK = threading.Lock()
 
+# In-flight stop modification bookkeeping, not journaled
+_TRANSIENT_FIELDS = ('sent_stop_price', 'sent_at')
+
+def _restore_active_trades():
+    """
+    Reload the trades the journal recorded before the last shutdown. The stop price IBKR
+    holds is unknown after a restart, so the first tick re-sends the current stop.
+    """
+    for order_id, trade_info in TRADE_JOURNAL.trades().items():
+        ACTIVE_TRADES[order_id] = {**trade_info, 'sent_stop_price': None, 'sent_at': 0.0}
+    if ACTIVE_TRADES:
+        logging.info(f"📓 [TRAILING STOP] Restored {len(ACTIVE_TRADES)} active trades from the journal")
+
+_restore_active_trades()
+
 def update_trailing_stop(order_id: int, current_price: float) -> Optional[Dict[str, Any]]:
     """
     Update trailing stop loss for an active trade
@@ -396,7 +448,7 @@ def update_trailing_stop(order_id: int, current_price: float) -> Optional[Dict[s
     Returns:
         Updated stop loss info or None if no update needed
     """
-    if IBKR_LOCK is None:
+    if IBKR_INSTANCE is None:
         return None
     
     with TRADING_LOCK:
@@ -424,6 +476,8 @@ def update_trailing_stop(order_id: int, current_price: float) -> Optional[Dict[s
             # Only update if new stop is higher than current stop (never lower)
             if new_stop > current_stop:
                 trade_info['stop_loss_price'] = new_stop
+                # Journaled with the stop only: a stale highest_price after a restart can't lower the stop
+                TRADE_JOURNAL.append('trade_update', order_id, {'stop_loss_price': new_stop, 'highest_price': highest_price})
                 return {
                     'order_id': order_id,
                     'symbol': trade_info.get('symbol'),
@@ -443,6 +497,7 @@ def update_trailing_stop(order_id: int, current_price: float) -> Optional[Dict[s
             # Only update if new stop is lower than current stop (never higher for shorts)
             if new_stop < current_stop or current_stop == 0:
                 trade_info['stop_loss_price'] = new_stop
+                TRADE_JOURNAL.append('trade_update', order_id, {'stop_loss_price': new_stop, 'highest_price': highest_price})
                 return {
                     'order_id': order_id,
                     'symbol': trade_info.get('symbol'),
@@ -454,8 +509,12 @@ def update_trailing_stop(order_id: int, current_price: float) -> Optional[Dict[s
     return None
 
 def register_trade_for_trailing(order_id: int, symbol: str, action: str, entry_price: float, 
-                                initial_stop_loss: float, trailing_percent: Optional[float] = None):
-    """Register a trade for trailing stop monitoring"""
+                                initial_stop_loss: float, trailing_percent: Optional[float] = None,
+                                stop_order_id: Optional[int] = None, native: bool = False):
+    """
+    Register a trade for trailing stop monitoring (stop_order_id: the bracket's IBKR stop order).
+    Native trades trail at IBKR and are only reconciled (see reconcile_native_trails).
+    """
     with TRADING_LOCK:
         ACTIVE_TRADES[order_id] = {
             'symbol': symbol,
@@ -464,14 +523,269 @@ def register_trade_for_trailing(order_id: int, symbol: str, action: str, entry_p
             'stop_loss_price': initial_stop_loss,
             'trailing_percent': trailing_percent or 0,
             'highest_price': entry_price,
+            'stop_order_id': stop_order_id,
+            'native': native,
+            'sent_stop_price': round_to_tick(initial_stop_loss),  # Stop price IBKR currently holds
+            'sent_at': 0.0,
             'timestamp': datetime.now().isoformat()
         }
+        TRADE_JOURNAL.append('trade_open', order_id, {
+            k: v for k, v in ACTIVE_TRADES[order_id].items() if k not in _TRANSIENT_FIELDS
+        })
+    if not native:
+        _follow_quotes(symbol, True)
 
 def unregister_trade(order_id: int):
     """Remove trade from trailing stop tracking"""
     with TRADING_LOCK:
-        if order_id in ACTIVE_TRADES:
-            del ACTIVE_TRADES[order_id]
+        trade_info = ACTIVE_TRADES.pop(order_id, None)
+        if trade_info is None:
+            return
+        TRADE_JOURNAL.append('trade_close', order_id)
+        symbol = trade_info.get('symbol')
+        still_trailed = any(t.get('symbol') == symbol and not t.get('native') for t in ACTIVE_TRADES.values())
+    if not trade_info.get('native') and not still_trailed:
+        _follow_quotes(symbol, False)
+
+def _follow_quotes(symbol: Optional[str], follow: bool):
+    """
+    Hold (or drop) the streaming quote line a client-side trail moves on. Subscriptions lost
+    to a reconnect are picked up again by app.py's periodic subscription sync.
+    """
+    if MARKET_DATA_STREAM is None or not symbol:
+        return
+    try:
+        if follow:
+            MARKET_DATA_STREAM.acquire(symbol, 'trailing')
+        else:
+            MARKET_DATA_STREAM.release(symbol, 'trailing')
+    except Exception as e:
+        logging.warning(f"⚠️ [TRAILING STOP] Could not {'subscribe to' if follow else 'release'} {symbol} quotes: {e}")
+
+def round_to_tick(price: float) -> float:
+    """Stop prices must sit on the tick grid: $0.01, or $0.0001 below $1"""
+    return round(price, 4) if price < 1 else round(price, 2)
+
+# Statuses that prove a stop order is finished - a stop merely missing from openTrades() isn't
+# (ib_insync clears its orders on disconnect, and other clientIds' orders aren't loaded)
+CONFIRMED_DONE_STATUSES = frozenset({'Filled', 'Cancelled', 'ApiCancelled'})
+_ORDER_SYNC_LOCK = threading.Lock()
+_ORDERS_SYNCED = False  # Open/completed orders of all clients loaded on the current connection
+_SYNC_FOLLOWED_IB = None
+
+def _on_ibkr_disconnected():
+    global _ORDERS_SYNCED
+    _ORDERS_SYNCED = False
+
+def follow_ibkr_connection(ib_instance):
+    """Call with the raw IB instance on every (re)connect: order state must be synced again"""
+    global _ORDERS_SYNCED, _SYNC_FOLLOWED_IB
+    _ORDERS_SYNCED = False
+    if _SYNC_FOLLOWED_IB is not ib_instance:
+        ib_instance.disconnectedEvent += _on_ibkr_disconnected
+        _SYNC_FOLLOWED_IB = ib_instance
+
+def orders_synced() -> bool:
+    return _ORDERS_SYNCED and IBKR_INSTANCE is not None and IBKR_INSTANCE.isConnected()
+
+def sync_order_state() -> bool:
+    """
+    Load the open orders of all clients (reqAllOpenOrders) and the completed ones
+    (reqCompletedOrders) once per connection, so stops placed under another clientId are
+    found and stops that finished while disconnected carry their final status. Must not be
+    called on the IBKR gateway worker. Returns whether order state can be trusted.
+    """
+    global _ORDERS_SYNCED
+    if IBKR_INSTANCE is None or not IBKR_INSTANCE.isConnected():
+        return False
+    with _ORDER_SYNC_LOCK:
+        if not _ORDERS_SYNCED:
+            IBKR_INSTANCE.reqAllOpenOrders()
+            IBKR_INSTANCE.reqCompletedOrders(True)
+            _ORDERS_SYNCED = True
+            logging.info("📒 [TRAILING STOP] Open and completed orders synced with IBKR")
+    return orders_synced()
+
+def _confirmed_done(order_id: int) -> Optional[str]:
+    """Final status of `order_id` if IBKR confirmed it is done, else None"""
+    if not orders_synced():
+        return None
+    for trade in IBKR_INSTANCE.trades():
+        if trade.order.orderId == order_id and trade.orderStatus.status in CONFIRMED_DONE_STATUSES:
+            return trade.orderStatus.status
+    return None
+
+def modify_stop_order(order_id: int, new_stop: float) -> bool:
+    """
+    Move the IBKR stop order protecting trade `order_id` to `new_stop` (re-placing the
+    order with the same orderId modifies it). Returns False if there is no live stop order;
+    the trade is only unregistered once IBKR confirms the stop filled or cancelled.
+    """
+    if IBKR_INSTANCE is None:
+        return False
+    
+    with TRADING_LOCK:
+        trade_info = ACTIVE_TRADES.get(order_id)
+        stop_order_id = trade_info.get('stop_order_id') if trade_info else None
+    if stop_order_id is None:
+        return False
+    
+    stop_trade = next((t for t in IBKR_INSTANCE.openTrades() if t.order.orderId == stop_order_id), None)
+    if stop_trade is None:
+        # Runs on the gateway worker, so it can't sync order state itself - the monitor loop does
+        status = _confirmed_done(stop_order_id)
+        if status is not None:
+            logging.info(f"ℹ️ [TRAILING STOP] Stop order {stop_order_id} for trade {order_id} is {status} - stopped trailing")
+            unregister_trade(order_id)
+        return False
+    
+    stop_trade.order.auxPrice = round_to_tick(new_stop)
+    IBKR_INSTANCE.placeOrder(stop_trade.contract, stop_trade.order)
+    return True
+
+def reconcile_native_trails() -> int:
+    """
+    Bring native trailing trades in line with IBKR: record the stop price IBKR reports for
+    the TRAIL order and drop trades whose stop order IBKR reports filled or cancelled.
+    Skipped until order state is synced on the current connection. Returns trades dropped.
+    """
+    if IBKR_INSTANCE is None or not sync_order_state():
+        return 0
+    
+    with TRADING_LOCK:
+        native_trades = {order_id: t.get('stop_order_id') for order_id, t in ACTIVE_TRADES.items() if t.get('native')}
+    if not native_trades:
+        return 0
+    
+    open_orders = {t.order.orderId: t.order for t in IBKR_INSTANCE.openTrades()}
+    dropped = 0
+    for order_id, stop_order_id in native_trades.items():
+        stop_order = open_orders.get(stop_order_id)
+        if stop_order is None:
+            status = _confirmed_done(stop_order_id)
+            if status is not None:
+                logging.info(f"ℹ️ [TRAILING STOP] TRAIL order {stop_order_id} for trade {order_id} is {status} - position closed")
+                unregister_trade(order_id)
+                dropped += 1
+            continue
+        trail_stop = stop_order.trailStopPrice
+        if trail_stop and trail_stop != UNSET_DOUBLE:
+            with TRADING_LOCK:
+                trade_info = ACTIVE_TRADES.get(order_id)
+                if trade_info and trade_info.get('stop_loss_price') != trail_stop:
+                    trade_info['stop_loss_price'] = trail_stop
+                    TRADE_JOURNAL.append('trade_update', order_id, {'stop_loss_price': trail_stop})
+    return dropped
+
+class TrailingStopEngine:
+    """
+    Moves client-side trailing stops (IBKR_NATIVE_TRAILING=false) on streaming ticks.
+
+    Attached to the IB instance's pendingTickersEvent, which ib_insync fires on the IBKR
+    gateway worker as ticks arrive. Every tick of a symbol with an active trade runs
+    update_trailing_stop, and a stop that moved is sent to IBKR right there as a modification
+    of the bracket's stop order. A trade's stop is modified at most once per
+    `min_modify_interval` seconds; a move inside that window is sent with the next tick after
+    it, which keeps a fast-ticking stock well under IBKR's message rate.
+    """
+
+    def __init__(self, min_modify_interval: float = 0.25):
+        self.min_modify_interval = min_modify_interval
+        self._ib = None
+        self._lock = threading.Lock()
+        self._ticks = 0
+        self._stop_moves = 0
+        self._modifications = 0
+        self._failures = 0
+        self._reaction_seconds = 0.0
+        self._max_reaction = 0.0
+
+    def set_ibkr_instance(self, ib_instance):
+        """Listen to a (re)connected raw IB instance's ticker updates"""
+        with self._lock:
+            previous, self._ib = self._ib, ib_instance
+        if previous is not None and previous is not ib_instance:
+            try:
+                previous.pendingTickersEvent -= self._on_pending_tickers
+            except Exception:
+                pass
+        if previous is not ib_instance:
+            ib_instance.pendingTickersEvent += self._on_pending_tickers
+            logging.info("📈 [TRAILING STOP] Engine listening to streaming ticks")
+
+    def _on_pending_tickers(self, tickers):
+        with TRADING_LOCK:
+            if not ACTIVE_TRADES:
+                return
+            by_symbol: Dict[str, list] = {}
+            for order_id, trade_info in ACTIVE_TRADES.items():
+                if not trade_info.get('native'):  # IBKR trails those itself
+                    by_symbol.setdefault(trade_info.get('symbol'), []).append(order_id)
+        
+        for ticker in tickers:
+            order_ids = by_symbol.get(getattr(ticker.contract, 'symbol', None))
+            if not order_ids:
+                continue
+            price = ticker.marketPrice()
+            if not price or not math.isfinite(price) or price <= 0:
+                continue
+            with self._lock:
+                self._ticks += 1
+            for order_id in order_ids:
+                try:
+                    self._on_price(order_id, price, ticker)
+                except Exception as e:
+                    with self._lock:
+                        self._failures += 1
+                    logging.warning(f"⚠️ [TRAILING STOP] Error updating stop for order {order_id}: {e}")
+
+    def _on_price(self, order_id: int, price: float, ticker):
+        update_result = update_trailing_stop(order_id, price)
+        if update_result:
+            with self._lock:
+                self._stop_moves += 1
+        
+        now = time.time()
+        with TRADING_LOCK:
+            trade_info = ACTIVE_TRADES.get(order_id)
+            if not trade_info or trade_info.get('stop_order_id') is None:
+                return
+            stop = round_to_tick(trade_info['stop_loss_price'])
+            if stop == trade_info.get('sent_stop_price') or now - trade_info.get('sent_at', 0) < self.min_modify_interval:
+                return
+            previous = trade_info.get('sent_stop_price')
+            trade_info['sent_at'] = now  # Attempt time: a failed modify is retried after the interval
+        
+        if not modify_stop_order(order_id, stop):
+            return
+        with TRADING_LOCK:
+            trade_info['sent_stop_price'] = stop
+        reaction = now - ticker.time.timestamp() if getattr(ticker, 'time', None) else 0.0
+        with self._lock:
+            self._modifications += 1
+            self._reaction_seconds += reaction
+            self._max_reaction = max(self._max_reaction, reaction)
+        logging.info(f"📈 [TRAILING STOP] {trade_info.get('symbol')} stop moved ${previous} -> ${stop} ({reaction * 1000:.0f} ms after the tick)")
+
+    def get_stats(self) -> Dict[str, Any]:
+        with TRADING_LOCK:
+            active = len(ACTIVE_TRADES)
+            native = sum(1 for t in ACTIVE_TRADES.values() if t.get('native'))
+        with self._lock:
+            return {
+                'attached': self._ib is not None,
+                'nativeTrailing': NATIVE_TRAILING,
+                'activeTrades': active,
+                'nativeTrades': native,
+                'ticks': self._ticks,
+                'stopMoves': self._stop_moves,
+                'modifications': self._modifications,
+                'failures': self._failures,
+                'avgReactionMs': round(self._reaction_seconds / self._modifications * 1000, 1) if self._modifications else None,
+                'maxReactionMs': round(self._max_reaction * 1000, 1)
+            }
+
+TRAILING_STOP_ENGINE = TrailingStopEngine()
 
 def get_account_balance() -> float:
     """Get account balance from IBKR"""
@@ -505,6 +819,93 @@ def get_account_balance() -> float:
         logging.error(f"❌ [TRADING] Error getting account balance: {e}")
         return 0.0
 
+def flatten_all_positions(timeout: float = 60.0, poll_interval: float = 0.25) -> Dict[str, Any]:
+    """
+    Close every open position with one batch of market orders and wait for the fills together
+    
+    Works from ib_insync's in-memory positions and portfolio (no quote requests): first the
+    open orders of those symbols are cancelled, so a bracket stop or take profit can't fire
+    against the flattened position, then all closing orders are placed back to back and
+    their fills are tracked until everything is done or `timeout` seconds have passed.
+    
+    Returns:
+        Dict with submitted/filled counts, timeToFlatSeconds and stillOpen (positions left)
+    """
+    if not IBKR_INSTANCE or not IBKR_INSTANCE.isConnected():
+        return {
+            'success': False,
+            'error': 'IBKR not connected'
+        }
+    
+    start = time.time()
+    positions = [pos for pos in IBKR_INSTANCE.positions() if pos.position]
+    if not positions:
+        return {'success': True, 'submitted': 0, 'filled': 0, 'timeToFlatSeconds': 0.0, 'stillOpen': [], 'failed': []}
+    prices = {item.contract.conId: item.marketPrice for item in IBKR_INSTANCE.portfolio()}
+    
+    # Working bracket children would re-open (or double) the position once it's flat
+    con_ids = {pos.contract.conId for pos in positions}
+    cancelled = 0
+    for trade in IBKR_INSTANCE.openTrades():
+        if trade.contract.conId in con_ids:
+            try:
+                IBKR_INSTANCE.cancelOrder(trade.order)
+                cancelled += 1
+            except Exception as e:
+                logging.warning(f"⚠️ [EOD CLOSE] Could not cancel order {trade.order.orderId} ({trade.contract.symbol}): {e}")
+    
+    submitted: List[Tuple[Any, Trade]] = []
+    failed = []
+    for pos in positions:
+        contract = Stock(conId=pos.contract.conId, symbol=pos.contract.symbol, exchange='SMART',
+                         currency=pos.contract.currency or 'USD')
+        action = 'SELL' if pos.position > 0 else 'BUY'
+        quantity = abs(pos.position)
+        try:
+            trade = IBKR_INSTANCE.placeOrder(contract, MarketOrder(action, quantity))
+            submitted.append((pos, trade))
+            price = prices.get(pos.contract.conId)
+            value = f" (~${quantity * price:,.0f})" if price and math.isfinite(price) else ""
+            logging.info(f"🔚 [EOD CLOSE] {action} {quantity:g} {pos.contract.symbol}{value} submitted as order {trade.order.orderId}")
+        except Exception as e:
+            failed.append({'symbol': pos.contract.symbol, 'position': pos.position, 'error': str(e)})
+            logging.error(f"❌ [EOD CLOSE] Could not submit close for {pos.contract.symbol}: {e}")
+    
+    deadline = start + timeout
+    while time.time() < deadline and not all(trade.isDone() for _, trade in submitted):
+        time.sleep(poll_interval)
+    time_to_flat = round(time.time() - start, 2)
+    
+    still_open = []
+    for pos, trade in submitted:
+        status = trade.orderStatus
+        if status.status != 'Filled':
+            still_open.append({
+                'symbol': pos.contract.symbol,
+                'position': pos.position,
+                'remaining': status.remaining,
+                'status': status.status,
+                'orderId': trade.order.orderId
+            })
+    still_open.extend(failed)
+    filled = len(submitted) - sum(1 for item in still_open if 'orderId' in item)
+    
+    if still_open:
+        logging.error(f"❌ [EOD CLOSE] {len(still_open)} of {len(positions)} positions still open after {time_to_flat}s: "
+                      f"{', '.join(item['symbol'] for item in still_open)}")
+    else:
+        logging.info(f"✅ [EOD CLOSE] Flat: {filled} positions closed in {time_to_flat}s ({cancelled} working orders cancelled)")
+    return {
+        'success': not still_open,
+        'positions': len(positions),
+        'submitted': len(submitted),
+        'filled': filled,
+        'cancelledOrders': cancelled,
+        'timeToFlatSeconds': time_to_flat,
+        'stillOpen': still_open,
+        'failed': failed
+    }
+
 def get_open_positions() -> Dict[str, Any]:
     """Get all open positions"""
     if not IBKR_INSTANCE or not IBKR_INSTANCE.isConnected():
@@ -0,0 +1,122 @@
+"""
+Versioned Knowledge Model
+Compiles the analysis knowledge (teaching modules, rules, data format) into one artifact:
+a Modelfile on disk and a derived Ollama model with that knowledge as its SYSTEM prompt.
+It is built once per knowledge version and reused across restarts, replacing the teaching
+generations that used to run at every startup (/api/generate keeps no memory between calls,
+so those only used CPU).
+"""
+import logging
+import os
+import threading
+from datetime import datetime
+from typing import Dict, Any, Optional
+
+def build_modelfile(base_model: str, system: str, parameters: Optional[Dict[str, Any]] = None) -> str:
+    """Modelfile text (usable with `ollama create <name> -f <file>` as well)"""
+    lines = [f"FROM {base_model}"]
+    for key, value in (parameters or {}).items():
+        lines.append(f"PARAMETER {key} {value}")
+    lines.append(f'SYSTEM """{system.replace(chr(34) * 3, chr(39) * 3)}"""')
+    return "\n".join(lines) + "\n"
+
+class KnowledgeModel:
+    """
+    `name` is '<prefix>:<version>' - a new knowledge version creates a new model and the
+    previous one is simply no longer used.
+
+    Until the model is ready (or if Ollama can't create it) `request_fields()` falls back to
+    the base model with the knowledge sent as the system prompt, so analyses keep working.
+    """
+
+    def __init__(self, client, base_model: str, system: str, version: str, artifact_dir: str,
+                 prefix: str = 'scanner-analyst', parameters: Optional[Dict[str, Any]] = None):
+        self.client = client
+        self.base_model = base_model
+        self.system = system
+        self.version = version
+        self.artifact_dir = artifact_dir
+        self.parameters = parameters or {}
+        self.name = f"{prefix}:{version}"
+        self._lock = threading.Lock()
+        self._ready = False
+        self._built_at: Optional[str] = None
+        self._error: Optional[str] = None
+
+    @property
+    def modelfile_path(self) -> str:
+        return os.path.join(self.artifact_dir, f"Modelfile.{self.version}")
+
+    def write_artifact(self) -> str:
+        """Write the Modelfile for this version (once) and return its path"""
+        path = self.modelfile_path
+        if not os.path.exists(path):
+            os.makedirs(self.artifact_dir, exist_ok=True)
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write(build_modelfile(self.base_model, self.system, self.parameters))
+            os.replace(tmp_path, path)
+        return path
+
+    def _exists(self) -> bool:
+        response = self.client.get('/api/tags', operation='status')
+        if response.status_code != 200:
+            raise RuntimeError(f"Ollama API error: {response.status_code}")
+        return any(m.get('name') == self.name for m in response.json().get('models', []))
+
+    def _create(self):
+        # Current API takes the pieces; Ollama before 0.5.5 only accepts Modelfile text
+        response = self.client.post('/api/create', json={
+            'model': self.name,
+            'from': self.base_model,
+            'system': self.system,
+            'parameters': self.parameters,
+            'stream': False
+        }, operation='warmup')
+        if response.status_code == 400:
+            with open(self.write_artifact(), 'r', encoding='utf-8') as f:
+                modelfile = f.read()
+            response = self.client.post('/api/create', json={
+                'name': self.name, 'modelfile': modelfile, 'stream': False
+            }, operation='warmup')
+        if response.status_code != 200:
+            raise RuntimeError(f"Ollama API error: {response.status_code} {response.text[:200]}")
+
+    def ensure(self, rebuild: bool = False) -> bool:
+        """Create the model in Ollama if this version doesn't exist yet; True when ready"""
+        with self._lock:
+            try:
+                self.write_artifact()
+                if rebuild or not self._exists():
+                    logging.info(f"📚 [KNOWLEDGE] Creating {self.name} from {self.base_model}...")
+                    self._create()
+                    self._built_at = datetime.now().isoformat()
+                    logging.info(f"✅ [KNOWLEDGE] {self.name} ready")
+                self._ready = True
+                self._error = None
+            except Exception as e:
+                self._ready = False
+                self._error = str(e)
+                logging.warning(f"⚠️ [KNOWLEDGE] Could not create {self.name}, sending knowledge as system prompt: {e}")
+            return self._ready
+
+    @property
+    def ready(self) -> bool:
+        return self._ready
+
+    def request_fields(self) -> Dict[str, Any]:
+        """Model (and system prompt, if not baked in) for an /api/generate body"""
+        if self._ready:
+            return {'model': self.name}
+        return {'model': self.base_model, 'system': self.system}
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            'name': self.name,
+            'baseModel': self.base_model,
+            'version': self.version,
+            'ready': self._ready,
+            'builtAt': self._built_at,
+            'modelfile': self.modelfile_path,
+            'error': self._error
+        }
@@ -0,0 +1,223 @@
+"""
+Streaming Market Data Subscriptions
+Keeps long-lived IBKR Tickers so quote reads are answered from memory
+instead of a reqMktData + sleep + cancelMktData round trip per request
+"""
+import logging
+import math
+import threading
+import time
+from typing import Dict, Any, Optional, Iterable, List, Callable
+
+try:
+    from ib_insync import Stock
+except ImportError:
+    Stock = None
+
+class MarketDataSubscriptionManager:
+    """
+    Ref-counted pool of streaming market data lines.
+
+    Each consumer ('scanner', 'positions', 'live', ...) acquires the symbols it needs.
+    A subscription with no consumers left stays live until it has been idle for
+    `idle_seconds`, or until its line is needed for another symbol, so the pool never
+    exceeds the account's market data line limit.
+    """
+
+    def __init__(self, max_lines: int = 100, idle_seconds: float = 120.0, contract_factory: Callable = None):
+        self.max_lines = max_lines
+        self.idle_seconds = idle_seconds
+        # symbol -> contract (e.g. a qualified one from the contract registry)
+        self.contract_factory = contract_factory or (lambda symbol: Stock(symbol, 'SMART', 'USD'))
+        self._ib = None
+        self._lock = threading.Lock()
+        # {symbol: {'contract', 'ticker', 'consumers': set, 'subscribed_at', 'last_used'}}
+        self._subscriptions: Dict[str, Dict[str, Any]] = {}
+        self._evictions = 0
+        self._rejections = 0
+        self._reads = 0
+        self._hits = 0
+
+    def set_ibkr_instance(self, ib_instance):
+        """Attach a (re)connected IB instance - old tickers died with the previous connection"""
+        with self._lock:
+            self._ib = ib_instance
+            self._subscriptions.clear()
+        logging.info(f"📡 [MARKET DATA] Subscription manager attached (max {self.max_lines} lines, idle timeout {self.idle_seconds:.0f}s)")
+
+    def _is_connected(self) -> bool:
+        try:
+            return self._ib is not None and self._ib.isConnected()
+        except Exception:
+            return False
+
+    def acquire(self, symbol: str, consumer: str):
+        """Subscribe `consumer` to `symbol` (re-using a live line if one exists). Returns the Ticker or None."""
+        symbol = symbol.upper()
+        with self._lock:
+            sub = self._subscriptions.get(symbol)
+            if sub:
+                sub['consumers'].add(consumer)
+                sub['last_used'] = time.time()
+                return sub['ticker']
+
+            if not self._is_connected() or Stock is None:
+                return None
+
+            evicted = None
+            if len(self._subscriptions) >= self.max_lines:
+                evicted = self._pop_lru_idle_locked()
+                if evicted is None:
+                    self._rejections += 1
+                    logging.warning(f"⚠️ [MARKET DATA] Line limit reached ({self.max_lines}), cannot subscribe {symbol} for {consumer}")
+                    return None
+
+            # Reserve the line; IBKR is called outside the lock (concurrent acquirers see ticker None)
+            now = time.time()
+            sub = self._subscriptions[symbol] = {
+                'contract': None,
+                'ticker': None,
+                'consumers': {consumer},
+                'subscribed_at': now,
+                'last_used': now
+            }
+
+        if evicted is not None:
+            self._cancel(evicted)
+        try:
+            contract = self.contract_factory(symbol)
+            ticker = self._ib.reqMktData(contract, '', False, False)
+        except Exception as e:
+            logging.warning(f"⚠️ [MARKET DATA] Could not subscribe {symbol}: {e}")
+            with self._lock:
+                if self._subscriptions.get(symbol) is sub:
+                    del self._subscriptions[symbol]
+            return None
+
+        with self._lock:
+            sub['contract'] = contract
+            sub['ticker'] = ticker
+            lines = len(self._subscriptions)
+        logging.info(f"📡 [MARKET DATA] Subscribed {symbol} for {consumer} ({lines}/{self.max_lines} lines)")
+        return ticker
+
+    def release(self, symbol: str, consumer: str):
+        """Drop `consumer` from `symbol`; the line stays warm until idle eviction"""
+        with self._lock:
+            sub = self._subscriptions.get(symbol.upper())
+            if sub:
+                sub['consumers'].discard(consumer)
+                sub['last_used'] = time.time()
+
+    def sync_consumer(self, consumer: str, symbols: Iterable[str]):
+        """Make `consumer` hold exactly `symbols` - acquire new ones, release the rest"""
+        wanted = {s.upper() for s in symbols if s}
+        with self._lock:
+            held = {s for s, sub in self._subscriptions.items() if consumer in sub['consumers']}
+        for symbol in held - wanted:
+            self.release(symbol, consumer)
+        for symbol in wanted - held:
+            self.acquire(symbol, consumer)
+
+    def is_subscribed(self, symbol: str) -> bool:
+        with self._lock:
+            return symbol.upper() in self._subscriptions
+
+    def get_quote(self, symbol: str) -> Optional[Dict[str, Any]]:
+        """
+        Read the latest streamed quote from memory.
+
+        Returns:
+            Dict with price/bid/ask/volume/high/low/close, or None if the symbol is not
+            subscribed or no price has arrived yet
+        """
+        with self._lock:
+            self._reads += 1
+            sub = self._subscriptions.get(symbol.upper())
+            if not sub or sub['ticker'] is None:
+                return None
+            sub['last_used'] = time.time()
+            ticker = sub['ticker']
+
+        def clean(value):
+            try:
+                value = float(value)
+            except (ValueError, TypeError):
+                return None
+            return None if (math.isnan(value) or math.isinf(value) or value <= 0) else value
+
+        last = clean(getattr(ticker, 'last', None))
+        bid = clean(getattr(ticker, 'bid', None))
+        ask = clean(getattr(ticker, 'ask', None))
+        price = last or ((bid + ask) / 2 if bid and ask else (bid or ask))
+        if not price:
+            return None
+
+        volume = clean(getattr(ticker, 'volume', None))
+        with self._lock:
+            self._hits += 1
+        return {
+            'symbol': symbol.upper(),
+            'price': price,
+            'last': last,
+            'bid': bid,
+            'ask': ask,
+            'volume': int(volume) if volume else 0,
+            'high': clean(getattr(ticker, 'high', None)),
+            'low': clean(getattr(ticker, 'low', None)),
+            'close': clean(getattr(ticker, 'close', None)),
+            'time': ticker.time.isoformat() if getattr(ticker, 'time', None) else None
+        }
+
+    def wait_for_quote(self, symbol: str, timeout: float = 3.0, poll_interval: float = 0.1) -> Optional[Dict[str, Any]]:
+        """Wait until the first tick of a new subscription arrives"""
+        deadline = time.time() + timeout
+        while True:
+            quote = self.get_quote(symbol)
+            if quote or time.time() >= deadline or not self._is_connected():
+                return quote
+            self._ib.sleep(poll_interval)
+
+    def _cancel(self, sub: Dict[str, Any]):
+        if sub['contract'] is None:
+            return
+        try:
+            self._ib.cancelMktData(sub['contract'])
+        except Exception:
+            pass
+
+    def _pop_lru_idle_locked(self) -> Optional[Dict[str, Any]]:
+        """Remove the least recently used line without consumers (its cancel is up to the caller)"""
+        idle = [(sub['last_used'], s) for s, sub in self._subscriptions.items() if not sub['consumers']]
+        if not idle:
+            return None
+        _, symbol = min(idle)
+        logging.info(f"♻️ [MARKET DATA] Evicting idle {symbol} to free a market data line")
+        self._evictions += 1
+        return self._subscriptions.pop(symbol)
+
+    def evict_idle(self) -> List[str]:
+        """Cancel subscriptions nobody has used for `idle_seconds`"""
+        cutoff = time.time() - self.idle_seconds
+        with self._lock:
+            expired = [s for s, sub in self._subscriptions.items() if not sub['consumers'] and sub['last_used'] < cutoff]
+            evicted = [self._subscriptions.pop(symbol) for symbol in expired]
+            self._evictions += len(evicted)
+        for sub in evicted:
+            self._cancel(sub)
+        if expired:
+            logging.info(f"♻️ [MARKET DATA] Evicted {len(expired)} idle subscriptions: {', '.join(expired)}")
+        return expired
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'lines': len(self._subscriptions),
+                'maxLines': self.max_lines,
+                'idleLines': sum(1 for sub in self._subscriptions.values() if not sub['consumers']),
+                'symbols': {s: sorted(sub['consumers']) for s, sub in self._subscriptions.items()},
+                'reads': self._reads,
+                'hits': self._hits,
+                'evictions': self._evictions,
+                'rejections': self._rejections
+            }
@@ -0,0 +1,239 @@
+"""
+Shared Ollama HTTP Client
+One pooled keep-alive requests.Session for all Ollama traffic (analysis, chat, teaching,
+status checks) with per-operation timeouts, retry with backoff, a concurrency limit matched
+to the server's OLLAMA_NUM_PARALLEL, and latency / tokens-per-second metrics
+"""
+import json
+import logging
+import os
+import threading
+import time
+from typing import Dict, Any, Iterator, Optional, Tuple, Union
+
+import requests
+from requests.adapters import HTTPAdapter
+
+OLLAMA_BASE_URL = os.getenv('OLLAMA_BASE_URL', 'http://localhost:11434')
+# Generations Ollama runs at once - set to the server's OLLAMA_NUM_PARALLEL; more requests only queue on the server
+OLLAMA_NUM_PARALLEL = int(os.getenv('OLLAMA_NUM_PARALLEL', '2'))
+OLLAMA_MAX_RETRIES = 2
+OLLAMA_RETRY_BACKOFF = 0.5  # seconds, doubled per retry
+
+OLLAMA_CONNECT_TIMEOUT = 3
+# (connect, read) timeout per operation
+OPERATION_TIMEOUTS = {
+    'status': (OLLAMA_CONNECT_TIMEOUT, 5),
+    'analyze': (OLLAMA_CONNECT_TIMEOUT, 120),
+    'chat': (OLLAMA_CONNECT_TIMEOUT, 60),
+    'teach': (OLLAMA_CONNECT_TIMEOUT, 120),
+    'warmup': (OLLAMA_CONNECT_TIMEOUT, 300)
+}
+
+# Statuses worth another attempt: server busy (OLLAMA_MAX_QUEUE reached) or a proxy in between
+_RETRY_STATUSES = frozenset({429, 502, 503, 504})
+# Operations that go through the /api/generate concurrency limit
+_GENERATE_PATHS = frozenset({'/api/generate', '/api/chat'})
+
+class OllamaClient:
+    """
+    Thread-safe Ollama client.
+
+    `post` / `get` return the requests.Response like requests.post/get did, so call sites
+    keep their own status handling; `stream_generate` yields the decoded chunks of a
+    streaming generation. Only failures before Ollama starts answering are retried.
+    """
+
+    def __init__(self, base_url: str = OLLAMA_BASE_URL, num_parallel: int = OLLAMA_NUM_PARALLEL,
+                 max_retries: int = OLLAMA_MAX_RETRIES, retry_backoff: float = OLLAMA_RETRY_BACKOFF):
+        self.base_url = base_url.rstrip('/')
+        self.num_parallel = num_parallel
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self._session = requests.Session()
+        # Keep-alive pool big enough for the generation slots plus status checks
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=num_parallel + 4)
+        self._session.mount('http://', adapter)
+        self._session.mount('https://', adapter)
+        self._slots = threading.BoundedSemaphore(num_parallel)
+        self._lock = threading.Lock()
+        self._waiting = 0
+        self._active = 0
+        # operation -> counters (see _record)
+        self._stats: Dict[str, Dict[str, float]] = {}
+
+    # ---- transport ----
+
+    def _timeout(self, operation: str, timeout: Optional[Union[float, Tuple[float, float]]]) -> Tuple[float, float]:
+        if timeout is None:
+            return OPERATION_TIMEOUTS.get(operation, OPERATION_TIMEOUTS['analyze'])
+        if isinstance(timeout, tuple):
+            return timeout
+        return (min(OLLAMA_CONNECT_TIMEOUT, timeout), timeout)
+
+    def _send(self, method: str, path: str, operation: str, timeout, **kwargs) -> requests.Response:
+        """Send with retry/backoff on connection errors and busy statuses"""
+        timeout = self._timeout(operation, timeout)
+        attempt = 0
+        while True:
+            try:
+                response = self._session.request(method, f"{self.base_url}{path}", timeout=timeout, **kwargs)
+            except (requests.exceptions.ConnectionError, requests.exceptions.ConnectTimeout) as e:
+                if attempt >= self.max_retries:
+                    raise
+                error = e
+            else:
+                if response.status_code not in _RETRY_STATUSES or attempt >= self.max_retries:
+                    return response
+                error = f"HTTP {response.status_code}"
+                response.close()
+            attempt += 1
+            self._record(operation, retried=True)
+            delay = self.retry_backoff * (2 ** (attempt - 1))
+            logging.warning(f"⚠️ [OLLAMA CLIENT] {operation} {path} failed ({error}), retry {attempt}/{self.max_retries} in {delay:.1f}s")
+            time.sleep(delay)
+
+    def _acquire(self, path: str) -> bool:
+        if path not in _GENERATE_PATHS:
+            return False
+        with self._lock:
+            self._waiting += 1
+        self._slots.acquire()
+        with self._lock:
+            self._waiting -= 1
+            self._active += 1
+        return True
+
+    def _release(self, acquired: bool):
+        if acquired:
+            with self._lock:
+                self._active -= 1
+            self._slots.release()
+
+    # ---- metrics ----
+
+    def _record(self, operation: str, latency: Optional[float] = None, failed: bool = False,
+                retried: bool = False, result: Optional[Dict[str, Any]] = None, first_token: Optional[float] = None):
+        with self._lock:
+            stats = self._stats.setdefault(operation, {
+                'requests': 0, 'failures': 0, 'retries': 0, 'latency': 0.0, 'maxLatency': 0.0,
+                'evalTokens': 0, 'evalSeconds': 0.0, 'promptTokens': 0, 'promptSeconds': 0.0,
+                'firstTokens': 0, 'firstTokenSeconds': 0.0
+            })
+            if retried:
+                stats['retries'] += 1
+                return
+            stats['requests'] += 1
+            if failed:
+                stats['failures'] += 1
+            if latency is not None:
+                stats['latency'] += latency
+                stats['maxLatency'] = max(stats['maxLatency'], latency)
+            if first_token is not None:
+                stats['firstTokens'] += 1
+                stats['firstTokenSeconds'] += first_token
+            if result:
+                # Ollama reports durations in nanoseconds
+                stats['evalTokens'] += result.get('eval_count', 0) or 0
+                stats['evalSeconds'] += (result.get('eval_duration', 0) or 0) / 1e9
+                stats['promptTokens'] += result.get('prompt_eval_count', 0) or 0
+                stats['promptSeconds'] += (result.get('prompt_eval_duration', 0) or 0) / 1e9
+
+    # ---- public API ----
+
+    def post(self, path: str, json: Optional[Dict[str, Any]] = None, operation: str = 'analyze',
+             timeout: Optional[Union[float, Tuple[float, float]]] = None) -> requests.Response:
+        """POST to Ollama (e.g. '/api/generate') and return the response"""
+        acquired = self._acquire(path)
+        start = time.time()
+        try:
+            response = self._send('POST', path, operation, timeout, json=json)
+        except requests.exceptions.RequestException:
+            self._record(operation, time.time() - start, failed=True)
+            raise
+        finally:
+            self._release(acquired)
+        result = None
+        if response.status_code == 200 and path in _GENERATE_PATHS and not (json or {}).get('stream'):
+            try:
+                result = response.json()
+            except ValueError:
+                pass
+        self._record(operation, time.time() - start, failed=response.status_code != 200, result=result)
+        return response
+
+    def get(self, path: str, operation: str = 'status',
+            timeout: Optional[Union[float, Tuple[float, float]]] = None) -> requests.Response:
+        start = time.time()
+        try:
+            response = self._send('GET', path, operation, timeout)
+        except requests.exceptions.RequestException:
+            self._record(operation, time.time() - start, failed=True)
+            raise
+        self._record(operation, time.time() - start, failed=response.status_code != 200)
+        return response
+
+    def stream_generate(self, payload: Dict[str, Any], operation: str = 'analyze',
+                        timeout: Optional[Union[float, Tuple[float, float]]] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Streaming /api/generate: yields each decoded chunk ({'response': text, 'done': ...})
+
+        Raises:
+            requests.exceptions.RequestException: connection failure, non-200 status or an error chunk
+        """
+        acquired = self._acquire('/api/generate')
+        start = time.time()
+        first_token = None
+        final = None
+        failed = True
+        try:
+            response = self._send('POST', '/api/generate', operation, timeout, json={**payload, 'stream': True}, stream=True)
+            with response:
+                if response.status_code != 200:
+                    raise requests.exceptions.HTTPError(f"Ollama API error: {response.status_code}", response=response)
+                for line in response.iter_lines():
+                    if not line:
+                        continue
+                    chunk = json.loads(line)
+                    if chunk.get('error'):
+                        raise requests.exceptions.RequestException(f"Ollama error: {chunk['error']}")
+                    if first_token is None and chunk.get('response'):
+                        first_token = time.time() - start
+                    yield chunk
+                    if chunk.get('done'):
+                        final = chunk
+                        break
+            failed = False
+        except GeneratorExit:
+            failed = False  # Consumer stopped reading (e.g. SSE client went away)
+            raise
+        finally:
+            self._release(acquired)
+            self._record(operation, time.time() - start, failed=failed, result=final, first_token=first_token)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            operations = {}
+            for operation, stats in self._stats.items():
+                requests_count = stats['requests']
+                operations[operation] = {
+                    'requests': requests_count,
+                    'failures': stats['failures'],
+                    'retries': stats['retries'],
+                    'avgLatencyMs': round(stats['latency'] / requests_count * 1000, 1) if requests_count else 0.0,
+                    'maxLatencyMs': round(stats['maxLatency'] * 1000, 1),
+                    'avgFirstTokenMs': round(stats['firstTokenSeconds'] / stats['firstTokens'] * 1000, 1) if stats['firstTokens'] else None,
+                    'tokensPerSecond': round(stats['evalTokens'] / stats['evalSeconds'], 1) if stats['evalSeconds'] else None,
+                    'promptTokensPerSecond': round(stats['promptTokens'] / stats['promptSeconds'], 1) if stats['promptSeconds'] else None,
+                    'evalTokens': stats['evalTokens'],
+                    'promptTokens': stats['promptTokens']
+                }
+            return {
+                'baseUrl': self.base_url,
+                'numParallel': self.num_parallel,
+                'active': self._active,
+                'waiting': self._waiting,
+                'operations': operations
+            }
+
+OLLAMA_CLIENT = OllamaClient()
@@ -3,12 +3,12 @@ Float Teaching for Ollama
 Teaches Ollama about stock float and how to use it for day trading
 Based on Warrior Trading professional insights
 """
-import requests
 import logging
 from typing import Dict, Any
 
+from ollama_client import OLLAMA_CLIENT
+
 # Ollama Configuration
-OLLAMA_BASE_URL = "http://localhost:11434"
 OLLAMA_MODEL = "gemma3:4b"  # Use available model
 OLLAMA_TIMEOUT = 120
 
@@ -258,8 +258,8 @@ Please acknowledge that you understand stock float analysis, including why low f
 Respond with: "I understand stock float analysis. I know that low float stocks make bigger moves due to less liquidity, but have wider spreads. I will adjust position sizing based on float and watch for float changes (secondary offerings, buybacks). I am ready to use float knowledge for enhanced trading decisions."
 """
         
-        response = requests.post(
-            f"{OLLAMA_BASE_URL}/api/generate",
+        response = OLLAMA_CLIENT.post(
+            "/api/generate",
             json={
                 "model": OLLAMA_MODEL,
                 "prompt": teaching_prompt,
@@ -270,6 +270,7 @@ Respond with: "I understand stock float analysis. I know that low float stocks m
                 },
                 "system": "You are learning to be an expert day trader using REAL market data from Interactive Brokers. Always use real data, never simulated data. Pay close attention to stock float as a key factor for identifying stocks with explosive move potential. Learn from actual market behavior."
             },
+            operation='teach',
             timeout=OLLAMA_TIMEOUT
         )
         
@@ -2,12 +2,12 @@
 IBKR Trading Knowledge for Ollama
 Teaches Ollama how to use Interactive Brokers API for trading
 """
-import requests
 import logging
 from typing import Dict, Any
 
+from ollama_client import OLLAMA_CLIENT
+
 # Ollama Configuration
-OLLAMA_BASE_URL = "http://localhost:11434"
 OLLAMA_MODEL = "gemma3:4b"  # Use available model
 OLLAMA_TIMEOUT = 60
 
@@ -392,8 +392,8 @@ Please acknowledge that you understand IBKR trading capabilities and are ready t
 Respond with: "I understand IBKR trading API and am ready to make trading recommendations."
 """
         
-        response = requests.post(
-            f"{OLLAMA_BASE_URL}/api/generate",
+        response = OLLAMA_CLIENT.post(
+            "/api/generate",
             json={
                 "model": OLLAMA_MODEL,
                 "prompt": teaching_prompt,
@@ -404,6 +404,7 @@ Respond with: "I understand IBKR trading API and am ready to make trading recomm
                 },
                 "system": "You are learning to be an expert trading assistant using Interactive Brokers API. Pay close attention to all trading details and risk management."
             },
+            operation='teach',
             timeout=OLLAMA_TIMEOUT
         )
         
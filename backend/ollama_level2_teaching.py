@@ -2,12 +2,12 @@
 Comprehensive Level 2 Market Data Teaching for Ollama
 Teaches Ollama everything about Level 2 order book data, order flow analysis, and market depth
 """
-import requests
 import logging
 from typing import Dict, Any
 
+from ollama_client import OLLAMA_CLIENT
+
 # Ollama Configuration
-OLLAMA_BASE_URL = "http://localhost:11434"
 OLLAMA_MODEL = "gemma3:4b"  # Use available model
 OLLAMA_TIMEOUT = 120
 
@@ -1040,8 +1040,8 @@ Please acknowledge that you understand Level 2 market data analysis, including T
 Respond with: "I understand Level 2 market data, order flow analysis, Time & Sales integration, spoofing detection, and the critical rule that Level 2 confirms trading setups from candlestick patterns rather than generating them. I am ready to use this knowledge for enhanced trading decisions."
 """
         
-        response = requests.post(
-            f"{OLLAMA_BASE_URL}/api/generate",
+        response = OLLAMA_CLIENT.post(
+            "/api/generate",
             json={
                 "model": OLLAMA_MODEL,
                 "prompt": teaching_prompt,
@@ -1052,6 +1052,7 @@ Respond with: "I understand Level 2 market data, order flow analysis, Time & Sal
                 },
                 "system": "You are learning to be an expert Level 2 market data analyst using REAL market data from Interactive Brokers. Always use real data, never simulated data. Pay close attention to order flow, support/resistance from order book, and institutional activity detection. Learn from actual market behavior."
             },
+            operation='teach',
             timeout=OLLAMA_TIMEOUT
         )
         
@@ -2,13 +2,13 @@
 Comprehensive Candlestick Pattern Teaching for Ollama
 Contains ALL patterns from the codebase with detailed descriptions
 """
-import requests
 import logging
 import json
 from typing import Dict, Any
 
+from ollama_client import OLLAMA_CLIENT
+
 # Ollama Configuration
-OLLAMA_BASE_URL = "http://localhost:11434"
 OLLAMA_MODEL = "llama3.2"
 OLLAMA_TIMEOUT = 60  # Longer timeout for teaching
 
@@ -688,8 +688,8 @@ Please acknowledge that you understand all these patterns and are ready to analy
 Respond with: "I understand all candlestick patterns and am ready to analyze charts."
 """
         
-        response = requests.post(
-            f"{OLLAMA_BASE_URL}/api/generate",
+        response = OLLAMA_CLIENT.post(
+            "/api/generate",
             json={
                 "model": OLLAMA_MODEL,
                 "prompt": teaching_prompt,
@@ -700,6 +700,7 @@ Respond with: "I understand all candlestick patterns and am ready to analyze cha
                 },
                 "system": "You are learning to be an expert candlestick pattern analyst. Pay close attention to all pattern details."
             },
+            operation='teach',
             timeout=OLLAMA_TIMEOUT
         )
         
@@ -2,14 +2,25 @@
 Ollama AI Integration Service
 Handles candlestick pattern analysis and trading decisions
 """
+import atexit
+import hashlib
+import os
 import requests
 import logging
 import json
-from typing import List, Dict, Any, Optional
+import re
+import threading
+from typing import List, Dict, Any, Optional, Tuple
 from datetime import datetime
 
-# Ollama Configuration
-OLLAMA_BASE_URL = "http://localhost:11434"
+from ollama_client import OLLAMA_CLIENT, OLLAMA_BASE_URL
+from ollama_warmup import ModelWarmupManager
+from knowledge_model import KnowledgeModel
+from prompt_encoder import PROMPT_FORMAT_LEGEND, encode_stock_prompt, estimate_tokens
+from rules_engine import RulesEngine, candle_arrays, detect_patterns, relative_volume
+from verdict_cache import VerdictCache, make_verdict_key
+
+# Ollama Configuration (server URL and connection pool live in ollama_client)
 OLLAMA_MODEL = "gemma3:4b"  # Use available model (detected from Ollama)
 OLLAMA_TIMEOUT = 120  # seconds (increased for slower models)
 
@@ -203,87 +214,33 @@ Analyze the provided candlestick data and provide:
 8. Risk-Reward Ratio (calculate: (takeProfit - entry) / (entry - stopLoss))
 """
 
-def analyze_candlesticks_with_ollama(candles: List[Dict], symbol: str, current_price: float, volume: float, avg_volume: float, detected_patterns: Optional[List[Dict]] = None, level2_data: Optional[Dict] = None, stock_float: Optional[float] = None) -> Dict[str, Any]:
+# Fixed instructions sent as the start of every analysis system prompt
+ANALYSIS_SYSTEM_INSTRUCTIONS = "You are a professional stock trader analyzing REAL market data from Interactive Brokers. Always use real data, never simulated data. Learn from actual market behavior. Always respond in valid JSON format only. Be precise, conservative, and data-driven in your analysis."
+
+def build_analysis_knowledge_prompt() -> str:
     """
-    Analyze candlestick patterns using Ollama AI with REAL market data
+    Static part of the analysis prompt: the teaching text, trading rules and response format.
     
-    Args:
-        candles: List of candle dictionaries with open, high, low, close, volume (REAL data from IBKR)
-        symbol: Stock symbol
-        current_price: Current stock price (REAL from IBKR)
-        volume: Current volume (REAL from IBKR)
-        avg_volume: Average volume (REAL from IBKR)
-        detected_patterns: Optional patterns detected by frontend
-        level2_data: Optional Level 2 order book data (REAL from IBKR)
-        
-    Returns:
-        Analysis result with pattern, signal, confidence, and reasoning
+    It is sent as the system prompt and is byte-identical on every call, so Ollama keeps its
+    evaluated tokens in the KV cache and only the per-symbol prompt is evaluated per request.
     """
-    try:
-        # Format candles for analysis
-        candle_data = []
-        for i, candle in enumerate(candles[-20:]):  # Last 20 candles for context
-            candle_data.append({
-                "index": i,
-                "open": candle.get('open', candle.get('Open', 0)),
-                "high": candle.get('high', candle.get('High', 0)),
-                "low": candle.get('low', candle.get('Low', 0)),
-                "close": candle.get('close', candle.get('Close', 0)),
-                "volume": candle.get('volume', candle.get('Volume', 0)),
-                "is_bullish": candle.get('close', candle.get('Close', 0)) > candle.get('open', candle.get('Open', 0))
-            })
-        
-        # Calculate volume ratio
-        volume_ratio = volume / avg_volume if avg_volume > 0 else 1.0
-        
-        # Include detected patterns if provided
-        pattern_context = ""
-        if detected_patterns and len(detected_patterns) > 0:
-            pattern_context = f"\n\nDETECTED PATTERNS (from technical analysis):\n"
-            for i, pattern in enumerate(detected_patterns[-3:]):  # Last 3 patterns
-                pattern_context += f"{i+1}. {pattern.get('pattern', 'Unknown')} - {pattern.get('signal', 'N/A')} signal ({pattern.get('confidence', 'N/A')} confidence)\n"
-                pattern_context += f"   Description: {pattern.get('description', 'N/A')}\n"
-            pattern_context += "\nConsider these detected patterns in your analysis and validate or expand on them.\n"
-        
-        # Calculate additional context for better analysis
-        if len(candles) >= 5:
-            recent_closes = [c.get('close', c.get('Close', 0)) for c in candles[-5:]]
-            price_trend = "UP" if recent_closes[-1] > recent_closes[0] else "DOWN" if recent_closes[-1] < recent_closes[0] else "SIDEWAYS"
-            price_change_pct = ((recent_closes[-1] - recent_closes[0]) / recent_closes[0] * 100) if recent_closes[0] > 0 else 0
-            recent_high = max([c.get('high', c.get('High', 0)) for c in candles[-10:]])
-            recent_low = min([c.get('low', c.get('Low', 0)) for c in candles[-10:]])
-            price_position = ((current_price - recent_low) / (recent_high - recent_low) * 100) if (recent_high - recent_low) > 0 else 50
-        else:
-            price_trend = "UNKNOWN"
-            price_change_pct = 0
-            price_position = 50
-            recent_high = current_price
-            recent_low = current_price
-        
-        # Build enhanced analysis prompt with more context
-        # Include complete pattern library if available (provides all 36+ patterns)
-        pattern_section = ""
-        if COMPLETE_PATTERN_LIBRARY:
-            # Use complete library which has all patterns with detailed descriptions
-            pattern_section = f"\n\n# COMPLETE PATTERN REFERENCE LIBRARY\n{COMPLETE_PATTERN_LIBRARY}\n"
-        
-        # Include IBKR trading knowledge if available
-        trading_section = ""
-        if IBKR_TRADING_KNOWLEDGE:
-            trading_section = f"\n\n# IBKR TRADING CAPABILITIES\n{IBKR_TRADING_KNOWLEDGE}\n"
-        
-        # Include relative volume knowledge if available
-        volume_section = ""
-        if RELATIVE_VOLUME_KNOWLEDGE:
-            volume_section = f"""
+    # Include complete pattern library if available (provides all 36+ patterns)
+    pattern_section = ""
+    if COMPLETE_PATTERN_LIBRARY:
+        pattern_section = f"\n\n# COMPLETE PATTERN REFERENCE LIBRARY\n{COMPLETE_PATTERN_LIBRARY}\n"
+    
+    # Include IBKR trading knowledge if available
+    trading_section = ""
+    if IBKR_TRADING_KNOWLEDGE:
+        trading_section = f"\n\n# IBKR TRADING CAPABILITIES\n{IBKR_TRADING_KNOWLEDGE}\n"
+    
+    # Include relative volume knowledge if available
+    volume_section = ""
+    if RELATIVE_VOLUME_KNOWLEDGE:
+        volume_section = f"""
 # RELATIVE VOLUME (RVOL) ANALYSIS - WARRIOR TRADING
 {RELATIVE_VOLUME_KNOWLEDGE}
 
-CURRENT VOLUME ANALYSIS:
-- Current Volume: {volume:,.0f} shares
-- Average Volume: {avg_volume:,.0f} shares
-- Volume Ratio (RVOL): {volume_ratio:.2f}x
-
 RVOL INTERPRETATION:
 - RVOL ≥ 2.0: Stock is IN PLAY (good for trading) ✅
 - RVOL 1.5-2.0: Stock is getting attention (watch for setups) ⚠️
@@ -304,11 +261,11 @@ USE THIS KNOWLEDGE to:
 5. Use volume ratio to enhance trading confidence
 
 """
-        
-        # Include float knowledge if available
-        float_section = ""
-        if FLOAT_KNOWLEDGE:
-            float_section = f"""
+    
+    # Include float knowledge if available
+    float_section = ""
+    if FLOAT_KNOWLEDGE:
+        float_section = f"""
 # STOCK FLOAT ANALYSIS - WARRIOR TRADING
 {FLOAT_KNOWLEDGE}
 
@@ -333,31 +290,9 @@ USE THIS KNOWLEDGE to:
 5. Integrate float with volume and RVOL analysis
 
 """
-        
-        # Add float data if available
-        if stock_float and stock_float > 0:
-            float_analysis = f"""
-CURRENT FLOAT DATA:
-- Stock Float: {stock_float:,.0f} shares
-- Float Category: {'Low Float (< 50M)' if stock_float < 50_000_000 else 'Medium Float (50M-200M)' if stock_float < 200_000_000 else 'High Float (> 200M)'}
-- Move Potential: {'Explosive moves possible' if stock_float < 50_000_000 else 'Moderate moves' if stock_float < 200_000_000 else 'Steady moves'}
-- Spread Impact: {'Wider spreads expected' if stock_float < 50_000_000 else 'Tighter spreads' if stock_float > 200_000_000 else 'Moderate spreads'}
-- Position Sizing: {'Use smaller positions' if stock_float < 50_000_000 else 'Can use larger positions' if stock_float > 200_000_000 else 'Moderate positions'}
-
-FLOAT + VOLUME ANALYSIS:
-- Float: {stock_float:,.0f} shares
-- Current Volume: {volume:,.0f} shares
-- Volume Ratio (RVOL): {volume_ratio:.2f}x
-- {'⚠️ Low float + high RVOL = EXPLOSIVE MOVE POTENTIAL' if stock_float < 50_000_000 and volume_ratio >= 2.0 else '✅ Good setup' if volume_ratio >= 2.0 else '⚠️ Low RVOL - stock not in play'}
-
-"""
-            float_section += float_analysis
-        else:
-            float_section += "\nNOTE: Float data not available for this stock. Use general float knowledge for analysis.\n"
-        
-        
-        # Initialize data source section (emphasizes REAL data)
-        data_source_section = f"""
+    
+    # Data source section (emphasizes REAL data)
+    data_source_section = """
 # DATA SOURCE INFORMATION - CRITICAL FOR LEARNING
 IMPORTANT: You are analyzing REAL market data from Interactive Brokers, not simulated or synthetic data.
 
@@ -366,7 +301,7 @@ Data Sources (ALL REAL):
 - Current Price: REAL live price from IBKR market data feed
 - Volume: REAL trading volume from IBKR
 - Bid/Ask: REAL Level 1 quotes from IBKR
-- Level 2 Data: {'REAL order book data from NASDAQ TotalView' if level2_data else 'Available but not provided in this analysis'}
+- Level 2 Data: REAL order book data from NASDAQ TotalView (included in the stock data when available)
 - Market Data: Live, real-time data from professional trading platform
 
 LEARNING FROM REAL DATA:
@@ -387,15 +322,12 @@ Your analysis should be based on:
 Never use simulated or synthetic data when real data is available.
 
 """
-        
-        # Include comprehensive Level 2 market data information and REAL data if available
-        level2_section = ""
-        real_level2_data_section = ""
-        
-        if MARKET_DATA_LEVEL2_AVAILABLE:
-            if LEVEL2_KNOWLEDGE:
-                # Use comprehensive Level 2 knowledge
-                level2_section = f"""
+    
+    # Comprehensive Level 2 market data knowledge
+    level2_section = ""
+    if MARKET_DATA_LEVEL2_AVAILABLE:
+        if LEVEL2_KNOWLEDGE:
+            level2_section = f"""
 # COMPREHENSIVE LEVEL 2 MARKET DATA KNOWLEDGE
 {LEVEL2_KNOWLEDGE}
 
@@ -414,9 +346,9 @@ USE THIS KNOWLEDGE to provide sophisticated analysis that includes:
 6. Enhanced confidence when Level 2 confirms candlestick patterns
 
 """
-            else:
-                # Fallback to basic Level 2 info
-                level2_section = f"""
+        else:
+            # Fallback to basic Level 2 info
+            level2_section = """
 # MARKET DATA CAPABILITIES (Level 2 Available)
 Level 2 Order Book Data: ENABLED
 - Full order book depth available for enhanced analysis
@@ -433,97 +365,22 @@ When analyzing, you can consider:
 - Entry/exit timing based on order flow patterns
 
 """
-            
-            # Add REAL Level 2 data if provided
-            if level2_data:
-                bids = level2_data.get('bids', [])
-                asks = level2_data.get('asks', [])
-                total_bid_size = sum(b.get('size', 0) for b in bids)
-                total_ask_size = sum(a.get('size', 0) for a in asks)
-                bid_ask_ratio = total_bid_size / total_ask_size if total_ask_size > 0 else 1.0
-                
-                real_level2_data_section = f"""
-# REAL LEVEL 2 ORDER BOOK DATA (Live from IBKR - USE THIS!)
-This is REAL market data, not simulated. Use this to make actual trading decisions.
-
-ORDER BOOK DEPTH:
-- Total Bid Size: {total_bid_size:,} shares
-- Total Ask Size: {total_ask_size:,} shares
-- Bid/Ask Ratio: {bid_ask_ratio:.2f} ({'Bullish' if bid_ask_ratio > 1.5 else 'Bearish' if bid_ask_ratio < 0.67 else 'Balanced'})
-
-TOP BIDS (Buyers - Support Levels):
-{chr(10).join([f"  ${b.get('price', 0):.2f} - {b.get('size', 0):,} shares" for b in bids[:5]]) if bids else "  No bid data available"}
-
-TOP ASKS (Sellers - Resistance Levels):
-{chr(10).join([f"  ${a.get('price', 0):.2f} - {a.get('size', 0):,} shares" for a in asks[:5]]) if asks else "  No ask data available"}
-
-ANALYSIS TASK WITH REAL LEVEL 2:
-- Identify support levels from large bids (real orders)
-- Identify resistance levels from large asks (real orders)
-- Analyze order flow direction (bids vs asks)
-- Detect order imbalances (real market pressure)
-- Use this REAL data to confirm candlestick patterns
-- Provide entry/exit timing based on REAL order book levels
-
-"""
-        
-        analysis_prompt = f"""
-{CANDLESTICK_TEACHING_PROMPT}
-{data_source_section}
-{pattern_section}
-{trading_section}
-{volume_section}
-{float_section}
-{level2_section}
-{real_level2_data_section}
-
-STOCK DATA (REAL from IBKR):
-Symbol: {symbol}
-Current Price: ${current_price:.2f}
-Current Volume: {volume:,.0f}
-Average Volume: {avg_volume:,.0f}
-Volume Ratio (RVOL): {volume_ratio:.2f}x {'✅ IN PLAY (RVOL ≥ 2.0)' if volume_ratio >= 2.0 else '⚠️ Getting Attention (1.5-2.0)' if volume_ratio >= 1.5 else '❌ NOT IN PLAY (RVOL < 1.5)'}
-Price Trend (last 5 candles): {price_trend} ({price_change_pct:+.2f}%)
-
+    
+    rules_section = """
 OLLAMA TRADING CONSTRAINTS (MUST FOLLOW):
 - Price Range: ONLY trade stocks between $1.00 and $6.00
 - Maximum Position: $4,000 per stock per day
 - End of Day: Close all positions before 4:00 PM ET (no new positions after 3:30 PM)
 - If price is outside $1-$6 range, DO NOT trade
 
-CRITICAL PRICE LEVELS:
-- Recent HIGH (last 10 candles): ${recent_high:.2f} (resistance level)
-- Recent LOW (last 10 candles): ${recent_low:.2f} (support level)
-- Current Price: ${current_price:.2f}
-- Price Position: {price_position:.1f}% between low and high
-- Distance to HIGH: {((recent_high - current_price) / current_price * 100):.2f}%
-- Distance to LOW: {((current_price - recent_low) / current_price * 100):.2f}%
-
 TRADING STRATEGY USING HIGH/LOW:
 - For BUY: Entry should be near LOW (support), stop below LOW, target near HIGH (resistance)
 - For SELL: Entry should be near HIGH (resistance), stop above HIGH, target near LOW (support)
 - Use trailing stops: Raise stop loss as price moves in your favor (never lower it)
 
-CANDLESTICK DATA (Last 20 candles, most recent is index {len(candle_data)-1}):
-⚠️ CRITICAL: This is REAL market data from Interactive Brokers, not simulated.
-Learn from actual market behavior and real price action. This is how professional traders analyze stocks.
-{json.dumps(candle_data, indent=2)}
-{pattern_context}
-
-ANALYSIS TASK (Using REAL Market Data):
-Carefully analyze these candlesticks considering:
-- Pattern recognition (look for the patterns I taught you)
-- Volume confirmation (volume ratio: {volume_ratio:.2f}x)
-- Price position relative to HIGH and LOW (support/resistance levels)
-- Entry strategy: For BUY, prefer entry near LOW; For SELL, prefer entry near HIGH
-- Stop loss: Set below LOW for BUY, above HIGH for SELL
-- Take profit: Target near HIGH for BUY, near LOW for SELL
-- Trailing stop: Plan to raise stop loss as price moves in your favor
-- Risk-reward potential using HIGH/LOW levels
-
-CRITICAL: Respond ONLY with valid JSON. No text before or after the JSON object.
-
-{{
+RESPONSE FORMAT - respond ONLY with valid JSON. No text before or after the JSON object.
+
+{
     "pattern": "pattern_name or null",
     "signal": "BUY|SELL|HOLD",
     "confidence": "HIGH|MEDIUM|LOW",
@@ -533,74 +390,362 @@ CRITICAL: Respond ONLY with valid JSON. No text before or after the JSON object.
     "takeProfit": number or null,  // Should be near HIGH for BUY, near LOW for SELL
     "trailingStopPercent": number or null,  // Percentage to trail stop loss (e.g., 2.0 for 2%)
     "riskRewardRatio": number or null
-}}
+}
 """
+    
+    return f"""{ANALYSIS_SYSTEM_INSTRUCTIONS}
+
+{CANDLESTICK_TEACHING_PROMPT}
+{data_source_section}
+{pattern_section}
+{trading_section}
+{volume_section}
+{float_section}
+{level2_section}
+{rules_section}
+{PROMPT_FORMAT_LEGEND}"""
+
+ANALYSIS_KNOWLEDGE_PROMPT = build_analysis_knowledge_prompt()
+
+# Context window sized to hold the knowledge prefix (~3 chars per token) plus the per-symbol
+# prompt and the answer. Options must stay identical between calls or Ollama reloads the model
+# and the cached prefix is lost.
+OLLAMA_NUM_CTX = ((len(ANALYSIS_KNOWLEDGE_PROMPT) // 3 + 4096) // 1024 + 1) * 1024
+OLLAMA_KEEP_ALIVE = "30m"  # Keep the model (and its cached prefix) loaded between analyses
+ANALYSIS_KNOWLEDGE_TOKENS = estimate_tokens(ANALYSIS_KNOWLEDGE_PROMPT)
+ANALYSIS_KNOWLEDGE_VERSION = hashlib.sha256(ANALYSIS_KNOWLEDGE_PROMPT.encode('utf-8')).hexdigest()[:12]
+# Patterns the compiled knowledge teaches (numbered '### N. NAME' entries of the library)
+KNOWLEDGE_PATTERN_COUNT = len(re.findall(r'^### \d+\. ', COMPLETE_PATTERN_LIBRARY, re.MULTILINE)) if COMPLETE_PATTERN_LIBRARY else 0
+
+# The knowledge compiled into a derived Ollama model (built once per version, see knowledge_model)
+KNOWLEDGE_MODEL_VERSION = hashlib.sha256(f"{OLLAMA_MODEL}|{ANALYSIS_KNOWLEDGE_VERSION}|{OLLAMA_NUM_CTX}".encode('utf-8')).hexdigest()[:12]
+KNOWLEDGE_MODEL = KnowledgeModel(
+    OLLAMA_CLIENT, OLLAMA_MODEL, ANALYSIS_KNOWLEDGE_PROMPT, KNOWLEDGE_MODEL_VERSION,
+    os.path.join(os.path.dirname(__file__), 'knowledge'), parameters={'num_ctx': OLLAMA_NUM_CTX}
+)
+
+# Verdict cache - unchanged analysis inputs reuse the stored verdict instead of a new inference
+VERDICT_CACHE_PATH = os.path.join(os.path.dirname(__file__), 'verdict_cache.json')
+VERDICT_CACHE_TTL = 300  # seconds a verdict is reused
+VERDICT_CACHE_MAX_ENTRIES = 2000
+VERDICT_CACHE = VerdictCache(VERDICT_CACHE_PATH, VERDICT_CACHE_TTL, VERDICT_CACHE_MAX_ENTRIES)
+atexit.register(VERDICT_CACHE.save)
+
+# Rules engine - runs before every analysis and skips the model when the rules settle the verdict
+RULES_ENGINE = RulesEngine()
+logging.info(f"📚 [OLLAMA] Analysis knowledge prefix: {len(ANALYSIS_KNOWLEDGE_PROMPT):,} chars (num_ctx={OLLAMA_NUM_CTX})")
+
+# Estimated prompt tokens (see prompt_encoder.estimate_tokens)
+_PROMPT_LOCK = threading.Lock()
+_PROMPT_STATS = {'prompts': 0, 'tokens': 0}
+
+def get_prompt_stats() -> Dict[str, Any]:
+    with _PROMPT_LOCK:
+        prompts = _PROMPT_STATS['prompts']
+        return {
+            'prompts': prompts,
+            'avgPromptTokens': round(_PROMPT_STATS['tokens'] / prompts, 1) if prompts else None,
+            'knowledgePrefixTokens': ANALYSIS_KNOWLEDGE_TOKENS
+        }
+
+def build_symbol_analysis_prompt(candles: List[Dict], symbol: str, current_price: float, volume: float, avg_volume: Optional[float], detected_patterns: Optional[List[Dict]] = None, level2_data: Optional[Dict] = None, stock_float: Optional[float] = None) -> Tuple[str, Optional[float]]:
+    """
+    Per-symbol part of the analysis prompt (sent after the cached ANALYSIS_KNOWLEDGE_PROMPT)
+    
+    Returns:
+        (prompt, volume_ratio) - volume_ratio is None when the average volume is unknown
+    """
+    volume_ratio = relative_volume(volume, avg_volume)
+    
+    # Only this per-symbol block is evaluated per request - the knowledge, the data format
+    # legend and the task are in the system prompt
+    analysis_prompt = encode_stock_prompt(
+        candles, symbol, current_price, volume, avg_volume, volume_ratio, detected_patterns,
+        level2_data if MARKET_DATA_LEVEL2_AVAILABLE else None, stock_float
+    )
+    with _PROMPT_LOCK:
+        _PROMPT_STATS['prompts'] += 1
+        _PROMPT_STATS['tokens'] += estimate_tokens(analysis_prompt)
+    
+    return analysis_prompt, volume_ratio
+
+# Structured output schema for the verdict - sent as Ollama's `format`, so generation is
+# constrained to this JSON shape, and compiled below to check/coerce what comes back
+ANALYSIS_RESPONSE_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "pattern": {"type": ["string", "null"]},
+        "signal": {"type": "string", "enum": ["BUY", "SELL", "HOLD"]},
+        "confidence": {"type": "string", "enum": ["HIGH", "MEDIUM", "LOW"]},
+        "reasoning": {"type": "string"},
+        "entryPrice": {"type": ["number", "null"]},
+        "stopLoss": {"type": ["number", "null"]},
+        "takeProfit": {"type": ["number", "null"]},
+        "trailingStopPercent": {"type": ["number", "null"]},
+        "riskRewardRatio": {"type": ["number", "null"]}
+    },
+    "required": ["pattern", "signal", "confidence", "reasoning", "entryPrice", "stopLoss", "takeProfit"]
+}
+
+# Defaults for required fields a (tolerantly parsed) reply left out
+_ANALYSIS_DEFAULTS = {"pattern": None, "signal": "HOLD", "confidence": "LOW", "reasoning": "",
+                      "entryPrice": None, "stopLoss": None, "takeProfit": None}
+
+def _compile_schema(schema: Dict[str, Any]) -> Dict[str, Any]:
+    """field -> coercer(value) returning the schema-conformant value, or raising ValueError"""
+    def coercer(spec):
+        types = spec['type'] if isinstance(spec['type'], list) else [spec['type']]
+        nullable = 'null' in types
+        enum = spec.get('enum')
+
+        def coerce(value):
+            if value is None or (isinstance(value, str) and value.strip().lower() in ('', 'null', 'none', 'n/a')):
+                if nullable:
+                    return None
+                raise ValueError('null not allowed')
+            if 'number' in types:
+                if isinstance(value, str):
+                    value = value.strip().lstrip('$').rstrip('%').replace(',', '')
+                return float(value)
+            value = str(value).strip()
+            if enum:
+                value = value.upper()
+                if value not in enum:
+                    raise ValueError(f"{value!r} not in {enum}")
+            return value
+        return coerce
+
+    return {name: coercer(spec) for name, spec in schema['properties'].items()}
+
+_ANALYSIS_COERCERS = _compile_schema(ANALYSIS_RESPONSE_SCHEMA)
+
+# Parse outcomes: 'json' (valid structured output), 'tolerant' (recovered by the streaming parser),
+# 'text' (keyword fallback), plus how many replies needed fields repaired
+_PARSE_LOCK = threading.Lock()
+_PARSE_STATS = {'json': 0, 'tolerant': 0, 'text': 0, 'repaired': 0}
+
+def conform_analysis(raw: Dict[str, Any]) -> Tuple[Dict[str, Any], bool]:
+    """
+    Coerce a parsed verdict to ANALYSIS_RESPONSE_SCHEMA (numbers from "$2.35", upper-case enums, defaults)
+    
+    Returns:
+        (analysis, repaired) - repaired is True if any field was missing or invalid
+    """
+    analysis = {}
+    repaired = False
+    for name, coerce in _ANALYSIS_COERCERS.items():
+        if name not in raw:
+            if name in _ANALYSIS_DEFAULTS:
+                analysis[name] = _ANALYSIS_DEFAULTS[name]
+                repaired = True
+            continue
+        try:
+            analysis[name] = coerce(raw[name])
+        except (TypeError, ValueError):
+            analysis[name] = _ANALYSIS_DEFAULTS.get(name)
+            repaired = True
+    return analysis, repaired
+
+def extract_analysis(response_text: str) -> Tuple[Dict[str, Any], str]:
+    """
+    Verdict from the model's reply: strict JSON (structured output), else the tolerant
+    incremental parser, else the keyword text parser
+    
+    Returns:
+        (analysis, method) - method is 'json', 'tolerant' or 'text'
+    """
+    method = 'json'
+    try:
+        raw = json.loads(response_text)
+        if not isinstance(raw, dict):
+            raise ValueError('not an object')
+    except ValueError:
+        parser = StreamingVerdictParser()
+        parser.feed(response_text)
+        raw = parser.close()
+        method = 'tolerant'
+        if 'signal' not in raw:
+            raw = parse_text_response(response_text)
+            method = 'text'
+    
+    analysis, repaired = conform_analysis(raw)
+    with _PARSE_LOCK:
+        _PARSE_STATS[method] += 1
+        if repaired:
+            _PARSE_STATS['repaired'] += 1
+    if method != 'json':
+        logging.warning(f"⚠️ [OLLAMA] Reply was not valid JSON - parsed with the {method} fallback")
+    return analysis, method
+
+def get_parse_stats() -> Dict[str, Any]:
+    """Parse outcome counts and the share of replies that weren't valid JSON"""
+    with _PARSE_LOCK:
+        stats = dict(_PARSE_STATS)
+    total = stats['json'] + stats['tolerant'] + stats['text']
+    stats['total'] = total
+    stats['parseFailureRate'] = round((stats['tolerant'] + stats['text']) / total, 3) if total else 0.0
+    return stats
+
+def build_analysis_request(analysis_prompt: str, stream: bool = False) -> Dict[str, Any]:
+    """/api/generate body: static knowledge as the (KV-cached) system prompt, per-symbol data as the prompt"""
+    return {
+        **KNOWLEDGE_MODEL.request_fields(),  # Knowledge model, or the base model + knowledge system prompt
+        "prompt": analysis_prompt,
+        "stream": stream,
+        "format": ANALYSIS_RESPONSE_SCHEMA,  # Structured output - the reply is constrained to the verdict schema
+        "keep_alive": OLLAMA_KEEP_ALIVE,
+        "options": {
+            "temperature": 0.2,  # Lower temperature for more consistent, focused analysis
+            "top_p": 0.85,  # Slightly lower for more focused responses
+            "top_k": 40,  # Limit vocabulary for more consistent outputs
+            "num_predict": 500,  # Limit response length for faster analysis
+            "num_ctx": OLLAMA_NUM_CTX,  # Room for the whole knowledge prefix (default context would truncate it)
+        }
+    }
+
+def build_warmup_request() -> Dict[str, Any]:
+    """
+    Analysis request that generates a single token: loads the model with the exact options
+    analyses use (so they don't trigger a reload) and evaluates the knowledge prefix into
+    the KV cache
+    """
+    payload = build_analysis_request("Reply with an empty JSON object.")
+    payload.pop("format")
+    payload["options"] = {**payload["options"], "num_predict": 1}
+    return payload
+
+# Warm-up - preload the analysis model at boot and keep it resident during market hours
+OLLAMA_WARMUP = ModelWarmupManager(OLLAMA_CLIENT, keep_alive=OLLAMA_KEEP_ALIVE)
+
+def register_analysis_warmup():
+    """(Re-)register the analysis warm-up for whichever model analyses use right now"""
+    warmup_request = build_warmup_request()
+    OLLAMA_WARMUP.replace_primary(warmup_request["model"], warmup_request)
+
+def prepare_analysis_model() -> bool:
+    """
+    Startup: find or build the knowledge model, then register the analysis warm-up for
+    whichever model analyses will use. Returns True when the knowledge model is ready.
+    """
+    ready = KNOWLEDGE_MODEL.ensure()
+    register_analysis_warmup()
+    return ready
+
+def retry_analysis_model():
+    """
+    Warm-up loop hook: while analyses still fall back to the base model (Ollama wasn't up
+    at boot, or creating the model failed), try to build the knowledge model again and
+    move the warm-up over to it once it's ready
+    """
+    if not KNOWLEDGE_MODEL.ready and KNOWLEDGE_MODEL.ensure():
+        logging.info(f"✅ [OLLAMA] Analysis knowledge model {KNOWLEDGE_MODEL.name} ready")
+        register_analysis_warmup()
+
+def parse_analysis_response(response_text: str, candles: List[Dict], symbol: str, volume_ratio: Optional[float]) -> Dict[str, Any]:
+    """Turn the model's reply into the analysis result (schema-conformant verdict)"""
+    analysis, parse_method = extract_analysis(response_text)
+    
+    # Validate and enhance analysis
+    if analysis.get('riskRewardRatio') is None:
+        if analysis.get('entryPrice') and analysis.get('stopLoss') and analysis.get('takeProfit'):
+            entry = analysis['entryPrice']
+            stop = analysis['stopLoss']
+            profit = analysis['takeProfit']
+            if analysis.get('signal') == 'BUY' and entry > stop:
+                risk = entry - stop
+                reward = profit - entry
+                if risk > 0:
+                    analysis['riskRewardRatio'] = round(reward / risk, 2)
+            elif analysis.get('signal') == 'SELL' and entry < stop:
+                risk = stop - entry
+                reward = entry - profit
+                if risk > 0:
+                    analysis['riskRewardRatio'] = round(reward / risk, 2)
+    
+    # Add metadata
+    analysis['timestamp'] = datetime.now().isoformat()
+    analysis['model'] = OLLAMA_MODEL
+    analysis['candleCount'] = len(candles)
+    analysis['volumeRatio'] = volume_ratio
+    analysis['parseMethod'] = parse_method
+    
+    logging.info(f"✅ [OLLAMA] Analysis complete for {symbol}: {analysis.get('signal')} ({analysis.get('confidence')})")
+    return {
+        'success': True,
+        'analysis': analysis
+    }
+
+def answer_without_model(candles: List[Dict], symbol: str, current_price: float, volume: float, avg_volume: float, detected_patterns: Optional[List[Dict]] = None, level2_data: Optional[Dict] = None, stock_float: Optional[float] = None) -> Tuple[Optional[Dict[str, Any]], str, Optional[List[Dict]]]:
+    """
+    Try the rules engine, then the verdict cache, before paying for an inference
+    
+    Returns:
+        (result or None, verdict cache key, detected patterns for the prompt - the rules
+        engine's when the frontend sent none)
+    """
+    rules = RULES_ENGINE.evaluate(candles, current_price, volume, avg_volume, level2_data)
+    if rules['decisive']:
+        analysis = rules['analysis']
+        analysis['timestamp'] = datetime.now().isoformat()
+        analysis['model'] = 'rules-engine'
+        analysis['candleCount'] = len(candles)
+        analysis['volumeRatio'] = rules['volumeRatio']
+        analysis['rule'] = rules['rule']
+        logging.info(f"⚡ [RULES] {symbol}: {analysis['signal']} ({rules['rule']}) - model call skipped")
+        return {'success': True, 'analysis': analysis, 'shortCircuit': True}, '', detected_patterns
+    
+    if not detected_patterns and rules['patterns']:
+        detected_patterns = rules['patterns']
+    
+    cache_key = make_verdict_key(OLLAMA_MODEL, candles, current_price, volume, avg_volume,
+                                 detected_patterns, level2_data, stock_float, ANALYSIS_KNOWLEDGE_VERSION)
+    cached = VERDICT_CACHE.get(cache_key)
+    if cached is not None:
+        logging.info(f"⚡ [OLLAMA] Cached verdict for {symbol}: {cached['analysis'].get('signal')} ({cached['analysis'].get('confidence')})")
+        cached['cached'] = True
+        return cached, cache_key, detected_patterns
+    return None, cache_key, detected_patterns
+
+def analyze_candlesticks_with_ollama(candles: List[Dict], symbol: str, current_price: float, volume: float, avg_volume: float, detected_patterns: Optional[List[Dict]] = None, level2_data: Optional[Dict] = None, stock_float: Optional[float] = None) -> Dict[str, Any]:
+    """
+    Analyze candlestick patterns using Ollama AI with REAL market data
+    
+    Args:
+        candles: List of candle dictionaries with open, high, low, close, volume (REAL data from IBKR)
+        symbol: Stock symbol
+        current_price: Current stock price (REAL from IBKR)
+        volume: Current volume (REAL from IBKR)
+        avg_volume: Average volume (REAL from IBKR)
+        detected_patterns: Optional patterns detected by frontend
+        level2_data: Optional Level 2 order book data (REAL from IBKR)
+        
+    Returns:
+        Analysis result with pattern, signal, confidence, and reasoning
+    """
+    volume_ratio = relative_volume(volume, avg_volume)
+    try:
+        result, cache_key, detected_patterns = answer_without_model(
+            candles, symbol, current_price, volume, avg_volume, detected_patterns, level2_data, stock_float
+        )
+        if result is not None:
+            return result
+        
+        analysis_prompt, volume_ratio = build_symbol_analysis_prompt(
+            candles, symbol, current_price, volume, avg_volume, detected_patterns, level2_data, stock_float
+        )
         
         # Call Ollama API
-        response = requests.post(
-            f"{OLLAMA_BASE_URL}/api/generate",
-            json={
-                "model": OLLAMA_MODEL,
-                "prompt": analysis_prompt,
-                "stream": False,
-                "options": {
-                    "temperature": 0.2,  # Lower temperature for more consistent, focused analysis
-                    "top_p": 0.85,  # Slightly lower for more focused responses
-                    "top_k": 40,  # Limit vocabulary for more consistent outputs
-                    "num_predict": 500,  # Limit response length for faster analysis
-                },
-                "system": "You are a professional stock trader analyzing REAL market data from Interactive Brokers. Always use real data, never simulated data. Learn from actual market behavior. Always respond in valid JSON format only. Be precise, conservative, and data-driven in your analysis."
-            },
+        response = OLLAMA_CLIENT.post(
+            "/api/generate",
+            json=build_analysis_request(analysis_prompt),
+            operation='analyze',
             timeout=OLLAMA_TIMEOUT
         )
         
         if response.status_code == 200:
-            result = response.json()
-            response_text = result.get('response', '')
-            
-            # Try to extract JSON from response
-            try:
-                # Look for JSON in the response
-                json_start = response_text.find('{')
-                json_end = response_text.rfind('}') + 1
-                if json_start >= 0 and json_end > json_start:
-                    json_text = response_text[json_start:json_end]
-                    analysis = json.loads(json_text)
-                else:
-                    # Fallback: parse text response
-                    analysis = parse_text_response(response_text)
-            except json.JSONDecodeError:
-                # Fallback parsing
-                analysis = parse_text_response(response_text)
-            
-            # Validate and enhance analysis
-            if 'riskRewardRatio' not in analysis:
-                if analysis.get('entryPrice') and analysis.get('stopLoss') and analysis.get('takeProfit'):
-                    entry = analysis['entryPrice']
-                    stop = analysis['stopLoss']
-                    profit = analysis['takeProfit']
-                    if analysis.get('signal') == 'BUY' and entry > stop:
-                        risk = entry - stop
-                        reward = profit - entry
-                        if risk > 0:
-                            analysis['riskRewardRatio'] = round(reward / risk, 2)
-                    elif analysis.get('signal') == 'SELL' and entry < stop:
-                        risk = stop - entry
-                        reward = entry - profit
-                        if risk > 0:
-                            analysis['riskRewardRatio'] = round(reward / risk, 2)
-            
-            # Add metadata
-            analysis['timestamp'] = datetime.now().isoformat()
-            analysis['model'] = OLLAMA_MODEL
-            analysis['candleCount'] = len(candles)
-            analysis['volumeRatio'] = volume_ratio
-            
-            logging.info(f"✅ [OLLAMA] Analysis complete for {symbol}: {analysis.get('signal')} ({analysis.get('confidence')})")
-            return {
-                'success': True,
-                'analysis': analysis
-            }
+            result = parse_analysis_response(response.json().get('response', ''), candles, symbol, volume_ratio)
+            VERDICT_CACHE.put(cache_key, result)
+            return result
         else:
             logging.error(f"❌ [OLLAMA] API error: {response.status_code} - {response.text}")
             return {
@@ -624,6 +769,163 @@ CRITICAL: Respond ONLY with valid JSON. No text before or after the JSON object.
             'analysis': get_fallback_analysis(candles, volume_ratio)
         }
 
+class StreamingVerdictParser:
+    """
+    Incremental parser for the model's JSON verdict.
+    
+    `feed(text)` scans each streamed chunk and returns the top-level fields it completed, so
+    e.g. "signal" is known as soon as the model writes its closing quote instead of after the
+    whole reasoning. Text before the opening brace and // comments (as in the response
+    format example) are skipped. It also serves as the tolerant fallback parser for
+    replies that aren't valid JSON (see extract_analysis).
+    """
+
+    def __init__(self):
+        self.fields: Dict[str, Any] = {}
+        self._buffer = ''
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._in_comment = False
+        self._string_start = 0
+        self._key: Optional[str] = None
+        self._value_start: Optional[int] = None  # Set after ':' until the value is stored
+
+    def _store(self, raw: str):
+        try:
+            value = json.loads(raw)
+        except ValueError:
+            return None
+        self.fields[self._key] = value
+        self._value_start = None
+        return self._key, value
+
+    def close(self) -> Dict[str, Any]:
+        """
+        End of output: keep what a truncated reply still holds (a last value cut off before
+        its ',' / '}', or the text so far of an unterminated string) and return all fields
+        """
+        if self._depth == 1 and self._value_start is not None and self._key is not None:
+            if self._in_string:
+                raw = self._buffer[self._string_start + 1:]
+                try:
+                    self.fields[self._key] = json.loads(f'"{raw.rstrip(chr(92))}"')
+                except ValueError:
+                    self.fields[self._key] = raw
+            else:
+                self._store(re.sub(r'//[^\n]*', '', self._buffer[self._value_start:]).strip())
+        return self.fields
+
+    def feed(self, text: str) -> List[Tuple[str, Any]]:
+        """Add streamed text; returns [(field, value), ...] completed by it"""
+        self._buffer += text
+        completed = []
+        buffer = self._buffer
+        while self._pos < len(buffer):
+            i = self._pos
+            char = buffer[i]
+            if self._in_comment:
+                self._in_comment = char != '\n'
+            elif self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == '\\':
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                    if self._depth == 1:
+                        raw = buffer[self._string_start:i + 1]
+                        if self._value_start is None:
+                            self._key = json.loads(raw)
+                        elif not buffer[self._value_start:self._string_start].strip():
+                            # String value - complete at its closing quote
+                            field = self._store(raw)
+                            if field:
+                                completed.append(field)
+            elif char == '/':
+                if i + 1 >= len(buffer):
+                    break  # Wait for the next chunk to tell '//' from '/'
+                self._in_comment = buffer[i + 1] == '/'
+            elif char == '"':
+                self._in_string = True
+                self._string_start = i
+            elif char in '{[':
+                self._depth += 1
+            elif char in '}],' and self._depth >= 1:
+                if self._depth == 1 and char != ']' and self._value_start is not None and self._key is not None:
+                    # Number / literal / nested value ends at the next top-level ',' or '}'
+                    raw = buffer[self._value_start:i]
+                    field = self._store(re.sub(r'//[^\n]*', '', raw).strip())
+                    if field:
+                        completed.append(field)
+                if char != ',':
+                    self._depth -= 1
+            elif char == ':' and self._depth == 1 and self._key is not None:
+                self._value_start = i + 1
+            self._pos = i + 1
+        return completed
+
+def iter_ollama_tokens(payload: Dict[str, Any], operation: str = 'analyze', timeout: float = OLLAMA_TIMEOUT):
+    """
+    Streaming /api/generate request: yield response text as Ollama produces it
+    
+    Raises:
+        requests.exceptions.RequestException: connection failure or non-200 status
+    """
+    for chunk in OLLAMA_CLIENT.stream_generate(payload, operation=operation, timeout=timeout):
+        if chunk.get('response'):
+            yield chunk['response']
+
+def stream_candlestick_analysis(candles: List[Dict], symbol: str, current_price: float, volume: float, avg_volume: float, detected_patterns: Optional[List[Dict]] = None, level2_data: Optional[Dict] = None, stock_float: Optional[float] = None):
+    """
+    Streaming twin of analyze_candlesticks_with_ollama.
+    
+    Yields (event, data) tuples:
+        ('token', {'text'}) for every generated chunk,
+        ('field', {'name', 'value'}) as each verdict field completes (signal, confidence, ...),
+        ('result', {...}) once, with the same result analyze_candlesticks_with_ollama returns
+    A rules-engine or cached verdict is replayed as its field events and result, without token events.
+    """
+    volume_ratio = relative_volume(volume, avg_volume)
+    try:
+        result, cache_key, detected_patterns = answer_without_model(
+            candles, symbol, current_price, volume, avg_volume, detected_patterns, level2_data, stock_float
+        )
+        if result is not None:
+            for name, value in result['analysis'].items():
+                yield 'field', {'name': name, 'value': value}
+            yield 'result', result
+            return
+        
+        analysis_prompt, volume_ratio = build_symbol_analysis_prompt(
+            candles, symbol, current_price, volume, avg_volume, detected_patterns, level2_data, stock_float
+        )
+        parser = StreamingVerdictParser()
+        response_text = []
+        for text in iter_ollama_tokens(build_analysis_request(analysis_prompt, stream=True)):
+            response_text.append(text)
+            yield 'token', {'text': text}
+            for name, value in parser.feed(text):
+                yield 'field', {'name': name, 'value': value}
+        result = parse_analysis_response(''.join(response_text), candles, symbol, volume_ratio)
+        VERDICT_CACHE.put(cache_key, result)
+        yield 'result', result
+    except requests.exceptions.RequestException as e:
+        logging.error(f"❌ [OLLAMA] Connection error: {e}")
+        yield 'result', {
+            'success': False,
+            'error': f"Ollama connection error: {str(e)}",
+            'analysis': get_fallback_analysis(candles, volume_ratio)
+        }
+    except Exception as e:
+        logging.error(f"❌ [OLLAMA] Analysis error: {e}")
+        yield 'result', {
+            'success': False,
+            'error': f"Analysis error: {str(e)}",
+            'analysis': get_fallback_analysis(candles, volume_ratio)
+        }
+
 def parse_text_response(text: str) -> Dict[str, Any]:
     """Parse text response from Ollama into structured format"""
     text_lower = text.lower()
@@ -667,49 +969,15 @@ def parse_text_response(text: str) -> Dict[str, Any]:
         "takeProfit": None
     }
 
-def get_fallback_analysis(candles: List[Dict], volume_ratio: float) -> Dict[str, Any]:
-    """Fallback analysis when Ollama is unavailable"""
-    if not candles:
-        return {
-            "pattern": None,
-            "signal": "HOLD",
-            "confidence": "LOW",
-            "reasoning": "No candle data available",
-            "entryPrice": None,
-            "stopLoss": None,
-            "takeProfit": None
-        }
-    
-    # Simple trend analysis
-    recent_candles = candles[-5:]
-    closes = [c.get('close', c.get('Close', 0)) for c in recent_candles]
-    
-    if len(closes) >= 2:
-        trend = "UP" if closes[-1] > closes[0] else "DOWN"
-        signal = "BUY" if trend == "UP" and volume_ratio > 1.5 else "HOLD"
-        if trend == "DOWN" and volume_ratio > 1.5:
-            signal = "SELL"
-    else:
-        signal = "HOLD"
-        trend = "UNKNOWN"
-    
-    return {
-        "pattern": None,
-        "signal": signal,
-        "confidence": "LOW",
-        "reasoning": f"Fallback analysis: {trend} trend, volume {volume_ratio:.2f}x average",
-        "entryPrice": None,
-        "stopLoss": None,
-        "takeProfit": None
-    }
+def get_fallback_analysis(candles: List[Dict], volume_ratio: Optional[float]) -> Dict[str, Any]:
+    """Fallback analysis when Ollama is unavailable (rules engine verdict)"""
+    arrays = candle_arrays(candles)
+    return RULES_ENGINE.score(arrays, detect_patterns(arrays), 0, volume_ratio)
 
 def check_ollama_connection() -> Dict[str, Any]:
     """Check if Ollama is running and accessible"""
     try:
-        response = requests.get(
-            f"{OLLAMA_BASE_URL}/api/tags",
-            timeout=5
-        )
+        response = OLLAMA_CLIENT.get("/api/tags", operation='status')
         if response.status_code == 200:
             models = response.json().get('models', [])
             return {
@@ -767,13 +1035,14 @@ Please acknowledge that you understand this pattern and can identify it in futur
 """
     
     try:
-        response = requests.post(
-            f"{OLLAMA_BASE_URL}/api/generate",
+        response = OLLAMA_CLIENT.post(
+            "/api/generate",
             json={
                 "model": OLLAMA_MODEL,
                 "prompt": teaching_prompt,
                 "stream": False
             },
+            operation='teach',
             timeout=OLLAMA_TIMEOUT
         )
         
@@ -3,12 +3,12 @@ Relative Volume Teaching for Ollama
 Teaches Ollama about relative volume (RVOL) and how to use it for day trading
 Based on Warrior Trading professional insights
 """
-import requests
 import logging
 from typing import Dict, Any
 
+from ollama_client import OLLAMA_CLIENT
+
 # Ollama Configuration
-OLLAMA_BASE_URL = "http://localhost:11434"
 OLLAMA_MODEL = "gemma3:4b"  # Use available model
 OLLAMA_TIMEOUT = 120
 
@@ -264,8 +264,8 @@ Please acknowledge that you understand relative volume analysis, including the c
 Respond with: "I understand relative volume (RVOL) analysis. I know that RVOL ≥ 2.0 means a stock is in play, RVOL < 2.0 means it's not in play. I will always confirm breakouts with volume and never trade breakouts without volume confirmation. I am ready to use RVOL for enhanced trading decisions."
 """
         
-        response = requests.post(
-            f"{OLLAMA_BASE_URL}/api/generate",
+        response = OLLAMA_CLIENT.post(
+            "/api/generate",
             json={
                 "model": OLLAMA_MODEL,
                 "prompt": teaching_prompt,
@@ -276,6 +276,7 @@ Respond with: "I understand relative volume (RVOL) analysis. I know that RVOL 
                 },
                 "system": "You are learning to be an expert day trader using REAL market data from Interactive Brokers. Always use real data, never simulated data. Pay close attention to relative volume (RVOL) as a key indicator for identifying in-play stocks and confirming breakouts. Learn from actual market behavior."
             },
+            operation='teach',
             timeout=OLLAMA_TIMEOUT
         )
         
@@ -0,0 +1,182 @@
+"""
+Ollama Model Warm-Up
+Preloads the models we use at boot and keeps them resident during market hours, so the
+first analysis or trade decision of the day doesn't pay the model load (and the knowledge
+prefix evaluation) inside a user request
+"""
+import logging
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Any, Callable, Optional
+
+class ModelWarmupManager:
+    """
+    Registered models are warmed with their own /api/generate body (by default an empty
+    prompt, which only loads the model) carrying `keep_alive`.
+
+    While `active_hours()` is true a background thread re-sends each warm-up every
+    `check_interval` seconds, which resets Ollama's unload timer. Primary models are
+    reloaded if Ollama unloaded them anyway; secondary ones (e.g. chat models) are only kept
+    alive while still loaded, so two models that don't fit in memory together don't keep
+    evicting each other. Outside active hours nothing is refreshed and Ollama unloads them.
+
+    `before_check`, if set, runs at the start of every pass (e.g. to retry preparing a
+    model that couldn't be built at boot and re-register its warm-up).
+    """
+
+    def __init__(self, client, keep_alive: str = '30m', check_interval: float = 120.0,
+                 active_hours: Optional[Callable[[], bool]] = None):
+        self.client = client
+        self.keep_alive = keep_alive
+        self.check_interval = check_interval
+        self.active_hours = active_hours or (lambda: True)
+        self.before_check: Optional[Callable[[], None]] = None
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        # model -> {'payload', 'primary', 'state', 'coldStarts', 'lastLoadMs', 'lastWarmMs', 'lastWarmed', 'error'}
+        self._models: Dict[str, Dict[str, Any]] = {}
+
+    def register(self, model: str, payload: Optional[Dict[str, Any]] = None, primary: bool = False):
+        """Track a model; payload is the /api/generate body used to warm it"""
+        with self._lock:
+            if model in self._models:
+                if primary:
+                    self._models[model]['primary'] = True
+                return
+            self._models[model] = {
+                'payload': payload or {'model': model, 'prompt': ''},
+                'primary': primary,
+                'state': 'cold',
+                'coldStarts': 0,
+                'lastLoadMs': None,
+                'lastWarmMs': None,
+                'lastWarmed': None,
+                'error': None
+            }
+
+    def replace_primary(self, model: str, payload: Dict[str, Any]):
+        """
+        Make `model` (warmed with `payload`) the primary warm-up, dropping other primary
+        entries - used when the model a workload runs on changes
+        """
+        with self._lock:
+            for name in [name for name, entry in self._models.items() if entry['primary'] and name != model]:
+                del self._models[name]
+                logging.info(f"🔥 [OLLAMA WARMUP] {name} replaced by {model}")
+            entry = self._models.get(model)
+            if entry is not None:
+                entry['payload'] = payload
+                entry['primary'] = True
+                return
+        self.register(model, payload, primary=True)
+
+    def set_active_hours(self, active_hours: Callable[[], bool]):
+        self.active_hours = active_hours
+
+    def set_before_check(self, before_check: Callable[[], None]):
+        self.before_check = before_check
+
+    # ---- warming ----
+
+    def loaded_models(self) -> Dict[str, Dict[str, Any]]:
+        """Models Ollama currently has in memory (GET /api/ps)"""
+        response = self.client.get('/api/ps', operation='status')
+        if response.status_code != 200:
+            raise RuntimeError(f"Ollama API error: {response.status_code}")
+        return {m.get('name', ''): m for m in response.json().get('models', [])}
+
+    def warm(self, model: str) -> bool:
+        """Send the model's warm-up request; records load time when Ollama had to load it"""
+        with self._lock:
+            entry = self._models.get(model)
+            if entry is None:
+                return False
+            entry['state'] = 'loading' if entry['state'] != 'loaded' else 'loaded'
+            payload = {**entry['payload'], 'stream': False, 'keep_alive': self.keep_alive}
+
+        start = time.time()
+        try:
+            response = self.client.post('/api/generate', json=payload, operation='warmup')
+            if response.status_code != 200:
+                raise RuntimeError(f"Ollama API error: {response.status_code}")
+            result = response.json()
+        except Exception as e:
+            with self._lock:
+                entry['state'] = 'error'
+                entry['error'] = str(e)
+            logging.warning(f"⚠️ [OLLAMA WARMUP] Could not warm {model}: {e}")
+            return False
+
+        elapsed_ms = round((time.time() - start) * 1000, 1)
+        # Ollama reports load_duration in nanoseconds; a few ms means the model was already resident
+        load_ms = round((result.get('load_duration', 0) or 0) / 1e6, 1)
+        cold = load_ms > 500
+        with self._lock:
+            entry['state'] = 'loaded'
+            entry['error'] = None
+            entry['lastWarmMs'] = elapsed_ms
+            entry['lastWarmed'] = datetime.now().isoformat()
+            if cold:
+                entry['coldStarts'] += 1
+                entry['lastLoadMs'] = load_ms
+        if cold:
+            logging.info(f"🔥 [OLLAMA WARMUP] {model} loaded in {load_ms / 1000:.1f}s (warm-up took {elapsed_ms / 1000:.1f}s)")
+        return True
+
+    def warm_all(self):
+        for model in list(self._models):
+            self.warm(model)
+
+    def check(self):
+        """One keep-alive pass (see class docstring)"""
+        if not self.active_hours():
+            return
+        try:
+            loaded = self.loaded_models()
+        except Exception as e:
+            logging.debug(f"⚠️ [OLLAMA WARMUP] Could not list loaded models: {e}")
+            return
+        with self._lock:
+            models = [(model, entry['primary']) for model, entry in self._models.items()]
+        for model, primary in models:
+            resident = model in loaded or f"{model}:latest" in loaded
+            if not resident:
+                with self._lock:
+                    if self._models[model]['state'] == 'loaded':
+                        self._models[model]['state'] = 'unloaded'
+                if not primary:
+                    continue
+            self.warm(model)
+
+    # ---- background thread ----
+
+    def start(self):
+        """Warm every registered model now, then keep them alive in the background"""
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name='ollama-warmup', daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        self.warm_all()
+        while True:
+            time.sleep(self.check_interval)
+            try:
+                if self.before_check is not None:
+                    self.before_check()
+                self.check()
+            except Exception as e:
+                logging.warning(f"⚠️ [OLLAMA WARMUP] Keep-alive check failed: {e}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'running': self._thread is not None and self._thread.is_alive(),
+                'keepAlive': self.keep_alive,
+                'models': {
+                    model: {key: value for key, value in entry.items() if key != 'payload'}
+                    for model, entry in self._models.items()
+                }
+            }
@@ -0,0 +1,227 @@
+"""
+In-Memory Order Book
+Order state kept up to date from ib_insync's order events (status changes, executions,
+errors) instead of polled from IBKR, plus a sequence-numbered event log that SSE clients
+follow for fills, partial fills and rejections of orders submitted in the background.
+"""
+import itertools
+import logging
+import threading
+import time
+import uuid
+from collections import deque
+from datetime import datetime
+from typing import Dict, Any, List, Optional
+
+# Statuses after which an order can't change any more
+DONE_STATUSES = frozenset({'Filled', 'Cancelled', 'ApiCancelled', 'Inactive'})
+# IBKR error codes that are only notices about an order, not a problem with it
+_NOTICE_CODES = frozenset({399, 404, 2109, 10148, 10149})
+
+class OrderBook:
+    """
+    orderId -> order record, handle -> background submission, and the last `max_events`
+    events. Event handlers run on the IBKR gateway worker; they only update memory under a
+    short lock and wake waiting readers. Submissions and fills are also written to `journal`
+    (a TradeJournal), if given.
+    """
+
+    def __init__(self, max_events: int = 1000, max_orders: int = 2000, journal=None):
+        self.max_orders = max_orders
+        self.journal = journal
+        self._ib = None
+        self._lock = threading.Lock()
+        self._new_event = threading.Condition(self._lock)
+        self._seq = itertools.count(1)
+        self._last_seq = 0
+        self._events: deque = deque(maxlen=max_events)
+        self._orders: Dict[int, Dict[str, Any]] = {}
+        self._handles: Dict[str, Dict[str, Any]] = {}
+        self._counts = {'submitted': 0, 'accepted': 0, 'failed': 0, 'fills': 0, 'rejected': 0}
+
+    # ---- IBKR events ----
+
+    def set_ibkr_instance(self, ib_instance):
+        """Follow a (re)connected raw IB instance's order events"""
+        events = ('newOrderEvent', 'orderStatusEvent', 'execDetailsEvent', 'errorEvent')
+        handlers = (self._on_order_status, self._on_order_status, self._on_exec_details, self._on_error)
+        with self._lock:
+            previous, self._ib = self._ib, ib_instance
+        if previous is ib_instance:
+            return
+        for name, handler in zip(events, handlers):
+            if previous is not None:
+                try:
+                    event = getattr(previous, name)
+                    event -= handler
+                except Exception:
+                    pass
+            event = getattr(ib_instance, name)
+            event += handler
+        logging.info("📒 [ORDER BOOK] Following IBKR order events")
+
+    def _record_locked(self, trade) -> Dict[str, Any]:
+        order = trade.order
+        record = self._orders.get(order.orderId)
+        if record is None:
+            record = self._orders[order.orderId] = {
+                'orderId': order.orderId,
+                'parentId': order.parentId or None,
+                'symbol': getattr(trade.contract, 'symbol', None),
+                'action': order.action,
+                'quantity': order.totalQuantity,
+                'orderType': order.orderType,
+                'status': None,
+                'filled': 0.0,
+                'remaining': order.totalQuantity,
+                'avgFillPrice': None,
+                'fills': [],
+                'error': None,
+                'createdAt': datetime.now().isoformat()
+            }
+            while len(self._orders) > self.max_orders:
+                oldest = next(iter(self._orders))
+                if self._orders[oldest]['status'] not in DONE_STATUSES:
+                    break
+                del self._orders[oldest]
+        return record
+
+    def _publish_locked(self, event_type: str, data: Dict[str, Any]):
+        seq = next(self._seq)
+        self._last_seq = seq
+        self._events.append({'seq': seq, 'type': event_type, 'time': time.time(), 'data': data})
+        self._new_event.notify_all()
+
+    def _on_order_status(self, trade):
+        status = trade.orderStatus
+        with self._lock:
+            record = self._record_locked(trade)
+            if record['status'] == status.status and record['filled'] == status.filled:
+                return
+            record['status'] = status.status
+            record['filled'] = status.filled
+            record['remaining'] = status.remaining
+            record['avgFillPrice'] = status.avgFillPrice or None
+            record['updatedAt'] = datetime.now().isoformat()
+            rejected = status.status in ('Cancelled', 'ApiCancelled', 'Inactive') and record['error'] is not None
+            if rejected:
+                self._counts['rejected'] += 1
+            self._publish_locked('rejected' if rejected else 'status', dict(record, fills=len(record['fills'])))
+
+    def _on_exec_details(self, trade, fill):
+        execution = fill.execution
+        with self._lock:
+            record = self._record_locked(trade)
+            if any(f['execId'] == execution.execId for f in record['fills']):
+                return  # Re-sent execution (e.g. after reconnect)
+            entry = {
+                'execId': execution.execId,
+                'shares': execution.shares,
+                'price': execution.price,
+                'time': execution.time.isoformat() if execution.time else None
+            }
+            record['fills'].append(entry)
+            if self.journal is not None:
+                self.journal.append('fill', execution.execId, {
+                    'orderId': record['orderId'], 'symbol': record['symbol'], 'action': record['action'], **entry
+                })
+            filled = sum(f['shares'] for f in record['fills'])
+            self._counts['fills'] += 1
+            self._publish_locked('fill', {
+                'orderId': record['orderId'],
+                'symbol': record['symbol'],
+                'action': record['action'],
+                **entry,
+                'filled': filled,
+                'remaining': max(record['quantity'] - filled, 0),
+                'partial': filled < record['quantity']
+            })
+
+    def _on_error(self, req_id, error_code, error_string, contract=None):
+        if error_code in _NOTICE_CODES:
+            return
+        with self._lock:
+            record = self._orders.get(req_id)
+            if record is None:
+                return
+            record['error'] = f"{error_code}: {error_string}"
+            self._publish_locked('error', {'orderId': req_id, 'symbol': record['symbol'], 'code': error_code, 'message': error_string})
+
+    # ---- background submissions ----
+
+    def create_handle(self, symbol: str, action: str, quantity: int, order_type: str) -> Dict[str, Any]:
+        """Record a submission before it reaches IBKR; returns the handle given to the caller"""
+        handle = {
+            'handle': uuid.uuid4().hex[:12],
+            'symbol': symbol,
+            'action': action,
+            'quantity': quantity,
+            'orderType': order_type,
+            'status': 'Queued',
+            'orderId': None,
+            'submittedAt': datetime.now().isoformat()
+        }
+        with self._lock:
+            self._handles[handle['handle']] = handle
+            while len(self._handles) > self.max_orders:
+                del self._handles[next(iter(self._handles))]
+            self._counts['submitted'] += 1
+            self._publish_locked('queued', dict(handle))
+            if self.journal is not None:
+                self.journal.append('order', handle['handle'], handle)
+            # Clients subscribe with ?since=<seq> so they can't miss the outcome
+            handle['seq'] = self._last_seq
+        return dict(handle)
+
+    def resolve_handle(self, handle_id: str, result: Dict[str, Any]):
+        """Attach the place-order result (success with orderId, or the error) to a handle"""
+        with self._lock:
+            handle = self._handles.get(handle_id)
+            if handle is None:
+                return
+            handle['result'] = result
+            if result.get('success'):
+                handle['status'] = 'Accepted'
+                handle['orderId'] = result.get('orderId')
+                self._counts['accepted'] += 1
+                self._publish_locked('accepted', {'handle': handle_id, **result})
+            else:
+                handle['status'] = 'Failed'
+                self._counts['failed'] += 1
+                self._publish_locked('failed', {'handle': handle_id, **result})
+            if self.journal is not None:
+                self.journal.append('order', handle_id, handle)
+
+    # ---- reads ----
+
+    def get_order(self, order_id: int) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            record = self._orders.get(order_id)
+            return dict(record, fills=list(record['fills'])) if record else None
+
+    def get_handle(self, handle_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            handle = self._handles.get(handle_id)
+            return dict(handle) if handle else None
+
+    def wait_events(self, since: int = 0, timeout: float = 15.0) -> List[Dict[str, Any]]:
+        """Events after sequence number `since`, waiting up to `timeout` seconds for one"""
+        with self._lock:
+            if self._last_seq <= since:
+                self._new_event.wait(timeout)
+            return [event for event in self._events if event['seq'] > since]
+
+    def last_seq(self) -> int:
+        with self._lock:
+            return self._last_seq
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'attached': self._ib is not None,
+                'orders': len(self._orders),
+                'openOrders': sum(1 for r in self._orders.values() if r['status'] not in DONE_STATUSES),
+                'events': len(self._events),
+                'lastSeq': self._last_seq,
+                **self._counts
+            }
@@ -0,0 +1,249 @@
+"""
+IBKR Historical Data Pacing
+Schedules reqHistoricalData calls inside IBKR's pacing limits up front (instead of backing
+off after a pacing violation) and lets identical requests share one download
+"""
+import asyncio
+import bisect
+import concurrent.futures
+import logging
+import threading
+import time
+from typing import Dict, Any, List, Tuple
+
+from bar_store import bar_size_seconds
+
+# IBKR historical data limits (TWS API docs, "Historical Data Limitations")
+IDENTICAL_REQUEST_SECONDS = 15.0   # No identical request within 15 seconds
+CONTRACT_REQUEST_LIMIT = 5         # Six or more requests for one contract/exchange/tick type...
+CONTRACT_WINDOW_SECONDS = 2.0      # ...within two seconds is a violation
+WINDOW_REQUEST_LIMIT = 60          # No more than 60 requests...
+WINDOW_SECONDS = 600.0             # ...in any ten minute period (bars of 30 secs or less)
+SMALL_BAR_SECONDS = 30
+MAX_OPEN_REQUESTS = 50             # Simultaneous open historical requests
+
+class HistoricalDataPacer:
+    """
+    Front door for reqHistoricalData.
+
+    Each request reserves the earliest start time that keeps every limit satisfied and waits
+    until then. Requests identical to one in flight wait for its result instead of asking
+    again, and one identical to a request answered less than `identical_seconds` ago gets
+    that answer (re-asking would be a pacing violation). `request` is for request threads,
+    `request_async` for code on the ib_insync event loop.
+    """
+
+    def __init__(self, identical_seconds: float = IDENTICAL_REQUEST_SECONDS,
+                 contract_limit: int = CONTRACT_REQUEST_LIMIT, contract_window: float = CONTRACT_WINDOW_SECONDS,
+                 window_limit: int = WINDOW_REQUEST_LIMIT, window_seconds: float = WINDOW_SECONDS,
+                 max_open: int = MAX_OPEN_REQUESTS, safety_margin: float = 0.1):
+        self.identical_seconds = identical_seconds
+        self.contract_limit = contract_limit
+        self.contract_window = contract_window
+        self.window_limit = window_limit
+        self.window_seconds = window_seconds
+        self.max_open = max_open
+        self.safety_margin = safety_margin
+        self._lock = threading.Lock()
+        # Reserved start times (sorted, may lie in the future)
+        self._contract_starts: Dict[tuple, List[float]] = {}
+        self._small_bar_starts: List[float] = []
+        self._identical_starts: Dict[tuple, float] = {}
+        self._in_flight: Dict[tuple, concurrent.futures.Future] = {}
+        self._recent: Dict[tuple, Tuple[float, Any]] = {}  # identical key -> (answered_at, bars)
+        self._open = 0
+        self._waiting = 0
+        self._requests = 0
+        self._coalesced = 0
+        self._reused = 0
+        self._paced = 0
+        self._wait_seconds = 0.0
+        self._max_wait = 0.0
+
+    # ---- scheduling ----
+
+    @staticmethod
+    def _keys(contract, params: Dict[str, Any]) -> Tuple[tuple, tuple]:
+        """(identical-request key, contract/exchange/tick type key)"""
+        contract_key = (
+            getattr(contract, 'conId', 0) or getattr(contract, 'symbol', str(contract)),
+            getattr(contract, 'exchange', ''),
+            params.get('whatToShow', 'TRADES')
+        )
+        identical_key = contract_key + (
+            str(params.get('endDateTime', '')),
+            params.get('durationStr'),
+            params.get('barSizeSetting'),
+            bool(params.get('useRTH', True))
+        )
+        return identical_key, contract_key
+
+    def _join(self, key: tuple) -> Tuple[concurrent.futures.Future, bool, Any]:
+        """Return (future, is_leader, recent_bars)"""
+        with self._lock:
+            recent = self._recent.get(key)
+            if recent and time.time() - recent[0] < self.identical_seconds:
+                self._reused += 1
+                return None, False, recent[1]
+            future = self._in_flight.get(key)
+            if future is not None:
+                self._coalesced += 1
+                return future, False, None
+            future = self._in_flight[key] = concurrent.futures.Future()
+            self._requests += 1
+            return future, True, None
+
+    def _reserve(self, key: tuple, contract_key: tuple, small_bars: bool) -> float:
+        """Book the earliest start time within every limit; returns seconds to wait for it"""
+        now = time.time()
+        with self._lock:
+            self._prune(now)
+            start = now
+            if key in self._identical_starts:
+                start = max(start, self._identical_starts[key] + self.identical_seconds + self.safety_margin)
+
+            starts = self._contract_starts.setdefault(contract_key, [])
+            if len(starts) >= self.contract_limit:
+                start = max(start, starts[-self.contract_limit] + self.contract_window + self.safety_margin)
+            if small_bars and len(self._small_bar_starts) >= self.window_limit:
+                start = max(start, self._small_bar_starts[-self.window_limit] + self.window_seconds + self.safety_margin)
+
+            self._identical_starts[key] = start
+            bisect.insort(starts, start)
+            if small_bars:
+                bisect.insort(self._small_bar_starts, start)
+
+            delay = start - now
+            if delay > 0:
+                self._paced += 1
+            self._waiting += 1
+            self._wait_seconds += delay
+            self._max_wait = max(self._max_wait, delay)
+            return delay
+
+    def _prune(self, now: float):
+        for contract_key in list(self._contract_starts):
+            starts = self._contract_starts[contract_key]
+            del starts[:bisect.bisect_left(starts, now - self.contract_window - self.safety_margin)]
+            if not starts:
+                del self._contract_starts[contract_key]
+        del self._small_bar_starts[:bisect.bisect_left(self._small_bar_starts, now - self.window_seconds - self.safety_margin)]
+        for key in [k for k, (answered_at, _) in self._recent.items() if now - answered_at >= self.identical_seconds]:
+            del self._recent[key]
+        for key in [k for k, started in self._identical_starts.items() if now - started >= self.identical_seconds + self.safety_margin]:
+            del self._identical_starts[key]
+
+    def _try_open(self) -> bool:
+        with self._lock:
+            if self._open >= self.max_open:
+                return False
+            self._open += 1
+            self._waiting -= 1
+            return True
+
+    def _abandon(self, key: tuple, future: concurrent.futures.Future, error: BaseException):
+        """Leader gave up before sending (e.g. its task was cancelled) - release the waiters"""
+        with self._lock:
+            self._in_flight.pop(key, None)
+        future.set_exception(error)
+
+    def _close(self, key: tuple, future: concurrent.futures.Future, bars: Any = None, error: BaseException = None):
+        with self._lock:
+            self._open -= 1
+            self._in_flight.pop(key, None)
+            if error is None:
+                self._recent[key] = (time.time(), bars)
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(bars)
+
+    def _is_small_bars(self, params: Dict[str, Any]) -> bool:
+        try:
+            return bar_size_seconds(params.get('barSizeSetting', '1 day')) <= SMALL_BAR_SECONDS
+        except (KeyError, ValueError):
+            return True
+
+    # ---- public API ----
+
+    def request(self, ib, contract, **params):
+        """Paced ib.reqHistoricalData(contract, **params) - blocks the calling thread while it waits its turn"""
+        key, contract_key = self._keys(contract, params)
+        future, leader, bars = self._join(key)
+        if future is None:
+            return bars
+        if not leader:
+            return future.result()
+
+        delay = self._reserve(key, contract_key, self._is_small_bars(params))
+        try:
+            if delay > 0:
+                logging.debug(f"⏳ [PACING] {contract_key[0]} {params.get('durationStr')} {params.get('barSizeSetting')}: waiting {delay:.2f}s")
+                time.sleep(delay)
+            while not self._try_open():
+                time.sleep(0.05)
+        except BaseException as e:
+            with self._lock:
+                self._waiting -= 1
+            self._abandon(key, future, e)
+            raise
+
+        try:
+            bars = ib.reqHistoricalData(contract, **params)
+        except BaseException as e:
+            self._close(key, future, error=e)
+            raise
+        self._close(key, future, bars)
+        return bars
+
+    async def request_async(self, ib, contract, **params):
+        """Paced ib.reqHistoricalDataAsync(contract, **params) for code on the ib_insync event loop"""
+        key, contract_key = self._keys(contract, params)
+        future, leader, bars = self._join(key)
+        if future is None:
+            return bars
+        if not leader:
+            return await asyncio.wrap_future(future)
+
+        delay = self._reserve(key, contract_key, self._is_small_bars(params))
+        try:
+            if delay > 0:
+                logging.debug(f"⏳ [PACING] {contract_key[0]} {params.get('durationStr')} {params.get('barSizeSetting')}: waiting {delay:.2f}s")
+                await asyncio.sleep(delay)
+            while not self._try_open():
+                await asyncio.sleep(0.05)
+        except BaseException as e:
+            with self._lock:
+                self._waiting -= 1
+            self._abandon(key, future, e)
+            raise
+
+        try:
+            bars = await ib.reqHistoricalDataAsync(contract, **params)
+        except BaseException as e:
+            self._close(key, future, error=e)
+            raise
+        self._close(key, future, bars)
+        return bars
+
+    def get_stats(self) -> Dict[str, Any]:
+        now = time.time()
+        with self._lock:
+            return {
+                'requests': self._requests,
+                'coalesced': self._coalesced,
+                'reusedRecent': self._reused,
+                'paced': self._paced,
+                'waiting': self._waiting,
+                'open': self._open,
+                'inFlight': len(self._in_flight),
+                'avgWaitMs': round(self._wait_seconds / self._requests * 1000, 1) if self._requests else 0.0,
+                'maxWaitMs': round(self._max_wait * 1000, 1),
+                'smallBarRequestsInWindow': sum(1 for t in self._small_bar_starts if t > now - self.window_seconds),
+                'limits': {
+                    'identicalSeconds': self.identical_seconds,
+                    'perContract': f"{self.contract_limit}/{self.contract_window:g}s",
+                    'smallBarWindow': f"{self.window_limit}/{self.window_seconds:g}s",
+                    'maxOpen': self.max_open
+                }
+            }
@@ -0,0 +1,169 @@
+"""
+Compact Prompt Encoding
+Per-symbol market data for the analysis prompt as short CSV-like tables and one-line
+feature summaries instead of pretty-printed JSON and narrative text. The column legend and
+the analysis task are static, so they live in the (KV-cached) system prompt via
+PROMPT_FORMAT_LEGEND and each request only carries numbers.
+"""
+import math
+import re
+from typing import Dict, Any, List, Optional
+
+import numpy as np
+
+from rules_engine import candle_arrays, RVOL_IN_PLAY, RVOL_MIN, BID_ASK_BULLISH, BID_ASK_BEARISH
+
+LOW_FLOAT = 50_000_000
+HIGH_FLOAT = 200_000_000
+
+# Static description of the encoded data - part of the cached knowledge prefix, not of each request
+PROMPT_FORMAT_LEGEND = f"""
+# MARKET DATA FORMAT
+Each request gives the data for one stock in this compact format:
+- STOCK: symbol, price, volume, avgVolume, RVOL (relative volume) and its status: INPLAY (RVOL >= {RVOL_IN_PLAY}), WATCH ({RVOL_MIN}-{RVOL_IN_PLAY}), NOTINPLAY (< {RVOL_MIN}).
+  RVOL=n/a (no status) means the average volume is unknown - judge volume from the candles, don't treat the stock as not in play
+- TREND5: direction and % change over the last 5 candles
+- LEVELS10: recent HIGH (resistance) and LOW (support) of the last 10 candles, position of the price between them (0% = at LOW, 100% = at HIGH), % distance to HIGH and to LOW
+- FLOAT: shares and category (LOW < 50M = explosive moves, wider spreads, smaller positions; MID 50M-200M; HIGH > 200M = steadier moves, tighter spreads)
+- L2: real IBKR order book - total bid/ask size, bid/ask ratio and pressure (BULL > {BID_ASK_BULLISH}, BEAR < {BID_ASK_BEARISH}), then the top bids and asks as price x size. Large bids are support, large asks are resistance.
+- PATTERNS: patterns already detected by technical analysis as name/signal/confidence - validate or expand on them
+- CANDLES: one row per candle, oldest first, last row is the most recent. Columns:
+  i = index, o/h/l/c = open/high/low/close, v = volume (K = thousand, M = million),
+  d = direction (U = bullish close > open, D = bearish, = flat),
+  body/uw/lw = body, upper wick and lower wick as % of the candle's high-low range
+Volumes use K/M suffixes. All data is REAL market data from Interactive Brokers, not simulated.
+
+# ANALYSIS TASK
+Analyze the candles considering pattern recognition (the patterns you were taught), volume
+confirmation (RVOL), the price position relative to the HIGH/LOW levels, entry, stop loss,
+take profit and trailing stop using the HIGH/LOW strategy, risk-reward, and the Level 2 order
+book when given (support from large bids, resistance from large asks, order imbalance).
+Respond ONLY with valid JSON in the response format. No text before or after the JSON object.
+"""
+
+_TOKEN_PATTERN = re.compile(r"[A-Za-z]+|\d+|[^\sA-Za-z\d]")
+
+def estimate_tokens(text: str) -> int:
+    """
+    Approximate LLM token count without loading a tokenizer: words count about one token
+    per 4 letters, digit runs one per 3 digits and every symbol one token
+    """
+    count = 0
+    for match in _TOKEN_PATTERN.finditer(text):
+        token = match.group()
+        if token[0].isalpha():
+            count += math.ceil(len(token) / 4)
+        elif token[0].isdigit():
+            count += math.ceil(len(token) / 3)
+        else:
+            count += 1
+    return count
+
+def format_price(value: float) -> str:
+    """Two decimals, four below $1 (sub-dollar stocks move in fractions of a cent)"""
+    return f"{value:.4f}" if abs(value) < 1 else f"{value:.2f}"
+
+def format_volume(value: float) -> str:
+    """1234567 -> 1.23M, 45600 -> 45.6K"""
+    value = float(value or 0)
+    if value >= 1_000_000:
+        return f"{value / 1_000_000:.3g}M"
+    if value >= 1_000:
+        return f"{value / 1_000:.3g}K"
+    return f"{value:.0f}"
+
+def encode_candles(candles: List[Dict], limit: int = 20) -> str:
+    """Header row plus one CSV row per candle, with direction and body/wick shares of the range"""
+    arrays = candle_arrays(candles, limit)
+    o, h, l, c, v = arrays['open'], arrays['high'], arrays['low'], arrays['close'], arrays['volume']
+    rng = h - l
+    safe_rng = np.where(rng > 0, rng, 1.0)
+    body_pct = np.where(rng > 0, np.abs(c - o) / safe_rng * 100, 0)
+    upper_pct = np.where(rng > 0, (h - np.maximum(o, c)) / safe_rng * 100, 0)
+    lower_pct = np.where(rng > 0, (np.minimum(o, c) - l) / safe_rng * 100, 0)
+    direction = np.where(c > o, 'U', np.where(c < o, 'D', '='))
+
+    rows = ["i,o,h,l,c,v,d,body,uw,lw"]
+    for i in range(len(c)):
+        rows.append(
+            f"{i},{format_price(o[i])},{format_price(h[i])},{format_price(l[i])},{format_price(c[i])},"
+            f"{format_volume(v[i])},{direction[i]},{body_pct[i]:.0f},{upper_pct[i]:.0f},{lower_pct[i]:.0f}"
+        )
+    return "\n".join(rows)
+
+def price_features(candles: List[Dict], current_price: float) -> Dict[str, Any]:
+    """Trend over the last 5 candles and position between the last 10 candles' HIGH and LOW"""
+    if len(candles) < 5:
+        return {'trend': 'UNKNOWN', 'changePct': 0.0, 'high': current_price, 'low': current_price,
+                'positionPct': 50.0, 'toHighPct': 0.0, 'toLowPct': 0.0}
+    arrays = candle_arrays(candles, 10)
+    closes = arrays['close'][-5:]
+    trend = 'UP' if closes[-1] > closes[0] else 'DOWN' if closes[-1] < closes[0] else 'SIDEWAYS'
+    change_pct = (closes[-1] - closes[0]) / closes[0] * 100 if closes[0] > 0 else 0.0
+    high = float(arrays['high'].max())
+    low = float(arrays['low'].min())
+    return {
+        'trend': trend,
+        'changePct': float(change_pct),
+        'high': high,
+        'low': low,
+        'positionPct': (current_price - low) / (high - low) * 100 if high - low > 0 else 50.0,
+        'toHighPct': (high - current_price) / current_price * 100 if current_price else 0.0,
+        'toLowPct': (current_price - low) / current_price * 100 if current_price else 0.0
+    }
+
+def rvol_status(volume_ratio: Optional[float]) -> str:
+    if volume_ratio is None:
+        return ''
+    return 'INPLAY' if volume_ratio >= RVOL_IN_PLAY else 'WATCH' if volume_ratio >= RVOL_MIN else 'NOTINPLAY'
+
+def encode_float(stock_float: Optional[float]) -> str:
+    if not stock_float or stock_float <= 0:
+        return "FLOAT: n/a"
+    category = 'LOW' if stock_float < LOW_FLOAT else 'MID' if stock_float < HIGH_FLOAT else 'HIGH'
+    return f"FLOAT: {format_volume(stock_float)} {category}"
+
+def encode_level2(level2_data: Optional[Dict[str, Any]], depth: int = 5) -> str:
+    if not level2_data:
+        return ""
+    bids = level2_data.get('bids', [])
+    asks = level2_data.get('asks', [])
+    total_bid_size = sum(b.get('size', 0) for b in bids)
+    total_ask_size = sum(a.get('size', 0) for a in asks)
+    ratio = total_bid_size / total_ask_size if total_ask_size > 0 else 1.0
+    pressure = 'BULL' if ratio > BID_ASK_BULLISH else 'BEAR' if ratio < BID_ASK_BEARISH else 'BAL'
+
+    def side(levels):
+        return " ".join(f"{format_price(float(x.get('price', 0)))}x{format_volume(x.get('size', 0))}" for x in levels[:depth]) or "none"
+
+    return (f"L2: bid={format_volume(total_bid_size)} ask={format_volume(total_ask_size)} ratio={ratio:.2f} {pressure}\n"
+            f"BIDS: {side(bids)}\n"
+            f"ASKS: {side(asks)}")
+
+def encode_patterns(detected_patterns: Optional[List[Dict]], limit: int = 3) -> str:
+    if not detected_patterns:
+        return ""
+    return "PATTERNS: " + "; ".join(
+        f"{p.get('pattern', 'Unknown')}/{p.get('signal', 'N/A')}/{p.get('confidence', 'N/A')}"
+        for p in detected_patterns[-limit:]
+    )
+
+def encode_stock_prompt(candles: List[Dict], symbol: str, current_price: float, volume: float,
+                        avg_volume: Optional[float], volume_ratio: Optional[float], detected_patterns: Optional[List[Dict]] = None,
+                        level2_data: Optional[Dict] = None, stock_float: Optional[float] = None) -> str:
+    """The per-symbol prompt in the format described by PROMPT_FORMAT_LEGEND"""
+    features = price_features(candles, current_price)
+    rvol = f"RVOL={volume_ratio:.2f}x {rvol_status(volume_ratio)}" if volume_ratio is not None else "RVOL=n/a"
+    lines = [
+        f"STOCK: {symbol} price={format_price(current_price)} volume={format_volume(volume)} "
+        f"avgVolume={format_volume(avg_volume) if avg_volume else 'n/a'} {rvol}",
+        f"TREND5: {features['trend']} {features['changePct']:+.2f}%",
+        f"LEVELS10: HIGH={format_price(features['high'])} LOW={format_price(features['low'])} "
+        f"pos={features['positionPct']:.0f}% toHigh={features['toHighPct']:.2f}% toLow={features['toLowPct']:.2f}%",
+        encode_float(stock_float),
+        encode_level2(level2_data),
+        encode_patterns(detected_patterns),
+        "CANDLES:",
+        encode_candles(candles)
+    ]
+    return "\n".join(line for line in lines if line)
@@ -0,0 +1,249 @@
+"""
+Deterministic Trading Rules Engine
+Cheap, vectorized checks run before every AI analysis: candlestick patterns, RVOL and
+Level 2 bid/ask imbalance. When the rules alone settle the verdict (e.g. RVOL < 1.5 -
+the stock is not in play, which the analysis prompt itself says to avoid) the model call
+is skipped; otherwise the detected patterns are handed to the model as context.
+"""
+import threading
+from typing import Dict, Any, List, Optional
+
+import numpy as np
+
+# Thresholds - the same ones the analysis prompt teaches the model
+RVOL_IN_PLAY = 2.0          # Stock is in play
+RVOL_MIN = 1.5              # Below this the stock is not in play - avoid
+PRICE_MIN = 1.00            # Trading constraint: only $1-$6 stocks
+PRICE_MAX = 6.00
+BID_ASK_BULLISH = 1.5       # Level 2 bid/ask size ratio
+BID_ASK_BEARISH = 0.67
+MIN_CANDLES = 5             # Fewer candles than this can't show a trend or a pattern
+PATTERN_LOOKBACK = 3        # Patterns reported from the last N candles
+
+_NO_TRADE = {"entryPrice": None, "stopLoss": None, "takeProfit": None, "trailingStopPercent": None, "riskRewardRatio": None}
+
+def candle_arrays(candles: List[Dict], limit: int = 20) -> Dict[str, np.ndarray]:
+    """open/high/low/close/volume float arrays of the last `limit` candles (either key casing)"""
+    recent = candles[-limit:]
+    arrays = {}
+    for key in ('open', 'high', 'low', 'close', 'volume'):
+        values = np.array([c.get(key, c.get(key.capitalize(), 0)) or 0 for c in recent], dtype=float)
+        values[~np.isfinite(values)] = 0.0
+        arrays[key] = values
+    return arrays
+
+def detect_patterns(arrays: Dict[str, np.ndarray], lookback: int = PATTERN_LOOKBACK) -> List[Dict[str, Any]]:
+    """
+    Single- and multi-candle patterns, computed for every candle at once with array masks.
+
+    Returns:
+        Patterns ending in the last `lookback` candles, oldest first, in the detectedPatterns
+        format the frontend sends ({'pattern', 'signal', 'confidence', 'description', 'index'})
+    """
+    o, h, l, c = arrays['open'], arrays['high'], arrays['low'], arrays['close']
+    n = len(c)
+    if n < 2:
+        return []
+
+    body = c - o
+    size = np.abs(body)
+    rng = h - l
+    safe_rng = np.where(rng > 0, rng, np.nan)
+    upper = h - np.maximum(o, c)
+    lower = np.minimum(o, c) - l
+
+    def shift(values, k):
+        """values[i - k] aligned to i (NaN where it doesn't exist)"""
+        out = np.full(n, np.nan)
+        if k < n:
+            out[k:] = values[:n - k]
+        return out
+
+    prev_body, prev_open, prev_close = shift(body, 1), shift(o, 1), shift(c, 1)
+    # Body covers most of the range, for this candle and the two before it
+    long_bodies = (size > 0.5 * safe_rng) & (shift(size, 1) > 0.5 * shift(safe_rng, 1)) & (shift(size, 2) > 0.5 * shift(safe_rng, 2))
+    # Short-term trend into the candle: close 1 bar back vs close 3 bars back
+    down_into = shift(c, 1) < shift(c, 3)
+    up_into = shift(c, 1) > shift(c, 3)
+
+    masks = {
+        'Hammer': (lower >= 2 * size) & (upper <= 0.25 * safe_rng) & down_into,
+        'Shooting Star': (upper >= 2 * size) & (lower <= 0.25 * safe_rng) & up_into,
+        'Bullish Engulfing': (prev_body < 0) & (body > 0) & (o <= prev_close) & (c >= prev_open) & (size > np.abs(prev_body)),
+        'Bearish Engulfing': (prev_body > 0) & (body < 0) & (o >= prev_close) & (c <= prev_open) & (size > np.abs(prev_body)),
+        'Three White Soldiers': long_bodies & (body > 0) & (shift(body, 1) > 0) & (shift(body, 2) > 0) & (c > prev_close) & (prev_close > shift(c, 2)),
+        'Three Black Crows': long_bodies & (body < 0) & (shift(body, 1) < 0) & (shift(body, 2) < 0) & (c < prev_close) & (prev_close < shift(c, 2)),
+        'Doji': size <= 0.1 * safe_rng
+    }
+
+    definitions = {
+        'Hammer': ('BUY', 'MEDIUM', 'Long lower wick after a decline - buyers rejected lower prices'),
+        'Shooting Star': ('SELL', 'MEDIUM', 'Long upper wick after a rise - sellers rejected higher prices'),
+        'Bullish Engulfing': ('BUY', 'HIGH', 'Bullish body engulfs the previous bearish body'),
+        'Bearish Engulfing': ('SELL', 'HIGH', 'Bearish body engulfs the previous bullish body'),
+        'Three White Soldiers': ('BUY', 'HIGH', 'Three rising bullish candles in a row'),
+        'Three Black Crows': ('SELL', 'HIGH', 'Three falling bearish candles in a row'),
+        'Doji': ('HOLD', 'LOW', 'Open and close nearly equal - indecision')
+    }
+
+    start = max(0, n - lookback)
+    patterns = []
+    for name, mask in masks.items():
+        signal, confidence, description = definitions[name]
+        for index in np.flatnonzero(mask[start:]) + start:
+            patterns.append({'pattern': name, 'signal': signal, 'confidence': confidence,
+                             'description': description, 'index': int(index)})
+    patterns.sort(key=lambda p: p['index'])
+    return patterns
+
+def level2_ratio(level2_data: Optional[Dict[str, Any]]) -> Optional[float]:
+    """Total bid size / total ask size of the order book (None without Level 2)"""
+    if not level2_data:
+        return None
+    total_bid_size = sum(b.get('size', 0) for b in level2_data.get('bids', []))
+    total_ask_size = sum(a.get('size', 0) for a in level2_data.get('asks', []))
+    if total_bid_size <= 0 and total_ask_size <= 0:
+        return None
+    return total_bid_size / total_ask_size if total_ask_size > 0 else float('inf')
+
+def relative_volume(volume: float, avg_volume: float) -> Optional[float]:
+    """volume / avg_volume, or None when the average isn't known (scanner results often lack it)"""
+    return volume / avg_volume if avg_volume and avg_volume > 0 else None
+
+class RulesEngine:
+    """
+    `evaluate()` runs on every analysis request. Its result is 'decisive' when a hard rule
+    settles the verdict (not enough data, price outside the tradable range, RVOL below the
+    in-play minimum); the caller then skips the model call and counts it as avoided. Without
+    an average volume RVOL is unknown, and the RVOL rule doesn't apply.
+    """
+
+    def __init__(self, rvol_min: float = RVOL_MIN, price_min: float = PRICE_MIN, price_max: float = PRICE_MAX):
+        self.rvol_min = rvol_min
+        self.price_min = price_min
+        self.price_max = price_max
+        self._lock = threading.Lock()
+        self._evaluated = 0
+        self._avoided = 0
+        self._by_rule: Dict[str, int] = {}
+
+    def _hard_rule(self, candle_count: int, current_price: float, volume_ratio: Optional[float]) -> Optional[tuple]:
+        """(rule, reasoning) of the first hard rule that settles the verdict, or None"""
+        if candle_count < MIN_CANDLES:
+            return 'insufficientData', f"Only {candle_count} candles - not enough data to read a trend or pattern"
+        if current_price and not (self.price_min <= current_price <= self.price_max):
+            return 'priceRange', f"Price ${current_price:.2f} is outside the tradable ${self.price_min:.2f}-${self.price_max:.2f} range - do not trade"
+        if volume_ratio is not None and volume_ratio < self.rvol_min:
+            return 'lowRvol', f"RVOL {volume_ratio:.2f}x is below {self.rvol_min:.1f}x - stock is not in play (choppy action, false breakouts)"
+        return None
+
+    def settles(self, candles: List[Dict], current_price: float, volume: float, avg_volume: float) -> bool:
+        """True if a hard rule decides this request (callers can skip fetching Level 2 for it)"""
+        volume_ratio = relative_volume(volume, avg_volume)
+        return self._hard_rule(len(candles[-20:]), current_price, volume_ratio) is not None
+
+    def evaluate(self, candles: List[Dict], current_price: float, volume: float, avg_volume: float,
+                 level2_data: Optional[Dict] = None) -> Dict[str, Any]:
+        """
+        Returns:
+            {'decisive', 'rule', 'analysis' (same shape as the model's verdict), 'patterns',
+             'volumeRatio' (None if unknown)}
+        """
+        volume_ratio = relative_volume(volume, avg_volume)
+        arrays = candle_arrays(candles)
+        patterns = detect_patterns(arrays)
+        hard_rule = self._hard_rule(len(arrays['close']), current_price, volume_ratio)
+
+        with self._lock:
+            self._evaluated += 1
+            if hard_rule:
+                self._avoided += 1
+                self._by_rule[hard_rule[0]] = self._by_rule.get(hard_rule[0], 0) + 1
+
+        if hard_rule:
+            analysis = {
+                "pattern": patterns[-1]['pattern'] if patterns else None,
+                "signal": "HOLD",
+                "confidence": "HIGH",
+                "reasoning": f"Rules engine: {hard_rule[1]}.",
+                **_NO_TRADE
+            }
+        else:
+            analysis = self.score(arrays, patterns, current_price, volume_ratio, level2_data)
+        return {
+            'decisive': hard_rule is not None,
+            'rule': hard_rule[0] if hard_rule else None,
+            'analysis': analysis,
+            'patterns': patterns,
+            'volumeRatio': volume_ratio
+        }
+
+    def score(self, arrays: Dict[str, np.ndarray], patterns: List[Dict[str, Any]], current_price: float,
+              volume_ratio: Optional[float], level2_data: Optional[Dict] = None) -> Dict[str, Any]:
+        """Rule-based verdict from trend, latest pattern, RVOL and Level 2 (used when the model is unavailable)"""
+        closes = arrays['close']
+        if len(closes) < 2:
+            return {"pattern": None, "signal": "HOLD", "confidence": "LOW", "reasoning": "No candle data available", **_NO_TRADE}
+
+        recent = closes[-5:]
+        trend = "UP" if recent[-1] > recent[0] else "DOWN" if recent[-1] < recent[0] else "SIDEWAYS"
+        points = 1 if trend == "UP" else -1 if trend == "DOWN" else 0
+        reasons = [f"{trend} trend", f"volume {volume_ratio:.2f}x average" if volume_ratio is not None else "average volume unknown"]
+
+        pattern = patterns[-1] if patterns else None
+        if pattern and pattern['signal'] != 'HOLD':
+            points += 2 if pattern['signal'] == 'BUY' else -2
+            reasons.append(pattern['pattern'])
+
+        ratio = level2_ratio(level2_data)
+        if ratio is not None:
+            if ratio > BID_ASK_BULLISH:
+                points += 1
+                reasons.append(f"bids outweigh asks {ratio:.2f}x")
+            elif ratio < BID_ASK_BEARISH:
+                points -= 1
+                reasons.append(f"asks outweigh bids ({ratio:.2f} bid/ask)")
+
+        signal = "HOLD"
+        if volume_ratio is not None and volume_ratio > RVOL_MIN:
+            signal = "BUY" if points >= 2 else "SELL" if points <= -2 else "HOLD"
+        elif trend != "SIDEWAYS":
+            # Trend alone only counts with volume behind it
+            reasons.append("no volume confirmation")
+        confidence = "MEDIUM" if signal != "HOLD" and abs(points) >= 3 and volume_ratio >= RVOL_IN_PLAY else "LOW"
+
+        # HIGH/LOW strategy: enter near support, stop below it, target resistance (mirrored for SELL)
+        recent_high = float(arrays['high'][-10:].max())
+        recent_low = float(arrays['low'][-10:].min())
+        price = current_price or float(closes[-1])
+        levels = dict(_NO_TRADE)
+        if signal == "BUY" and recent_high > price > recent_low:
+            levels.update(entryPrice=round(price, 2), stopLoss=round(recent_low * 0.99, 2), takeProfit=round(recent_high, 2))
+        elif signal == "SELL" and recent_high > price > recent_low:
+            levels.update(entryPrice=round(price, 2), stopLoss=round(recent_high * 1.01, 2), takeProfit=round(recent_low, 2))
+        if levels['entryPrice'] is not None:
+            risk = abs(levels['entryPrice'] - levels['stopLoss'])
+            if risk > 0:
+                levels['riskRewardRatio'] = round(abs(levels['takeProfit'] - levels['entryPrice']) / risk, 2)
+
+        return {
+            "pattern": pattern['pattern'] if pattern else None,
+            "signal": signal,
+            "confidence": confidence,
+            "reasoning": f"Rules analysis: {', '.join(reasons)}",
+            **levels
+        }
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'evaluated': self._evaluated,
+                'llmCallsAvoided': self._avoided,
+                'avoidedRate': round(self._avoided / self._evaluated, 3) if self._evaluated else 0.0,
+                'byRule': dict(self._by_rule),
+                'thresholds': {
+                    'rvolMin': self.rvol_min,
+                    'priceRange': [self.price_min, self.price_max],
+                    'minCandles': MIN_CANDLES
+                }
+            }
@@ -0,0 +1,30 @@
+"""
+Check that the per-symbol analysis prompt is built when the average volume is unknown
+(scanner results and batch analyses send avgVolume null or 0).
+
+Run: python test_prompt_encoding.py (or pytest)
+"""
+from ollama_service import build_symbol_analysis_prompt
+
+CANDLES = [
+    {'open': 3.0 + i * 0.01, 'high': 3.1 + i * 0.01, 'low': 2.9, 'close': 3.05 + i * 0.01, 'volume': 1000}
+    for i in range(20)
+]
+
+def test_unknown_average_volume():
+    for avg_volume in (None, 0):
+        prompt, volume_ratio = build_symbol_analysis_prompt(CANDLES, 'TEST', 3.3, 5000, avg_volume)
+        stock_line = prompt.splitlines()[0]
+        assert volume_ratio is None
+        assert stock_line.endswith('RVOL=n/a'), stock_line
+        assert 'NOTINPLAY' not in prompt and 'CANDLES:' in prompt
+
+def test_known_average_volume():
+    prompt, volume_ratio = build_symbol_analysis_prompt(CANDLES, 'TEST', 3.3, 5000, 1000)
+    assert volume_ratio == 5.0
+    assert 'RVOL=5.00x INPLAY' in prompt.splitlines()[0]
+
+if __name__ == '__main__':
+    test_unknown_average_volume()
+    test_known_average_volume()
+    print("✅ Analysis prompts are valid with known and unknown average volume")
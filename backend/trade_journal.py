@@ -0,0 +1,214 @@
+"""
+Trade Journal
+Append-only SQLite (WAL) journal of the trading state that used to live only in memory:
+trades under stop management (ACTIVE_TRADES), their stop moves, the daily buy/sell limit
+and, for the record, order submissions and fills. Replayed at startup so a restart resumes
+trailing exactly where it left off, and periodically compacted into a snapshot row.
+"""
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Any, List, Optional
+
+# Entry kinds that make up the recovered state; 'order' and 'fill' are history only
+STATE_KINDS = ('snapshot', 'trade_open', 'trade_update', 'trade_close', 'daily')
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS journal (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    ts REAL NOT NULL,
+    kind TEXT NOT NULL,
+    key TEXT,
+    data TEXT NOT NULL
+);
+CREATE UNIQUE INDEX IF NOT EXISTS journal_fill_exec ON journal(key) WHERE kind = 'fill';
+"""
+
+class TradeJournal:
+    """
+    Every change is one appended row (seq, ts, kind, key, JSON data), committed before the
+    call returns. WAL with synchronous=NORMAL survives a crash of the process; a power loss
+    can lose the last commits but never corrupts the file.
+
+    The journal also applies each entry to its own copy of the state ({'trades', 'daily'}),
+    which is what replay restores and what compaction writes: after `compact_every` appends
+    the state rows are folded into one 'snapshot' row, and order/fill history older than
+    `retention_days` is dropped. Fills are keyed by execId, so executions IBKR re-sends after
+    a reconnect aren't journaled twice.
+
+    If the database can't be opened or written the journal logs it and trading carries on
+    with in-memory state only.
+    """
+
+    def __init__(self, path: str, compact_every: int = 500, retention_days: int = 7):
+        self.path = path
+        self.compact_every = compact_every
+        self.retention_days = retention_days
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._trades: Dict[int, Dict[str, Any]] = {}
+        self._daily: Dict[str, Dict[str, bool]] = {}
+        self._appends = 0
+        self._since_compaction = 0
+        self._compactions = 0
+        self._errors = 0
+        self._replayed = 0
+        self._replay_ms: Optional[float] = None
+        self._last_compaction: Optional[str] = None
+        self._open()
+
+    # ---- storage ----
+
+    def _open(self):
+        try:
+            if os.path.dirname(self.path):
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            self._conn = conn
+            self._replay()
+        except sqlite3.Error as e:
+            self._conn = None
+            logging.warning(f"⚠️ [JOURNAL] Could not open {self.path}, trading state won't survive a restart: {e}")
+
+    def _replay(self):
+        start = time.time()
+        rows = self._conn.execute(
+            f"SELECT kind, key, data FROM journal WHERE kind IN ({','.join('?' * len(STATE_KINDS))}) ORDER BY seq",
+            STATE_KINDS
+        ).fetchall()
+        for kind, key, data in rows:
+            self._apply(kind, key, json.loads(data))
+        self._replayed = len(rows)
+        self._replay_ms = round((time.time() - start) * 1000, 2)
+        if rows:
+            logging.info(f"📓 [JOURNAL] Replayed {len(rows)} entries in {self._replay_ms} ms: "
+                         f"{len(self._trades)} active trades, {len(self._daily)} trading days")
+
+    def _apply(self, kind: str, key: Optional[str], data: Dict[str, Any]):
+        if kind == 'snapshot':
+            self._trades = {int(order_id): trade for order_id, trade in data.get('trades', {}).items()}
+            self._daily = dict(data.get('daily', {}))
+        elif kind == 'trade_open':
+            self._trades[int(key)] = dict(data)
+        elif kind == 'trade_update':
+            if int(key) in self._trades:
+                self._trades[int(key)].update(data)
+        elif kind == 'trade_close':
+            self._trades.pop(int(key), None)
+        elif kind == 'daily':
+            self._daily[key] = dict(data)
+
+    def append(self, kind: str, key: Any, data: Optional[Dict[str, Any]] = None):
+        """Journal one entry (and apply it to the recovered state)"""
+        data = data or {}
+        key = None if key is None else str(key)
+        with self._lock:
+            if kind in STATE_KINDS:
+                self._apply(kind, key, data)
+            if self._conn is None:
+                return
+            try:
+                cursor = self._conn.execute(
+                    "INSERT OR IGNORE INTO journal (ts, kind, key, data) VALUES (?, ?, ?, ?)",
+                    (time.time(), kind, key, json.dumps(data, default=str))
+                )
+                if cursor.rowcount == 0:
+                    return  # Fill already journaled
+                self._appends += 1
+                self._since_compaction += 1
+            except sqlite3.Error as e:
+                self._errors += 1
+                logging.warning(f"⚠️ [JOURNAL] Could not write {kind} entry: {e}")
+                return
+            if self._since_compaction >= self.compact_every:
+                self._compact_locked()
+
+    # ---- compaction ----
+
+    def _compact_locked(self):
+        cutoff = datetime.now() - timedelta(days=self.retention_days)
+        self._daily = {
+            date: status for date, status in self._daily.items()
+            if date >= cutoff.strftime('%Y-%m-%d')
+        }
+        snapshot = json.dumps({'trades': {str(k): v for k, v in self._trades.items()}, 'daily': self._daily}, default=str)
+        try:
+            self._conn.execute("BEGIN IMMEDIATE")
+            seq = self._conn.execute(
+                "INSERT INTO journal (ts, kind, key, data) VALUES (?, 'snapshot', NULL, ?)", (time.time(), snapshot)
+            ).lastrowid
+            self._conn.execute(
+                f"DELETE FROM journal WHERE seq < ? AND kind IN ({','.join('?' * len(STATE_KINDS))})",
+                (seq, *STATE_KINDS)
+            )
+            self._conn.execute("DELETE FROM journal WHERE kind IN ('order', 'fill') AND ts < ?", (cutoff.timestamp(),))
+            self._conn.execute("COMMIT")
+            self._conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        except sqlite3.Error as e:
+            self._errors += 1
+            try:
+                self._conn.execute("ROLLBACK")
+            except sqlite3.Error:
+                pass
+            logging.warning(f"⚠️ [JOURNAL] Compaction failed: {e}")
+            return
+        self._since_compaction = 0
+        self._compactions += 1
+        self._last_compaction = datetime.now().isoformat()
+
+    def compact(self):
+        """Fold the state entries into one snapshot row now"""
+        with self._lock:
+            if self._conn is not None:
+                self._compact_locked()
+
+    # ---- recovered state ----
+
+    def trades(self) -> Dict[int, Dict[str, Any]]:
+        """order_id -> trade as last journaled"""
+        with self._lock:
+            return {order_id: dict(trade) for order_id, trade in self._trades.items()}
+
+    def daily_limits(self) -> Dict[str, Dict[str, bool]]:
+        """date -> {'buyUsed', 'sellUsed'}"""
+        with self._lock:
+            return {date: dict(status) for date, status in self._daily.items()}
+
+    def history(self, kind: str, limit: int = 100) -> List[Dict[str, Any]]:
+        """Most recent entries of one kind (e.g. 'fill'), newest first"""
+        with self._lock:
+            if self._conn is None:
+                return []
+            rows = self._conn.execute(
+                "SELECT seq, ts, key, data FROM journal WHERE kind = ? ORDER BY seq DESC LIMIT ?", (kind, limit)
+            ).fetchall()
+        return [{'seq': seq, 'time': ts, 'key': key, **json.loads(data)} for seq, ts, key, data in rows]
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            entries = None
+            if self._conn is not None:
+                try:
+                    entries = self._conn.execute("SELECT COUNT(*) FROM journal").fetchone()[0]
+                except sqlite3.Error:
+                    pass
+            return {
+                'path': self.path,
+                'open': self._conn is not None,
+                'entries': entries,
+                'activeTrades': len(self._trades),
+                'replayedEntries': self._replayed,
+                'replayMs': self._replay_ms,
+                'appends': self._appends,
+                'sinceCompaction': self._since_compaction,
+                'compactions': self._compactions,
+                'lastCompaction': self._last_compaction,
+                'errors': self._errors
+            }
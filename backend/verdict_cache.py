@@ -0,0 +1,181 @@
+"""
+AI Verdict Cache
+Memoizes Ollama analyses by a hash of everything that goes into the prompt, so rescans,
+re-opened detail views and trade-decision after analyze don't pay for the same inference
+twice. Entries expire after a TTL and are persisted to a JSON snapshot across restarts.
+"""
+import copy
+import hashlib
+import json
+import logging
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, Any, List, Optional
+
+def _round_sig(value: Optional[float], digits: int = 2) -> float:
+    """Round to significant digits (volume 1,234,567 -> 1,200,000) so small drifts share a key"""
+    if not value:
+        return 0
+    value = float(value)
+    return round(value, digits - 1 - int(math.floor(math.log10(abs(value)))))
+
+def _level2_summary(level2_data: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """What the prompt takes from the order book: imbalance and the top price levels"""
+    if not level2_data:
+        return None
+    bids = level2_data.get('bids', [])
+    asks = level2_data.get('asks', [])
+    total_bid_size = sum(b.get('size', 0) for b in bids)
+    total_ask_size = sum(a.get('size', 0) for a in asks)
+    return {
+        'bidSize': _round_sig(total_bid_size),
+        'askSize': _round_sig(total_ask_size),
+        'ratio': round(total_bid_size / total_ask_size, 1) if total_ask_size > 0 else None,
+        'bids': [round(float(b.get('price', 0)), 2) for b in bids[:5]],
+        'asks': [round(float(a.get('price', 0)), 2) for a in asks[:5]]
+    }
+
+def make_verdict_key(model: str, candles: List[Dict], current_price: float, volume: float, avg_volume: float,
+                     detected_patterns: Optional[List[Dict]] = None, level2_data: Optional[Dict] = None,
+                     stock_float: Optional[float] = None, knowledge_version: str = '') -> str:
+    """
+    Content hash of an analysis request: model, the normalized last 20 candles, rounded
+    price/volume, the Level 2 summary, float and the knowledge prompt version.
+    """
+    normalized_candles = [
+        [
+            round(float(c.get('open', c.get('Open', 0)) or 0), 4),
+            round(float(c.get('high', c.get('High', 0)) or 0), 4),
+            round(float(c.get('low', c.get('Low', 0)) or 0), 4),
+            round(float(c.get('close', c.get('Close', 0)) or 0), 4),
+            _round_sig(c.get('volume', c.get('Volume', 0)), 3)
+        ]
+        for c in candles[-20:]
+    ]
+    payload = {
+        'model': model,
+        'knowledge': knowledge_version,
+        'candles': normalized_candles,
+        'price': round(float(current_price or 0), 2),
+        'volume': _round_sig(volume),
+        'avgVolume': _round_sig(avg_volume),
+        'patterns': [(p.get('pattern'), p.get('signal')) for p in (detected_patterns or [])[-3:]],
+        'level2': _level2_summary(level2_data),
+        'float': _round_sig(stock_float)
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, separators=(',', ':')).encode('utf-8')).hexdigest()
+
+class VerdictCache:
+    """
+    key -> {'result', 'storedAt'} with TTL expiry and LRU eviction above `max_entries`.
+
+    The snapshot is written at most every `save_interval` seconds (and by `save()`), so a
+    burst of analyses doesn't rewrite the file for each verdict.
+    """
+
+    def __init__(self, snapshot_path: Optional[str], ttl_seconds: float = 300.0,
+                 max_entries: int = 2000, save_interval: float = 30.0):
+        self.snapshot_path = snapshot_path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.save_interval = save_interval
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._dirty = False
+        self._last_save = 0.0
+        self._hits = 0
+        self._misses = 0
+        self._expired = 0
+        self._evictions = 0
+        self._load()
+
+    # ---- persistence ----
+
+    def _load(self):
+        if not self.snapshot_path or not os.path.exists(self.snapshot_path):
+            return
+        try:
+            with open(self.snapshot_path, 'r', encoding='utf-8') as f:
+                entries = json.load(f).get('verdicts', {})
+            now = time.time()
+            fresh = sorted(
+                ((key, entry) for key, entry in entries.items() if now - entry.get('storedAt', 0) < self.ttl_seconds),
+                key=lambda item: item[1]['storedAt']
+            )
+            self._entries = OrderedDict(fresh[-self.max_entries:])
+            logging.info(f"🧠 [VERDICT CACHE] Loaded {len(self._entries)} cached verdicts from {self.snapshot_path}")
+        except Exception as e:
+            logging.warning(f"⚠️ [VERDICT CACHE] Could not read snapshot {self.snapshot_path}: {e}")
+            self._entries = OrderedDict()
+
+    def save(self):
+        if not self.snapshot_path:
+            return
+        with self._lock:
+            if not self._dirty:
+                return
+            payload = {'savedAt': datetime.now().isoformat(), 'verdicts': dict(self._entries)}
+            self._dirty = False
+            self._last_save = time.time()
+        tmp_path = f"{self.snapshot_path}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(payload, f)
+            os.replace(tmp_path, self.snapshot_path)
+        except Exception as e:
+            logging.warning(f"⚠️ [VERDICT CACHE] Could not write snapshot {self.snapshot_path}: {e}")
+
+    # ---- cache ----
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Cached analysis result (a copy), or None if missing or expired"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.time() - entry['storedAt'] >= self.ttl_seconds:
+                del self._entries[key]
+                self._dirty = True
+                self._expired += 1
+                entry = None
+            if entry is None:
+                self._misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return copy.deepcopy(entry['result'])
+
+    def put(self, key: str, result: Dict[str, Any]):
+        with self._lock:
+            self._entries[key] = {'result': copy.deepcopy(result), 'storedAt': time.time()}
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+            self._dirty = True
+            save_due = time.time() - self._last_save >= self.save_interval
+        if save_due:
+            self.save()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._dirty = True
+        self.save()
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                'entries': len(self._entries),
+                'hits': self._hits,
+                'misses': self._misses,
+                'hitRate': round(self._hits / lookups, 3) if lookups else 0.0,
+                'expired': self._expired,
+                'evictions': self._evictions,
+                'ttlSeconds': self.ttl_seconds,
+                'maxEntries': self.max_entries,
+                'snapshotPath': self.snapshot_path
+            }
@@ -24,6 +24,22 @@ export interface OllamaAnalysisResponse {
   error?: string;
 }
 
+export interface OllamaBatchResult extends OllamaAnalysisResponse {
+  index: number;
+  symbol: string;
+  elapsed?: number;
+}
+
+export interface OllamaBatchStock {
+  symbol: string;
+  candles: any[];
+  currentPrice: number;
+  volume: number;
+  avgVolume: number;
+  float?: number;
+  detectedPatterns?: any[] | null;
+}
+
 export interface OllamaStatus {
   available: boolean;
   models?: string[];
@@ -121,6 +137,138 @@ export async function analyzeCandlesticks(
   }
 }
 
+/**
+ * Read server-sent events ("event: <name>", "data: <json>") from a fetch response body.
+ * EventSource can't send a POST body, so the streaming endpoints are read this way.
+ */
+async function readEventStream(
+  response: Response,
+  onEvent: (event: string, data: any) => void
+): Promise<void> {
+  if (!response.body) {
+    throw new Error('Response has no body to stream');
+  }
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = '';
+
+  while (true) {
+    const { done, value } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+
+    let boundary = buffer.indexOf('\n\n');
+    while (boundary !== -1) {
+      const message = buffer.slice(0, boundary);
+      buffer = buffer.slice(boundary + 2);
+      boundary = buffer.indexOf('\n\n');
+
+      const event = message.match(/^event: (.*)$/m)?.[1] || 'message';
+      const data = message.match(/^data: (.*)$/m)?.[1];
+      if (data) {
+        onEvent(event, JSON.parse(data));
+      }
+    }
+  }
+}
+
+/**
+ * Analyze candlestick patterns with streamed output.
+ * onToken receives the model's text as it is generated, onField each verdict field
+ * (signal, confidence, ...) as soon as it is complete. Resolves with the final analysis.
+ */
+export async function analyzeCandlesticksStream(
+  symbol: string,
+  candles: any[],
+  currentPrice: number,
+  volume: number,
+  avgVolume: number,
+  handlers: {
+    onToken?: (text: string) => void;
+    onField?: (name: keyof OllamaAnalysis | string, value: any) => void;
+  },
+  detectedPatterns?: any[] | null
+): Promise<OllamaAnalysisResponse> {
+  try {
+    const response = await fetch(`${API_BASE_URL}/api/ollama/analyze?stream=true`, {
+      method: 'POST',
+      headers: {
+        'Content-Type': 'application/json',
+      },
+      body: JSON.stringify({
+        symbol,
+        candles,
+        currentPrice,
+        volume,
+        avgVolume,
+        detectedPatterns: detectedPatterns || undefined,
+      }),
+    });
+
+    if (!response.ok) {
+      throw new Error(`HTTP error! status: ${response.status}`);
+    }
+
+    let result: OllamaAnalysisResponse = { success: false, error: 'Stream ended without a result' };
+    await readEventStream(response, (event, data) => {
+      if (event === 'token') {
+        handlers.onToken?.(data.text);
+      } else if (event === 'field') {
+        handlers.onField?.(data.name, data.value);
+      } else if (event === 'result') {
+        result = data;
+      }
+    });
+    return result;
+  } catch (error: any) {
+    console.error('❌ [OLLAMA] Streaming analysis failed:', error);
+    return {
+      success: false,
+      error: error.message || 'Failed to analyze candlesticks',
+    };
+  }
+}
+
+/**
+ * Analyze a whole scan result set in one request.
+ * The backend streams one result per stock as it finishes; onResult is called for each.
+ */
+export async function analyzeBatch(
+  stocks: OllamaBatchStock[],
+  onResult: (result: OllamaBatchResult) => void
+): Promise<{ success: boolean; count?: number; succeeded?: number; elapsed?: number; error?: string }> {
+  try {
+    const response = await fetch(`${API_BASE_URL}/api/ollama/analyze-batch`, {
+      method: 'POST',
+      headers: {
+        'Content-Type': 'application/json',
+      },
+      body: JSON.stringify({ stocks }),
+    });
+
+    if (!response.ok) {
+      throw new Error(`HTTP error! status: ${response.status}`);
+    }
+
+    let summary: { count?: number; succeeded?: number; elapsed?: number } = {};
+    await readEventStream(response, (event, data) => {
+      if (event === 'result') {
+        onResult(data);
+      } else if (event === 'done') {
+        summary = data;
+      }
+    });
+
+    return { success: true, ...summary };
+  } catch (error: any) {
+    console.error('❌ [OLLAMA] Batch analysis failed:', error);
+    return {
+      success: false,
+      error: error.message || 'Failed to analyze batch',
+    };
+  }
+}
+
 /**
  * Get AI trading decision (BUY/SELL/HOLD)
  */
@@ -1,6 +1,6 @@
 import { useState, useEffect } from 'react';
 import { Brain, Loader2, TrendingUp, TrendingDown, Minus, AlertCircle, CheckCircle2, XCircle } from 'lucide-react';
-import { analyzeCandlesticks, checkOllamaStatus, OllamaAnalysis, OllamaStatus } from '../api/ollamaApi';
+import { analyzeCandlesticksStream, checkOllamaStatus, OllamaAnalysis, OllamaStatus } from '../api/ollamaApi';
 import { Stock } from '../types';
 import { toast } from 'sonner';
 
@@ -14,6 +14,9 @@ export default function OllamaAnalysisComponent({ stock, onClose }: OllamaAnalys
   const [loading, setLoading] = useState(false);
   const [ollamaStatus, setOllamaStatus] = useState<OllamaStatus | null>(null);
   const [error, setError] = useState<string | null>(null);
+  // Streamed while the model generates: raw text and verdict fields as soon as each completes
+  const [streamText, setStreamText] = useState('');
+  const [earlyFields, setEarlyFields] = useState<Partial<OllamaAnalysis>>({});
 
   useEffect(() => {
     checkStatus();
@@ -32,6 +35,9 @@ export default function OllamaAnalysisComponent({ stock, onClose }: OllamaAnalys
   const analyzeStock = async () => {
     setLoading(true);
     setError(null);
+    setAnalysis(null);
+    setStreamText('');
+    setEarlyFields({});
 
     try {
       // Get candles from stock data
@@ -50,12 +56,16 @@ export default function OllamaAnalysisComponent({ stock, onClose }: OllamaAnalys
         description: stock.detectedPattern.description
       }] : null;
 
-      const result = await analyzeCandlesticks(
+      const result = await analyzeCandlesticksStream(
         stock.symbol,
         candles,
         stock.currentPrice,
         stock.volume,
         stock.avgVolume,
+        {
+          onToken: (text) => setStreamText((prev) => prev + text),
+          onField: (name, value) => setEarlyFields((prev) => ({ ...prev, [name]: value })),
+        },
         detectedPatterns
       );
 
@@ -195,12 +205,34 @@ export default function OllamaAnalysisComponent({ stock, onClose }: OllamaAnalys
       )}
 
       {loading && !analysis && (
-        <div className="flex items-center justify-center py-8">
-          <div className="text-center">
-            <Loader2 className="w-8 h-8 animate-spin text-primary mx-auto mb-2" />
-            <p className="text-sm text-muted-foreground">AI is analyzing candlestick patterns...</p>
-            <p className="text-xs text-muted-foreground mt-1">This may take 10-30 seconds</p>
-          </div>
+        <div className="py-4 space-y-3">
+          {earlyFields.signal ? (
+            <div className="p-3 bg-background border border-border rounded-lg flex items-center justify-between">
+              <div className="flex items-center gap-3">
+                {getSignalIcon(earlyFields.signal)}
+                <div>
+                  <h4 className="font-semibold text-foreground">Signal: {earlyFields.signal}</h4>
+                  {earlyFields.pattern && <p className="text-xs text-muted-foreground">{earlyFields.pattern}</p>}
+                </div>
+              </div>
+              {earlyFields.confidence && (
+                <div className={`px-3 py-1.5 rounded-md border flex items-center gap-2 ${getConfidenceColor(earlyFields.confidence)}`}>
+                  {getConfidenceIcon(earlyFields.confidence)}
+                  <span className="text-sm font-medium">{earlyFields.confidence} Confidence</span>
+                </div>
+              )}
+            </div>
+          ) : (
+            <div className="text-center">
+              <Loader2 className="w-8 h-8 animate-spin text-primary mx-auto mb-2" />
+              <p className="text-sm text-muted-foreground">AI is analyzing candlestick patterns...</p>
+            </div>
+          )}
+          {streamText && (
+            <pre className="text-xs text-muted-foreground whitespace-pre-wrap break-words max-h-32 overflow-y-auto p-2 bg-muted/50 rounded-md">
+              {streamText.slice(-600)}
+            </pre>
+          )}
         </div>
       )}
 
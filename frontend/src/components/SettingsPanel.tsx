@@ -930,7 +930,7 @@ export default function SettingsPanel({ settings, onSettingsChange, onClose, isR
               <li>Risk-reward calculation methods</li>
             </ul>
             <p className="text-xs text-muted-foreground mt-3">
-              <strong>Note:</strong> Teaching takes 30-60 seconds. Make sure Ollama is running before teaching.
+              <strong>Note:</strong> The patterns are compiled into a knowledge model once; teaching again rebuilds it in a few seconds. Make sure Ollama is running before teaching.
             </p>
           </div>
         </div>
@@ -1,6 +1,12 @@
+import { useState } from 'react'
 import { Stock, ScannerSettings } from '../types'
 import StockCard from './StockCard'
-import { AlertCircle, Search } from 'lucide-react'
+import { AlertCircle, Search, Brain, Loader2 } from 'lucide-react'
+import { toast } from 'sonner'
+import { analyzeBatch, OllamaBatchResult } from '../api/ollamaApi'
+
+// Backend limit per batch (OLLAMA_BATCH_MAX_STOCKS)
+const MAX_BATCH_STOCKS = 50
 
 interface StockScannerProps {
   stocks: Stock[]
@@ -11,7 +17,38 @@ interface StockScannerProps {
   onAIAnalysisClick?: (stock: Stock) => void
 }
 
-export default function StockScanner({ stocks, isLoading, settings, countdown, onStockClick }: StockScannerProps) {
+export default function StockScanner({ stocks, isLoading, settings, countdown, onStockClick, onAIAnalysisClick }: StockScannerProps) {
+  const [batchRunning, setBatchRunning] = useState(false)
+  const [batchResults, setBatchResults] = useState<Record<string, OllamaBatchResult>>({})
+
+  // One request for the whole result set; each verdict shows up as soon as it's ready
+  const handleAnalyzeAll = async () => {
+    const batch = stocks.filter((stock) => stock.candles?.length).slice(0, MAX_BATCH_STOCKS)
+    if (batch.length === 0) {
+      toast.error('No candle data to analyze')
+      return
+    }
+    setBatchRunning(true)
+    setBatchResults({})
+    const summary = await analyzeBatch(
+      batch.map((stock) => ({
+        symbol: stock.symbol,
+        candles: stock.candles,
+        currentPrice: stock.currentPrice,
+        volume: stock.volume,
+        avgVolume: stock.avgVolume,
+        float: stock.float,
+      })),
+      (result) => setBatchResults((prev) => ({ ...prev, [result.symbol]: result }))
+    )
+    setBatchRunning(false)
+    if (summary.success) {
+      toast.success(`AI analyzed ${summary.succeeded ?? 0}/${summary.count ?? batch.length} stocks in ${summary.elapsed ?? 0}s`)
+    } else {
+      toast.error('Batch AI analysis failed', { description: summary.error })
+    }
+  }
+
   if (isLoading) {
     return (
       <div className="space-y-4">
@@ -118,25 +155,55 @@ export default function StockScanner({ stocks, isLoading, settings, countdown, o
           </p>
         </div>
         
-        {settings.realTimeUpdates && (
-          <div className="flex items-center gap-3">
-            <div className="flex items-center gap-2 text-sm text-muted-foreground">
-              <div className="w-2 h-2 rounded-full bg-green-500 animate-pulse" />
-              Live Updates ({settings.updateInterval}s)
+        <div className="flex items-center gap-3">
+          <button
+            onClick={handleAnalyzeAll}
+            disabled={batchRunning}
+            className="px-3 py-1.5 text-sm bg-primary text-primary-foreground rounded-md hover:bg-primary/90 transition-colors disabled:opacity-50 disabled:cursor-not-allowed flex items-center gap-2"
+          >
+            {batchRunning ? <Loader2 className="w-4 h-4 animate-spin" /> : <Brain className="w-4 h-4" />}
+            <span>{batchRunning ? `Analyzing ${Object.keys(batchResults).length}/${Math.min(stocks.length, MAX_BATCH_STOCKS)}` : 'Analyze all'}</span>
+          </button>
+          {settings.realTimeUpdates && (
+            <div className="flex items-center gap-3">
+              <div className="flex items-center gap-2 text-sm text-muted-foreground">
+                <div className="w-2 h-2 rounded-full bg-green-500 animate-pulse" />
+                Live Updates ({settings.updateInterval}s)
+              </div>
+              {countdown > 0 && (
+                <div className="flex items-center gap-2 px-3 py-1 rounded-full bg-primary/10 border border-primary/20">
+                  <span className="text-xs font-medium text-primary">
+                    Next update in
+                  </span>
+                  <span className="text-sm font-bold text-primary tabular-nums">
+                    {countdown}s
+                  </span>
+                </div>
+              )}
             </div>
-            {countdown > 0 && (
-              <div className="flex items-center gap-2 px-3 py-1 rounded-full bg-primary/10 border border-primary/20">
-                <span className="text-xs font-medium text-primary">
-                  Next update in
-                </span>
-                <span className="text-sm font-bold text-primary tabular-nums">
-                  {countdown}s
-                </span>
+          )}
+        </div>
+      </div>
+
+      {Object.keys(batchResults).length > 0 && (
+        <div className="mb-4 p-3 rounded-lg bg-card border border-border">
+          <p className="text-sm font-medium mb-2">AI Analysis</p>
+          <div className="grid grid-cols-2 sm:grid-cols-4 gap-2">
+            {Object.values(batchResults).map((result) => (
+              <div key={result.symbol} className="text-xs px-2 py-1.5 rounded-md bg-muted/50" title={result.analysis?.reasoning || result.error}>
+                <span className="font-semibold">{result.symbol}</span>{' '}
+                {result.success && result.analysis ? (
+                  <span className={result.analysis.signal === 'BUY' ? 'text-green-500' : result.analysis.signal === 'SELL' ? 'text-red-500' : 'text-muted-foreground'}>
+                    {result.analysis.signal} · {result.analysis.confidence}
+                  </span>
+                ) : (
+                  <span className="text-red-500">failed</span>
+                )}
               </div>
-            )}
+            ))}
           </div>
-        )}
-      </div>
+        </div>
+      )}
       
       <div className="space-y-4">
         {stocks.map((stock) => (
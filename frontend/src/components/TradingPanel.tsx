@@ -1,4 +1,4 @@
-import { useState } from 'react';
+import { useEffect, useState } from 'react';
 import { Stock } from '../types';
 import { TrendingUp, TrendingDown, DollarSign, AlertTriangle, Loader2, CheckCircle2, XCircle } from 'lucide-react';
 import { toast } from 'sonner';
@@ -19,6 +19,51 @@ export default function TradingPanel({ stock }: TradingPanelProps) {
   const [loading, setLoading] = useState<'buy' | 'sell' | null>(null);
   const [lastOrder, setLastOrder] = useState<any>(null);
 
+  // Orders are queued by the backend - follow the last one's placement, fills and rejection
+  const lastHandle = lastOrder?.handle;
+  const lastSeq = lastOrder?.seq;
+  useEffect(() => {
+    if (!lastHandle) return;
+    let orderId: number | null = null;
+    const source = new EventSource(`${API_BASE_URL}/api/trade/events?since=${lastSeq ?? 0}`);
+    const parse = (event: Event) => JSON.parse((event as MessageEvent).data);
+
+    source.addEventListener('accepted', (event) => {
+      const data = parse(event);
+      if (data.handle !== lastHandle) return;
+      orderId = data.orderId;
+      setLastOrder((prev: any) => ({ ...prev, ...data, status: 'Accepted' }));
+    });
+    source.addEventListener('failed', (event) => {
+      const data = parse(event);
+      if (data.handle !== lastHandle) return;
+      setLastOrder((prev: any) => ({ ...prev, ...data, status: 'Failed' }));
+      toast.error('Order failed', { description: data.error || data.message });
+      source.close();
+    });
+    source.addEventListener('status', (event) => {
+      const data = parse(event);
+      if (data.orderId !== orderId) return;
+      setLastOrder((prev: any) => ({ ...prev, status: data.status, entryPrice: data.avgFillPrice ?? prev.entryPrice }));
+    });
+    source.addEventListener('fill', (event) => {
+      const data = parse(event);
+      if (data.orderId !== orderId) return;
+      toast.success(data.partial ? 'Partial fill' : 'Order filled', {
+        description: `${data.action} ${data.shares} ${data.symbol} @ $${data.price.toFixed(2)} (${data.filled} filled${data.partial ? `, ${data.remaining} remaining` : ''})`,
+        duration: 5000,
+      });
+    });
+    source.addEventListener('rejected', (event) => {
+      const data = parse(event);
+      if (data.orderId !== orderId) return;
+      setLastOrder((prev: any) => ({ ...prev, success: false, status: data.status, error: data.error }));
+      toast.error('Order rejected', { description: data.error });
+    });
+
+    return () => source.close();
+  }, [lastHandle, lastSeq]);
+
   const handleBuy = async () => {
     if (quantity <= 0) {
       toast.error('Quantity must be greater than 0');
@@ -43,7 +88,7 @@ export default function TradingPanel({ stock }: TradingPanelProps) {
 
       if (response.data.success) {
         setLastOrder(response.data);
-        toast.success('Buy order placed successfully!', {
+        toast.success('Buy order submitted', {
           description: `${quantity} shares of ${stock.symbol} @ ${orderType === 'MARKET' ? 'Market' : `$${limitPrice.toFixed(2)}`}`,
           duration: 5000,
         });
@@ -85,7 +130,7 @@ export default function TradingPanel({ stock }: TradingPanelProps) {
 
       if (response.data.success) {
         setLastOrder(response.data);
-        toast.success('Sell order placed successfully!', {
+        toast.success('Sell order submitted', {
           description: `${quantity} shares of ${stock.symbol} @ ${orderType === 'MARKET' ? 'Market' : `$${limitPrice.toFixed(2)}`}`,
           duration: 5000,
         });
@@ -287,8 +332,9 @@ export default function TradingPanel({ stock }: TradingPanelProps) {
             <span className="text-sm font-medium">Last Order</span>
           </div>
           <div className="text-xs text-muted-foreground space-y-1">
-            <p>Order ID: {lastOrder.orderId}</p>
+            <p>Order ID: {lastOrder.orderId ?? 'pending'}</p>
             <p>Status: {lastOrder.status}</p>
+            {lastOrder.error && <p>Error: {lastOrder.error}</p>}
             {lastOrder.entryPrice && <p>Entry: ${lastOrder.entryPrice.toFixed(2)}</p>}
             {lastOrder.stopLossPrice && <p>Stop Loss: ${lastOrder.stopLossPrice.toFixed(2)}</p>}
             {lastOrder.takeProfitPrice && <p>Take Profit: ${lastOrder.takeProfitPrice.toFixed(2)}</p>}